@@ -0,0 +1,113 @@
+# arraystore.py
+import argparse
+import json
+import os
+import numpy as np
+from instrument import REPORT_DIR_NAME, Run
+from storage import dataset_files, iter_table, table_rows
+
+# =========================
+# Memory-mapped feature matrix store
+# =========================
+# The encoded feature matrix (float32, C order) and labels (int8) are written
+# once as plain .npy files next to the ML-ready dataset, with a small JSON
+# sidecar naming the feature columns and target. Loading memory-maps them
+# read-only, so every process on the host (training jobs, search workers)
+# shares one physical copy through the page cache instead of parsing and
+# holding its own. Export streams the dataset in chunks straight into the
+# mapped files, so the full float64 frame is never built.
+X_SUFFIX = "_X.npy"
+Y_SUFFIX = "_y.npy"
+META_SUFFIX = "_arrays.json"
+X_DTYPE = np.float32
+CHUNK_SIZE = 250_000
+
+
+def array_paths(path):
+    base = os.path.splitext(path)[0]
+    return base + X_SUFFIX, base + Y_SUFFIX, base + META_SUFFIX
+
+
+def label_dtype(labels):
+    """Smallest signed integer dtype that holds every label."""
+    labels = np.asarray(labels)
+    if not len(labels):
+        return np.int8
+    return np.result_type(np.min_scalar_type(int(labels.min())), np.min_scalar_type(int(labels.max())), np.int8)
+
+
+def export_arrays(path, features, target, chunksize=CHUNK_SIZE):
+    """Write path's features/target as memory-mappable .npy files; return the X/y/meta paths."""
+    x_path, y_path, meta_path = array_paths(path)
+    rows = table_rows(path)
+    X = np.lib.format.open_memmap(x_path, mode="w+", dtype=X_DTYPE, shape=(rows, len(features)))
+    labels = np.empty(rows, dtype=np.int64)
+    offset = 0
+    for chunk in iter_table(path, chunksize=chunksize, columns=list(features) + [target]):
+        n = len(chunk)
+        X[offset:offset + n] = chunk[list(features)].to_numpy(dtype=X_DTYPE)
+        labels[offset:offset + n] = chunk[target].to_numpy()
+        offset += n
+    X.flush()
+    del X
+    y = np.lib.format.open_memmap(y_path, mode="w+", dtype=label_dtype(labels), shape=(rows,))
+    y[:] = labels
+    y.flush()
+    del y
+    with open(meta_path, "w") as f:
+        json.dump({"source": os.path.abspath(path), "rows": rows, "features": list(features), "target": target,
+                   "x_dtype": np.dtype(X_DTYPE).name}, f, indent=2)
+    return x_path, y_path, meta_path
+
+
+def arrays_fresh(path):
+    """True if the exported arrays exist and are at least as new as the dataset."""
+    paths = array_paths(path)
+    if not all(os.path.exists(p) for p in paths):
+        return False
+    exported = min(os.path.getmtime(p) for p in paths)
+    return all(exported >= os.path.getmtime(p) for p in dataset_files(path))
+
+
+def load_arrays(path, mmap_mode="r"):
+    """X, y and the metadata for a dataset's exported arrays, memory-mapped (read-only) by default."""
+    x_path, y_path, meta_path = array_paths(path)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return np.load(x_path, mmap_mode=mmap_mode), np.load(y_path, mmap_mode=mmap_mode), meta
+
+
+def share(array):
+    """Picklable handle for an array: memory-mapped arrays travel as their file name."""
+    if isinstance(array, np.memmap) and array.filename:
+        return ("mmap", array.filename)
+    return array
+
+
+def attach(handle):
+    """Inverse of share(): re-open a memory-mapped array in this process."""
+    if isinstance(handle, tuple) and handle[0] == "mmap":
+        return np.load(handle[1], mmap_mode="r")
+    return handle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export an ML-ready dataset as memory-mapped arrays")
+    parser.add_argument("path", help="ML-ready dataset CSV path (its columnar copy is preferred)")
+    parser.add_argument("--target", default="accident_severity")
+    parser.add_argument("--exclude", nargs="*", default=[], help="columns to leave out of X")
+    args = parser.parse_args(argv)
+
+    from storage import table_dtypes
+    dtypes = table_dtypes(args.path)
+    features = [c for c, dt in dtypes.items()
+                if c != args.target and c not in args.exclude and dt.kind in "biuf"]
+    with Run("arraystore", os.path.join(os.path.dirname(args.path) or ".", REPORT_DIR_NAME)) as run:
+        with run.stage("export", inputs=dataset_files(args.path), outputs=array_paths(args.path)) as stage:
+            for written in export_arrays(args.path, features, args.target):
+                print(f"Saved: {written}")
+            stage.count(table_rows(args.path))
+
+
+if __name__ == "__main__":
+    main()
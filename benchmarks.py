@@ -0,0 +1,279 @@
+# benchmarks.py
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+import numpy as np
+from instrument import REPORT_DIR_NAME, Run
+from synthetic import BASE_ROWS, YEAR, generate, is_generated
+
+# =========================
+# Pipeline benchmarks at scale
+# =========================
+# Times load, merge, encode, stats, training and PDF generation on synthetic
+# DfT-shaped data at multiples of one year's volume (1x = 104,258
+# collisions). Each scale runs in a fresh process, so peak RSS is that
+# scale's own, and writes a normal run report. Results are saved next to the
+# data; --save-baseline promotes them to the baseline the next runs are
+# compared against, stage by stage, flagging anything slower than the
+# tolerance.
+BENCH_DIR = "../benchmarks"
+SCALES = (1, 10, 50)
+BASELINE_FILE = "baseline.json"
+# A stage counts as regressed if it is this much slower than the baseline
+TOLERANCE = 0.10
+# Regressions below this many seconds are timer noise, not slowdowns
+MIN_SECONDS = 0.5
+MERGE_MODE = "memory"
+# One fixed model instead of the full grid search, so the stage measures
+# training throughput rather than the size of the search space
+BENCH_MODEL = ("hist_gradient_boosting", {"learning_rate": 0.1, "max_leaf_nodes": 31, "l2_regularization": 0.0})
+STAGES = ("generate", "load", "merge", "encode", "stats", "train", "pdf")
+
+
+def scale_dir(bench_dir, scale):
+    return os.path.join(bench_dir, f"x{scale:g}")
+
+
+def host_info():
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "numpy": np.__version__}
+
+
+# ---- stages ----------------------------------------------------------------
+def encode_dataset(merged, out_path, mode=MERGE_MODE):
+    """Add the temporal features, fit the encoder and write the ML-ready dataset; returns its rows."""
+    from encoder import FeatureEncoder
+    from storage import TableWriter, iter_table, load_table, save_table
+    from temporal import TemporalFeatures
+    encoder, temporal = FeatureEncoder(), TemporalFeatures()
+    if mode == "streaming":
+        # Same two passes the chunked path needs: learn every category, then
+        # encode; date/time strings are parsed once and reused from the cache
+        encoder.fit(temporal.transform(chunk) for chunk in iter_table(merged))
+        with TableWriter(out_path) as writer:
+            for chunk in iter_table(merged):
+                writer.write(encoder.transform(temporal.transform(chunk)))
+        return writer.rows
+    df = temporal.transform(load_table(merged))
+    ml_df = encoder.fit(df).transform(df)
+    save_table(ml_df, out_path)
+    return len(ml_df)
+
+
+def train_benchmark(path):
+    """Fit BENCH_MODEL on the stratified training split; returns (rows, test macro F1)."""
+    from sklearn.metrics import f1_score
+    from sklearn.model_selection import train_test_split
+    from train_model import RANDOM_STATE, TEST_SIZE, make_model, training_arrays
+    X, y, _, _ = training_arrays(path)
+    train_rows, test_rows = train_test_split(np.arange(len(y)), test_size=TEST_SIZE, stratify=y,
+                                             random_state=RANDOM_STATE)
+    name, params = BENCH_MODEL
+    model = make_model(name, params).fit(X[train_rows], y[train_rows])
+    return len(y), float(f1_score(y[test_rows], model.predict(X[test_rows]), average="macro"))
+
+
+def run_scale(bench_dir, scale, years=(YEAR,), merge_mode=MERGE_MODE):
+    """Run every benchmark stage at one scale; returns the run report path."""
+    from ingest import detect_year_files, merge_years
+    from report_engine import VARIANTS, build_reports
+    from schema import read_table_csv
+    from stats import compute_stats
+    from storage import dataset_files, table_rows
+
+    data_dir = scale_dir(bench_dir, scale)
+    merged = os.path.join(data_dir, "merged_road_accidents.csv")
+    ml_ready = os.path.join(data_dir, "road_accidents_ml_ready.csv")
+    pdf_paths = {variant: os.path.join(data_dir, f"benchmark_{variant}.pdf") for variant in VARIANTS}
+    with Run(f"benchmark_x{scale:g}", os.path.join(bench_dir, REPORT_DIR_NAME)) as run:
+        run.meta.update({"scale": scale, "collisions": int(round(BASE_ROWS * scale)), "years": list(years),
+                         "merge_mode": merge_mode, "model": BENCH_MODEL[0]})
+        # Generation is cached; it only shows up in the report when it ran
+        if not is_generated(data_dir, scale, years):
+            with run.stage("generate"):
+                generate(data_dir, scale, years)
+        year_files = detect_year_files(data_dir)
+        raw = [path for files in year_files.values() for path in files.values()]
+
+        with run.stage("load", inputs=raw) as record:
+            for files in year_files.values():
+                for table, path in files.items():
+                    record.count(len(read_table_csv(path, table)))
+        with run.stage("merge", inputs=raw) as record:
+            merge_years(year_files, merged, mode=merge_mode)
+            record.count(table_rows(merged))
+            record.outputs = dataset_files(merged)
+        with run.stage("encode", inputs=dataset_files(merged)) as record:
+            record.count(encode_dataset(merged, ml_ready, merge_mode))
+            record.outputs = dataset_files(ml_ready)
+        with run.stage("stats", inputs=dataset_files(merged)) as record:
+            stats = compute_stats(merged)
+            record.count(stats.rows)
+        with run.stage("train", inputs=dataset_files(ml_ready)) as record:
+            rows, f1 = train_benchmark(ml_ready)
+            record.count(rows)
+            record.extra["test_f1_macro"] = round(f1, 4)
+        # All three report variants from one shared data pass
+        with run.stage("pdf", outputs=list(pdf_paths.values())) as record:
+            build_reports(stats, pdf_paths, os.path.join(data_dir, "plots"))
+            record.count(stats.rows)
+    return run.report_path
+
+
+def _scale_worker(bench_dir, scale, years, merge_mode, result_path):
+    report_path = run_scale(bench_dir, scale, years, merge_mode)
+    with open(result_path, "w") as f:
+        json.dump({"report": report_path}, f)
+
+
+def benchmark(bench_dir=BENCH_DIR, scales=SCALES, years=(YEAR,), merge_mode=MERGE_MODE):
+    """Run every scale in its own process; returns {scale: {stage: metrics}}."""
+    # spawn: a clean interpreter per scale (fresh peak RSS), and one that may
+    # start its own worker pools for the merge
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for scale in scales:
+        result_path = os.path.join(bench_dir, f".x{scale:g}_result.json")
+        os.makedirs(bench_dir, exist_ok=True)
+        proc = ctx.Process(target=_scale_worker, args=(bench_dir, scale, years, merge_mode, result_path))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            print(f"WARNING: benchmark at {scale:g}x failed (exit code {proc.exitcode}); skipped.")
+            continue
+        with open(result_path) as f:
+            report_path = json.load(f)["report"]
+        os.remove(result_path)
+        with open(report_path) as f:
+            results[f"{scale:g}"] = summarise(json.load(f))
+    return results
+
+
+def summarise(report):
+    """Per-stage metrics from a run report, plus rows per second."""
+    stages = {}
+    for stage in report["stages"]:
+        if stage["parent"] is not None:
+            continue
+        metrics = {k: stage.get(k) for k in ("seconds", "cpu_seconds", "peak_rss_mb", "rss_growth_mb", "rows",
+                                           "bytes_in", "bytes_out")}
+        metrics["rows_per_second"] = round(stage["rows"] / stage["seconds"], 1) if stage["rows"] and stage["seconds"] else None
+        stages[stage["name"]] = metrics
+    return {"run": report["run"], "meta": report["meta"], "seconds": report["seconds"],
+            "peak_rss_mb": report["peak_rss_mb"], "stages": stages}
+
+
+# ---- baselines and comparison ----------------------------------------------
+def load_baseline(bench_dir=BENCH_DIR):
+    path = os.path.join(bench_dir, BASELINE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, bench_dir=BENCH_DIR, comparison=None, baseline=False):
+    """Write a timestamped results file (and the baseline if asked); returns its path."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    doc = {"created": stamp, "host": host_info(), "scales": results}
+    if comparison is not None:
+        doc["comparison"] = comparison
+    path = os.path.join(bench_dir, f"results_{stamp}.json")
+    targets = [path] + ([os.path.join(bench_dir, BASELINE_FILE)] if baseline else [])
+    for target in targets:
+        with open(target, "w") as f:
+            json.dump(doc, f, indent=2)
+    return path
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_seconds=MIN_SECONDS):
+    """One row per (scale, stage) present in both runs, with the time ratio and a verdict."""
+    rows = []
+    for scale, current in results.items():
+        base = baseline["scales"].get(scale)
+        if base is None:
+            continue
+        for stage in STAGES:
+            now, before = current["stages"].get(stage), base["stages"].get(stage)
+            if not now or not before or not before["seconds"]:
+                continue
+            ratio = now["seconds"] / before["seconds"]
+            if ratio > 1 + tolerance and now["seconds"] - before["seconds"] >= min_seconds:
+                verdict = "REGRESSION"
+            elif ratio < 1 - tolerance and before["seconds"] - now["seconds"] >= min_seconds:
+                verdict = "faster"
+            else:
+                verdict = "ok"
+            # Stage RSS is what the stage itself added; baselines saved before stages sampled
+            # their own peak only have the process high-water mark, which is not comparable
+            rows.append({"scale": scale, "stage": stage, "baseline_s": before["seconds"], "current_s": now["seconds"],
+                         "ratio": round(ratio, 3), "baseline_rss_mb": before.get("rss_growth_mb"),
+                         "current_rss_mb": now.get("rss_growth_mb"), "verdict": verdict})
+    return rows
+
+
+def format_table(rows, columns):
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) if rows else len(c) for c in columns}
+    lines = ["  ".join(c.rjust(widths[c]) for c in columns)]
+    lines += ["  ".join(str(r[c]).rjust(widths[c]) for c in columns) for r in rows]
+    return "\n".join(lines)
+
+
+def print_results(results):
+    rows = [{"scale": scale, "stage": stage, **metrics}
+            for scale, result in results.items() for stage, metrics in result["stages"].items()]
+    print(format_table(rows, ["scale", "stage", "seconds", "cpu_seconds", "peak_rss_mb", "rss_growth_mb", "rows",
+                              "rows_per_second"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data at several scales")
+    parser.add_argument("--scales", type=float, nargs="+", default=list(SCALES),
+                        help=f"multiples of one year's volume ({BASE_ROWS} collisions)")
+    parser.add_argument("--years", type=int, nargs="+", default=[YEAR], help="spread each scale over these years")
+    parser.add_argument("--merge-mode", choices=("memory", "streaming"), default=MERGE_MODE)
+    parser.add_argument("--bench-dir", default=BENCH_DIR)
+    parser.add_argument("--save-baseline", action="store_true", help="make this run the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any stage regressed")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.bench_dir)
+    results = benchmark(args.bench_dir, args.scales, args.years, args.merge_mode)
+    print_results(results)
+
+    comparison = None
+    if baseline is None:
+        if not args.save_baseline:
+            print("No baseline yet; rerun with --save-baseline to record one.")
+    else:
+        if baseline["host"] != host_info():
+            print(f"WARNING: baseline was recorded on a different host/toolchain: {baseline['host']}")
+        for scale, result in results.items():
+            base = baseline["scales"].get(scale)
+            if base is not None and base["meta"] != result["meta"]:
+                print(f"WARNING: {scale}x settings differ from the baseline's: {base['meta']} vs {result['meta']}")
+        comparison = {"baseline": baseline["created"], "tolerance": args.tolerance,
+                      "stages": compare(results, baseline, args.tolerance)}
+        print(f"\nCompared with the baseline from {baseline['created']} (tolerance {args.tolerance:.0%}):")
+        if not comparison["stages"]:
+            print("No scales in common with the baseline.")
+        else:
+            print(format_table(comparison["stages"], ["scale", "stage", "baseline_s", "current_s", "ratio",
+                                                      "baseline_rss_mb", "current_rss_mb", "verdict"]))
+    path = save_results(results, args.bench_dir, comparison, baseline=args.save_baseline)
+    print(f"Benchmark results saved to: {path}")
+
+    regressions = [r for r in (comparison or {}).get("stages", []) if r["verdict"] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} stage(s) slower than the baseline.")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# cli.py
+import argparse
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# =========================
+# Command-line entry point
+# =========================
+# One command for every stage of the project: python cli.py <command> [options].
+# Only the standard library is imported here; each subcommand's module (and so
+# pandas, matplotlib, reportlab, scikit-learn...) is imported when that
+# subcommand runs, and its own options are parsed by the module's main(argv).
+# `python cli.py startup` measures the cold start of every subcommand.
+COMMANDS = {
+    "download": ("data_download", "download the raw DfT tables"),
+    "merge": ("ingest", "validate and merge every year's tables"),
+    "pipeline": ("full_pipeline", "run the cached end-to-end pipeline"),
+    "eda": ("eda_and_plots", "write the data summary and EDA plots"),
+    "report": ("report_engine", "build the PDF reports from the statistics"),
+    "train": ("train_model", "train and save the severity model"),
+    "score": ("predict", "score a CSV (--input) with the saved model, or benchmark it"),
+    "serve": ("serve", "serve predictions over HTTP"),
+}
+STARTUP_REPEATS = 3
+
+
+def load(command):
+    """The main(argv) of a subcommand; importing its module is the only heavy step."""
+    module, _ = COMMANDS[command]
+    return importlib.import_module(module).main
+
+
+def _timed(code, repeats):
+    """Median (import seconds printed by code, process wall seconds) over fresh interpreters."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    imports, walls = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        walls.append(time.perf_counter() - start)
+        imports.append(float(out.strip().splitlines()[-1]) if out.strip() else 0.0)
+    return statistics.median(imports), statistics.median(walls)
+
+
+def startup(repeats=STARTUP_REPEATS):
+    """Cold-start cost of each subcommand: importing it in a fresh interpreter."""
+    _, baseline = _timed("pass", repeats)
+    results = {"python": {"import_s": 0.0, "wall_s": round(baseline, 3)}}
+    print(f"{'command':<10} {'import s':>9} {'process s':>10}")
+    print(f"{'(python)':<10} {'':>9} {baseline:>10.3f}")
+    for command in COMMANDS:
+        code = f"import time; t = time.perf_counter(); import cli; cli.load({command!r}); print(time.perf_counter() - t)"
+        imported, wall = _timed(code, repeats)
+        results[command] = {"import_s": round(imported, 3), "wall_s": round(wall, 3)}
+        print(f"{command:<10} {imported:>9.3f} {wall:>10.3f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Road accident severity project")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for command, (_, help) in COMMANDS.items():
+        # Options (including --help) belong to the subcommand's own parser
+        sub.add_parser(command, help=help, add_help=False)
+    timing = sub.add_parser("startup", help="measure the cold start of every subcommand")
+    timing.add_argument("--repeats", type=int, default=STARTUP_REPEATS)
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command == "startup":
+        if rest:
+            parser.error(f"unrecognized arguments: {' '.join(rest)}")
+        return startup(args.repeats)
+    return load(args.command)(rest)
+
+
+if __name__ == "__main__":
+    main()
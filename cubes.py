@@ -0,0 +1,305 @@
+# cubes.py
+import argparse
+import hashlib
+import json
+import os
+import pandas as pd
+from schema import find_column
+from storage import dataset_files, iter_table, table_columns
+
+# =========================
+# Severity count cubes
+# =========================
+# Accident counts per severity over fixed dimension combinations, gathered in
+# one chunked pass over the merged dataset. Every cube is also split by
+# accident year, so a newly ingested year is merged in (or a re-ingested year
+# replaced) without rescanning the others. Queries roll a cube up to the
+# dimensions asked for and slice it by fixed values; cubes hold a few
+# thousand cells, so reports and EDA answer from them in milliseconds.
+# refresh_cubes() keeps saved cubes current from per-year datasets (the merge
+# partitions): it remembers a digest of each year's data and rebuilds only
+# the years whose data changed.
+CUBES_SUFFIX = "_cubes.json"
+CHUNK_SIZE = 250_000
+MEASURE = "accident_severity"
+YEAR = "accident_year"
+# name -> dimensions (year and severity are implicit)
+CUBES = {
+    "conditions": ("speed_limit", "light_conditions", "weather_conditions"),
+    "road": ("road_type", "urban_or_rural_area", "speed_limit"),
+    "force": ("police_force",),
+    "calendar": ("day_of_week",),
+}
+
+
+def resolve_column(columns, name):
+    # Where casualties/vehicles also carry a collision column, the merge keeps
+    # the collisions copy as <name>_x (accident_year_x), and a later table's
+    # summed copy may take the bare name, so the _x column wins
+    return find_column(columns, name + "_x") or find_column(columns, name)
+
+
+def cubes_path(path):
+    return os.path.splitext(path)[0] + CUBES_SUFFIX
+
+
+class SeverityCubes:
+    """Severity counts for each cube in CUBES (or the given {name: dimensions}).
+
+    Counts are pandas Series indexed by (accident_year, *dimensions,
+    accident_severity). Chunks are aggregated with update(); partial cubes
+    from other chunks, files or years combine with merge() and replace().
+    """
+
+    def __init__(self, cubes=CUBES):
+        self.dimensions = {name: tuple(dims) for name, dims in cubes.items()}
+        self._parts = {name: [] for name in self.dimensions}
+        self.year_rows = {}
+        # year -> digests of the data its counts came from (see refresh_cubes)
+        self.sources = {}
+        self.missing = set()
+
+    def _levels(self, name):
+        return [YEAR, *self.dimensions[name], MEASURE]
+
+    def columns_needed(self, columns):
+        """The dataset columns update() reads, resolved against the given header."""
+        wanted = {YEAR, MEASURE} | {dim for dims in self.dimensions.values() for dim in dims}
+        return [found for found in (resolve_column(columns, name) for name in sorted(wanted)) if found]
+
+    def update(self, df):
+        year, measure = resolve_column(df.columns, YEAR), resolve_column(df.columns, MEASURE)
+        if year is None or measure is None:
+            raise KeyError(f"Cubes need {YEAR} and {MEASURE} columns")
+        for name, dims in self.dimensions.items():
+            found = [resolve_column(df.columns, dim) for dim in dims]
+            if None in found:
+                if name not in self.missing:
+                    self.missing.add(name)
+                    print(f"WARNING: no {dims[found.index(None)]} column; cube '{name}' stays empty.")
+                continue
+            counts = df.groupby([year, *found, measure], dropna=False, observed=True, sort=False).size()
+            counts.index.names = self._levels(name)
+            self._parts[name].append(counts)
+        for value, n in df[year].value_counts(dropna=False).items():
+            value = None if pd.isna(value) else int(value)
+            self.year_rows[value] = self.year_rows.get(value, 0) + int(n)
+        return self
+
+    @property
+    def rows(self):
+        return sum(self.year_rows.values())
+
+    def cube(self, name):
+        """Compacted counts for one cube (partial chunks are summed on first use)."""
+        parts = self._parts[name]
+        if len(parts) != 1:
+            levels = self._levels(name)
+            combined = pd.concat(parts) if parts else pd.Series(
+                [], index=pd.MultiIndex.from_arrays([[]] * len(levels), names=levels), dtype="int64")
+            parts[:] = [combined.groupby(level=levels, dropna=False).sum().astype("int64")]
+        return parts[0]
+
+    def years(self):
+        return sorted(year for year in self.year_rows if year is not None)
+
+    def _check_compatible(self, other):
+        if other.dimensions != self.dimensions:
+            raise ValueError("Cubes with different dimensions cannot be merged")
+
+    def merge(self, other):
+        """Add another set of cubes (disjoint data, e.g. another year or file)."""
+        self._check_compatible(other)
+        for name in self.dimensions:
+            self._parts[name].append(other.cube(name))
+        for year, n in other.year_rows.items():
+            self.year_rows[year] = self.year_rows.get(year, 0) + n
+        return self
+
+    def drop_years(self, years):
+        """Remove every count for the given years."""
+        years = list(years)
+        for name in self.dimensions:
+            cube = self.cube(name)
+            self._parts[name] = [cube[~cube.index.get_level_values(YEAR).isin(years)]]
+        for year in years:
+            self.year_rows.pop(year, None)
+            self.sources.pop(year, None)
+        return self
+
+    def replace(self, other):
+        """Merge other, first dropping the years it covers (re-ingesting a year is idempotent)."""
+        self._check_compatible(other)
+        return self.drop_years(other.years()).merge(other)
+
+    def best_cube(self, dims):
+        """Smallest non-empty cube that has every dimension in dims."""
+        candidates = [name for name, cube_dims in self.dimensions.items()
+                      if set(dims) <= {YEAR, *cube_dims} and len(self.cube(name))]
+        if not candidates:
+            raise KeyError(f"No non-empty cube covers {sorted(dims)}; cubes: {self.dimensions}")
+        return min(candidates, key=lambda name: (len(self.dimensions[name]), len(self.cube(name))))
+
+    def query(self, by=(), where=None, rates=False):
+        """Severity counts grouped by the by dimensions, within where={dim: value or list}.
+
+        Returns one row per group and one column per severity plus "total";
+        with rates, the severity columns are shares of the row total.
+        """
+        by, where = list(by), dict(where or {})
+        cube = self.cube(self.best_cube(set(by) | set(where)))
+        for dim, values in where.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            cube = cube[cube.index.get_level_values(dim).isin(list(values))]
+        if by:
+            table = cube.groupby(level=[*by, MEASURE], dropna=False).sum().unstack(MEASURE, fill_value=0)
+        else:
+            table = cube.groupby(level=MEASURE, dropna=False).sum().to_frame("all").T
+        table.columns = [int(c) if float(c).is_integer() else c for c in table.columns]
+        table["total"] = table.sum(axis=1)
+        if rates:
+            severities = [c for c in table.columns if c != "total"]
+            table[severities] = table[severities].div(table["total"].where(table["total"] > 0), axis=0)
+        return table
+
+    def to_dict(self):
+        cubes = {}
+        for name in self.dimensions:
+            cube = self.cube(name)
+            rows = [[None if pd.isna(v) else (v.item() if hasattr(v, "item") else v) for v in key] + [int(n)]
+                    for key, n in cube.items()]
+            cubes[name] = {"dimensions": list(self.dimensions[name]), "rows": rows}
+        # JSON object keys are strings; years go as [year, rows] pairs
+        return {"year_rows": [[year, n] for year, n in self.year_rows.items()],
+                "sources": [[year, digests] for year, digests in self.sources.items()], "cubes": cubes}
+
+    @classmethod
+    def from_dict(cls, data):
+        cubes = cls({name: cube["dimensions"] for name, cube in data["cubes"].items()})
+        cubes.year_rows = {year: n for year, n in data["year_rows"]}
+        cubes.sources = {year: digests for year, digests in data.get("sources", [])}
+        for name, cube in data["cubes"].items():
+            levels = cubes._levels(name)
+            frame = pd.DataFrame(cube["rows"], columns=levels + ["count"])
+            cubes._parts[name] = [frame.set_index(levels)["count"].astype("int64")]
+        return cubes
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_cubes(path, cubes=CUBES, chunksize=CHUNK_SIZE):
+    """Cubes for a dataset in one chunked pass, reading only the columns they use."""
+    result = SeverityCubes(cubes)
+    columns = result.columns_needed(table_columns(path))
+    for chunk in iter_table(path, chunksize=chunksize, columns=columns):
+        result.update(chunk)
+    return result
+
+
+def _content_digest(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def refresh_cubes(target, partitions, digest=None, cubes=CUBES, chunksize=CHUNK_SIZE, rebuild=False):
+    """Bring the cubes saved at target up to date with per-year datasets {year: path}.
+
+    Only years whose files changed since the cubes were saved are rebuilt and
+    replace()d in, and years no longer listed are dropped. Everything is
+    rebuilt with rebuild, if there are no usable saved cubes, or if a
+    partition holds rows of other years. digest(path) fingerprints a file (content hash by
+    default). Returns (cubes, years rebuilt).
+    """
+    digest = digest or _content_digest
+    sources = {year: [digest(p) for p in dataset_files(path)] for year, path in partitions.items()}
+    result = SeverityCubes.load(target) if os.path.exists(target) and not rebuild else None
+    if result is None or result.dimensions != SeverityCubes(cubes).dimensions or None in result.year_rows:
+        result = SeverityCubes(cubes)
+    changed = [year for year in partitions if result.sources.get(year) != sources[year]]
+    result.drop_years([year for year in result.year_rows if year not in partitions])
+    for year in changed:
+        part = build_cubes(partitions[year], cubes, chunksize)
+        if part.years() != [year] or None in part.year_rows:
+            print(f"WARNING: {partitions[year]} holds rows of years {part.years()}; rebuilding every year.")
+            result = SeverityCubes(cubes)
+            for path in partitions.values():
+                result.merge(build_cubes(path, cubes, chunksize))
+            result.save(target)
+            return result, list(partitions)
+        result.replace(part)
+        result.sources[year] = sources[year]
+    result.save(target)
+    return result, changed
+
+
+def load_cubes(path, chunksize=CHUNK_SIZE):
+    """The saved cubes for a dataset, rebuilt if the data is newer."""
+    target = cubes_path(path)
+    sources = dataset_files(path)
+    if os.path.exists(target) and all(os.path.getmtime(target) >= os.path.getmtime(p) for p in sources):
+        return SeverityCubes.load(target)
+    cubes = build_cubes(path, chunksize=chunksize)
+    cubes.save(target)
+    print(f"Severity cubes saved to: {target}")
+    return cubes
+
+
+def _parse_where(items):
+    where = {}
+    for item in items:
+        dim, _, values = item.partition("=")
+        where[dim] = [float(v) if "." in v else int(v) if v.lstrip("-").isdigit() else v for v in values.split(",")]
+    return where
+
+
+def main(argv=None):
+    from instrument import REPORT_DIR_NAME, Run
+
+    parser = argparse.ArgumentParser(description="Build, extend and query severity count cubes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the cubes for a dataset (saved next to it)")
+    build.add_argument("path", help="merged dataset CSV path (its columnar copy is preferred)")
+    add = sub.add_parser("add", help="merge a newly ingested dataset (e.g. one year) into existing cubes")
+    add.add_argument("cubes", help="cubes JSON to extend")
+    add.add_argument("path", help="dataset to add; years it covers replace those already in the cubes")
+    query = sub.add_parser("query", help="roll up and slice a saved cube")
+    query.add_argument("cubes", help="cubes JSON")
+    query.add_argument("--by", nargs="*", default=[], help="dimensions to group by")
+    query.add_argument("--where", nargs="*", default=[], help="dim=value[,value...] slices")
+    query.add_argument("--rates", action="store_true", help="severity shares instead of counts")
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        cubes = SeverityCubes.load(args.cubes)
+        print(cubes.query(args.by, _parse_where(args.where), args.rates).to_string())
+    else:
+        report_dir = os.path.join(os.path.dirname(args.path) or ".", REPORT_DIR_NAME)
+        with Run("cubes", report_dir) as run:
+            with run.stage("build", inputs=dataset_files(args.path)) as record:
+                built = build_cubes(args.path)
+                record.count(built.rows)
+            if args.command == "build":
+                target = built.save(cubes_path(args.path))
+            else:
+                with run.stage("merge", outputs=[args.cubes]):
+                    cubes = SeverityCubes.load(args.cubes) if os.path.exists(args.cubes) else SeverityCubes()
+                    target = cubes.replace(built).save(args.cubes)
+                print(f"Added years {built.years()} ({built.rows} rows); cubes now cover {cubes.years()}")
+            print(f"Severity cubes saved to: {target}")
+
+
+if __name__ == "__main__":
+    main()
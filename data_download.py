@@ -1,25 +1,241 @@
 # scripts/data_download.py
+import argparse
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from instrument import REPORT_DIR_NAME, Run
 
-os.makedirs("../data", exist_ok=True)
 DATA_DIR = "../data"
 
-# replace these with the actual DfT download links for a year (example placeholders)
-URL_COLLISIONS = "https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-collision-2023.csv"
-URL_CASUALTIES = "https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-casualty-2023.csv"
-URL_VEHICLES = "https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-vehicle-2023.csv"
-
-def download(url, outpath):
-    print("Downloading", url)
-    r = requests.get(url, stream=True)
-    r.raise_for_status()
-    with open(outpath, 'wb') as f:
-        for chunk in r.iter_content(chunk_size=8192):
-            f.write(chunk)
+# DfT publishes one file per table per year; {table} is collision/casualty/vehicle
+URL_TEMPLATE = "https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-{table}-{year}.csv"
+TABLES = {"collision": "collisions", "casualty": "casualties", "vehicle": "vehicles"}
+DEFAULT_YEARS = [2023]
+
+MANIFEST_NAME = "download_manifest.json"
+CHUNK_SIZE = 1024 * 1024
+MAX_WORKERS = 6
+ATTEMPTS = 5
+TIMEOUT = 60
+
+_manifest_lock = threading.Lock()
+
+
+def make_session(pool_size=MAX_WORKERS):
+    # One pooled session shared by all workers; urllib3 retries connection
+    # errors and 429/5xx responses with backoff before we ever see them
+    retry = Retry(total=ATTEMPTS, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "HEAD"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def load_manifest(data_dir):
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(data_dir, manifest):
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _validators(headers):
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+
+def _remote_size(response):
+    # Full length of the remote file: "Content-Range: bytes 100-199/200" or "bytes */200"
+    # on ranged answers, Content-Length on a plain 200
+    content_range = response.headers.get("Content-Range", "")
+    total = content_range.rpartition("/")[2]
+    if total.isdigit():
+        return int(total)
+    length = response.headers.get("Content-Length")
+    return int(length) if response.status_code == 200 and length and length.isdigit() else None
+
+
+def _record(manifest, data_dir, name, entry):
+    # Written straight away, so a killed run still finds the resume validators
+    with _manifest_lock:
+        manifest[name] = entry
+        save_manifest(data_dir, manifest)
+
+
+def _finish(url, part, outpath, validators, sha256):
+    os.replace(part, outpath)
     print("Saved to", outpath)
+    return {
+        "url": url,
+        "etag": validators.get("etag"),
+        "last_modified": validators.get("last_modified"),
+        "size": os.path.getsize(outpath),
+        "sha256": sha256,
+        "downloaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def download(url, outpath, session=None, manifest=None):
+    """Fetch url into outpath, resuming a .part file and skipping unchanged files.
+
+    Returns the manifest entry for the file. Unchanged files (HTTP 304) are
+    re-verified against their recorded checksum and re-fetched if it differs.
+    The manifest (read from the file's directory if not given) is saved as
+    soon as a download starts, so a later run can resume the .part file.
+    """
+    session = session or make_session(1)
+    data_dir = os.path.dirname(outpath) or "."
+    manifest = manifest if manifest is not None else load_manifest(data_dir)
+    name = os.path.basename(outpath)
+    entry = manifest.get(name, {})
+    part = outpath + ".part"
+
+    for attempt in range(1, ATTEMPTS + 1):
+        headers = {}
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset and entry.get("partial"):
+            # Resume only if the server still has the same file (If-Range)
+            headers["Range"] = f"bytes={offset}-"
+            validator = entry["partial"].get("etag") or entry["partial"].get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+        elif os.path.exists(outpath) and entry.get("sha256"):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                if r.status_code == 304:
+                    if sha256_file(outpath) == entry["sha256"]:
+                        print("Unchanged, skipping", url)
+                        return entry
+                    print(f"WARNING: {outpath} does not match its manifest checksum; downloading again.")
+                    entry = {}
+                    continue
+                if r.status_code == 416:
+                    # Nothing left to fetch: keep the .part file if it is the whole,
+                    # unchanged remote file, otherwise start over
+                    partial = entry.get("partial") or {}
+                    total = _remote_size(r) or partial.get("size")
+                    etag = r.headers.get("ETag")
+                    same = not etag or not partial.get("etag") or etag == partial["etag"]
+                    if offset and offset == total and same:
+                        checksum = sha256_file(part)
+                        # A previous complete download of the same version must agree byte for byte
+                        known = entry.get("sha256") if entry.get("etag") == partial.get("etag") else None
+                        if known in (None, checksum):
+                            print(f"{part} is already complete")
+                            entry = _finish(url, part, outpath, partial, checksum)
+                            _record(manifest, data_dir, name, entry)
+                            return entry
+                    print(f"WARNING: {part} does not match the remote file; downloading again.")
+                    os.remove(part)
+                    entry = {k: v for k, v in entry.items() if k != "partial"}
+                    continue
+                r.raise_for_status()
+
+                digest = hashlib.sha256()
+                if r.status_code == 206:
+                    print(f"Resuming {url} at byte {offset}")
+                    with open(part, "rb") as f:
+                        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                            digest.update(block)
+                    mode = "ab"
+                else:
+                    print("Downloading", url)
+                    mode = "wb"
+                validators = _validators(r.headers)
+                entry = dict(entry, url=url, partial=dict(validators, size=_remote_size(r)))
+                _record(manifest, data_dir, name, entry)
+                with open(part, mode) as f:
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            # Keep the .part file; the next attempt resumes from where this one stopped
+            print(f"WARNING: {url} interrupted ({e}); attempt {attempt}/{ATTEMPTS}")
+            time.sleep(min(2 ** attempt, 30))
+            continue
+
+        entry = _finish(url, part, outpath, validators, digest.hexdigest())
+        _record(manifest, data_dir, name, entry)
+        return entry
+
+    raise RuntimeError(f"Giving up on {url} after {ATTEMPTS} attempts")
+
+
+def download_jobs(years=DEFAULT_YEARS, tables=TABLES, data_dir=DATA_DIR):
+    return [
+        (URL_TEMPLATE.format(table=table, year=year), os.path.join(data_dir, f"{local}_{year}.csv"))
+        for year in years
+        for table, local in tables.items()
+    ]
+
+
+def download_all(jobs, data_dir=DATA_DIR, workers=MAX_WORKERS):
+    """Download (url, path) jobs concurrently and record them in the manifest."""
+    os.makedirs(data_dir, exist_ok=True)
+    manifest = load_manifest(data_dir)
+    session = make_session(workers)
+    failures = []
+
+    def run(job):
+        url, outpath = job
+        try:
+            download(url, outpath, session=session, manifest=manifest)
+        except Exception as e:
+            print(f"ERROR downloading {url}: {e}")
+            failures.append(url)
+        finally:
+            # Persist progress after every file so an interrupted run can resume
+            with _manifest_lock:
+                save_manifest(data_dir, manifest)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, jobs))
+    print(f"Manifest written to: {os.path.join(data_dir, MANIFEST_NAME)}")
+    if failures:
+        raise RuntimeError(f"{len(failures)} downloads failed: {failures}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download DfT road safety CSVs")
+    parser.add_argument("--years", type=int, nargs="+", default=DEFAULT_YEARS)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+    jobs = download_jobs(args.years, data_dir=args.data_dir)
+    with Run("data_download", os.path.join(args.data_dir, REPORT_DIR_NAME)) as run:
+        with run.stage("download", outputs=[path for _, path in jobs]) as record:
+            download_all(jobs, data_dir=args.data_dir, workers=args.workers)
+            record.extra["files"] = len(jobs)
+
 
 if __name__ == "__main__":
-    download(URL_COLLISIONS, os.path.join(DATA_DIR, "collisions_2023.csv"))
-    download(URL_CASUALTIES, os.path.join(DATA_DIR, "casualties_2023.csv"))
-    download(URL_VEHICLES, os.path.join(DATA_DIR, "vehicles_2023.csv"))
+    main()
@@ -1,8 +1,12 @@
 # eda_and_plots.py
+import argparse
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from cubes import load_cubes
+from render import corr_heatmap_spec, counts_bar_spec, counts_hist_spec, counts_scatter_spec, render_charts
+from schema import find_column
+from instrument import REPORT_DIR_NAME, Run
+from stats import load_stats
+from storage import table_exists
 
 # ======================
 # 1️⃣ Set data and output directories
@@ -11,78 +15,100 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 PLOTS_DIR = os.path.join(BASE_DIR, "plots")
 
-# Create plots folder if it doesn't exist
-os.makedirs(PLOTS_DIR, exist_ok=True)
 
-# ======================
-# 2️⃣ Load the merged dataset
-# ======================
-data_file = os.path.join(DATA_DIR, "merged_road_accidents.csv")
+def main(argv=None):
+    argparse.ArgumentParser(description="Summary statistics and EDA charts for the merged dataset").parse_args(argv)
+    with Run("eda_and_plots", os.path.join(DATA_DIR, REPORT_DIR_NAME)) as run:
+        run_eda(run)
 
-if not os.path.exists(data_file):
-    raise FileNotFoundError(f"Dataset not found: {data_file}")
 
-df = pd.read_csv(data_file)
+def run_eda(run):
+    # Create plots folder if it doesn't exist
+    os.makedirs(PLOTS_DIR, exist_ok=True)
 
-print("Dataset loaded successfully!")
-print("Shape:", df.shape)
-print("Columns:", df.columns.tolist())
+    # ======================
+    # 2️⃣ Load the merged dataset
+    # ======================
+    data_file = os.path.join(DATA_DIR, "merged_road_accidents.csv")
 
-# ======================
-# 3️⃣ Data Summary
-# ======================
-summary_file = os.path.join(PLOTS_DIR, "data_summary.txt")
-with open(summary_file, "w") as f:
-    f.write("===== Dataset Info =====\n")
-    df.info(buf=f)
-    f.write("\n\n===== Missing Values =====\n")
-    f.write(df.isnull().sum().to_string())
-    f.write("\n\n===== Descriptive Statistics =====\n")
-    f.write(df.describe(include='all').to_string())
+    if not table_exists(data_file):
+        raise FileNotFoundError(f"Dataset not found: {data_file}")
 
-print(f"Data summary saved at: {summary_file}")
+    # Counts, nulls, moments, quantiles, top values, correlations and the
+    # vehicles/casualties pairs all come from the statistics artifact (one
+    # chunked pass, reused until the data changes); the rows are never reloaded
+    with run.stage("stats", inputs=[data_file]) as record:
+        stats = load_stats(data_file)
+        record.count(stats.rows)
 
-# ======================
-# 4️⃣ Sample Figures
-# ======================
+    print("Dataset statistics loaded!")
+    print("Shape:", (stats.rows, len(stats.columns)))
+    print("Columns:", list(stats.columns))
 
-# 4.1 Distribution of Accident Severity
-if "Accident_Severity" in df.columns:
-    plt.figure(figsize=(8,6))
-    sns.countplot(data=df, x="Accident_Severity", palette="viridis")
-    plt.title("Distribution of Accident Severity")
-    plt.savefig(os.path.join(PLOTS_DIR, "accident_severity_dist.png"))
-    plt.close()
-
-# 4.2 Number of Vehicles involved
-if "Number_of_Vehicles" in df.columns:
-    plt.figure(figsize=(8,6))
-    sns.histplot(df["Number_of_Vehicles"].dropna(), bins=20, kde=False, color="orange")
-    plt.title("Distribution of Number of Vehicles involved")
-    plt.savefig(os.path.join(PLOTS_DIR, "vehicles_dist.png"))
-    plt.close()
-
-# 4.3 Correlation heatmap for numeric features
-numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-if len(numeric_cols) > 1:
-    plt.figure(figsize=(10,8))
-    corr = df[numeric_cols].corr()
-    sns.heatmap(corr, annot=True, fmt=".2f", cmap="coolwarm")
-    plt.title("Correlation Heatmap")
-    plt.savefig(os.path.join(PLOTS_DIR, "correlation_heatmap.png"))
-    plt.close()
-
-# 4.4 Sample scatter plot: Vehicles vs Casualties
-if "Number_of_Vehicles" in df.columns and "Number_of_Casualties" in df.columns:
-    plt.figure(figsize=(8,6))
-    sns.scatterplot(data=df, x="Number_of_Vehicles", y="Number_of_Casualties")
-    plt.title("Number of Vehicles vs Number of Casualties")
-    plt.savefig(os.path.join(PLOTS_DIR, "vehicles_vs_casualties.png"))
-    plt.close()
-
-print(f"Plots saved in folder: {PLOTS_DIR}")
+    # ======================
+    # 3️⃣ Data Summary
+    # ======================
+    summary_file = os.path.join(PLOTS_DIR, "data_summary.txt")
+    with run.stage("summary", outputs=[summary_file]), open(summary_file, "w") as f:
+        f.write("===== Dataset Info =====\n")
+        f.write(stats.info())
+        f.write("\n\n===== Missing Values =====\n")
+        f.write(stats.nulls().to_string())
+        f.write("\n\n===== Descriptive Statistics =====\n")
+        f.write(stats.describe().transpose().to_string())
+        # Severity shares answered from the cubes instead of a groupby over the rows
+        cubes = load_cubes(data_file)
+        for dim in ("speed_limit", "light_conditions", "weather_conditions"):
+            try:
+                table = cubes.query([dim], rates=True)
+            except KeyError:
+                continue
+            f.write(f"\n\n===== Accident Severity share by {dim} =====\n")
+            f.write(table.to_string())
 
-# ======================
-# 5️⃣ Ready for PDF inclusion
-# ======================
-print("EDA and plots completed. You can now include these in your PDF report.")
+    print(f"Data summary saved at: {summary_file}")
+
+    # ======================
+    # 4️⃣ Sample Figures
+    # ======================
+    # Each figure is described by its aggregate (counts, bins, correlations) and
+    # drawn in parallel by render_charts; unchanged figures come from the cache.
+    severity_col = find_column(stats.columns, "Accident_Severity")
+    vehicles_col = find_column(stats.columns, "Number_of_Vehicles")
+    casualties_col = find_column(stats.columns, "Number_of_Casualties")
+    specs = []
+
+    # 4.1 Distribution of Accident Severity
+    severity_counts = stats.columns[severity_col].value_counts(severity_col) if severity_col else None
+    if severity_counts is not None:
+        specs.append(counts_bar_spec(severity_counts, "accident_severity_dist.png", "Distribution of Accident Severity"))
+
+    # 4.2 Number of Vehicles involved
+    vehicle_counts = stats.columns[vehicles_col].value_counts(vehicles_col) if vehicles_col else None
+    if vehicle_counts is not None:
+        specs.append(counts_hist_spec(vehicle_counts, "vehicles_dist.png", "Distribution of Number of Vehicles involved"))
+
+    # 4.3 Correlation heatmap for numeric features
+    if len(stats.numeric_columns()) > 1:
+        specs.append(corr_heatmap_spec(stats.corr(), "correlation_heatmap.png", "Correlation Heatmap"))
+
+    # 4.4 Sample scatter plot: Vehicles vs Casualties
+    pairs = stats.pair_counts(vehicles_col, casualties_col) if vehicles_col and casualties_col else None
+    if pairs is not None:
+        specs.append(counts_scatter_spec(pairs, "vehicles_vs_casualties.png",
+                                         "Number of Vehicles vs Number of Casualties"))
+
+    with run.stage("charts") as record:
+        paths = render_charts(specs, PLOTS_DIR)
+        record.outputs = list(paths.values())
+    print(f"Plots saved in folder: {PLOTS_DIR}")
+
+    # ======================
+    # 5️⃣ Ready for PDF inclusion
+    # ======================
+    print("EDA and plots completed. You can now include these in your PDF report.")
+
+
+# render_charts uses a process pool, which re-imports this module in its workers
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# encoder.py
+import json
+import numpy as np
+import pandas as pd
+
+# =========================
+# ML-ready feature encoder
+# =========================
+# Fitted once (on a frame or a stream of chunks) and saved as JSON, so every
+# year, every chunk and every scoring request gets the same codes for the
+# same category. Transform is one vectorised pass per column into a new
+# frame; numeric columns without gaps are passed through without copying.
+ID_COLUMNS = ("accident_index", "accident_reference")
+DROP_COLUMNS = ("date", "time", "location_easting_osgr", "location_northing_osgr")
+UNKNOWN_CODE = -1
+
+
+def is_categorical(dtype):
+    return not (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype))
+
+
+class FeatureEncoder:
+    def __init__(self, drop=DROP_COLUMNS, passthrough=ID_COLUMNS, fill_value=0):
+        # drop / passthrough names match case-insensitively (Date vs date)
+        self.drop = [c.lower() for c in drop]
+        self.passthrough = [c.lower() for c in passthrough]
+        self.fill_value = fill_value
+        self.columns = []
+        self.categories = {}
+
+    def partial_fit(self, df):
+        """Learn columns and category maps from df; later chunks only append new categories."""
+        for col in df.columns:
+            name = col.lower()
+            if name in self.drop:
+                continue
+            if col not in self.columns:
+                self.columns.append(col)
+            if name in self.passthrough or not is_categorical(df[col].dtype):
+                continue
+            known = self.categories.setdefault(col, [])
+            seen = set(known)
+            values = df[col].cat.categories if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].dropna().unique()
+            # New categories are appended (sorted), so earlier codes never move
+            known.extend(sorted(str(v) for v in values if str(v) not in seen))
+        return self
+
+    def fit(self, data):
+        """Fit on a DataFrame or any iterable of DataFrame chunks."""
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def code_dtype(self, col):
+        return np.int16 if len(self.categories[col]) < np.iinfo(np.int16).max else np.int32
+
+    def transform(self, df):
+        """Encode df into the fitted column layout in a single pass.
+
+        Category columns become stable integer codes (unknown or missing ->
+        -1); numeric columns are gap-filled; columns missing from df are
+        filled as missing; columns not seen at fit time are dropped.
+        """
+        out = {}
+        for col in self.columns:
+            if col in self.categories:
+                if col in df.columns:
+                    s = df[col]
+                    # Maps are stored as strings; only non-string input needs converting
+                    if isinstance(s.dtype, pd.CategoricalDtype):
+                        if not pd.api.types.is_string_dtype(s.cat.categories.dtype):
+                            s = s.cat.rename_categories(s.cat.categories.astype(str))
+                    elif not pd.api.types.is_string_dtype(s.dtype):
+                        s = s.astype("string")
+                    codes = pd.Categorical(s, categories=self.categories[col]).codes
+                    out[col] = codes.astype(self.code_dtype(col), copy=False)
+                else:
+                    out[col] = np.full(len(df), UNKNOWN_CODE, dtype=self.code_dtype(col))
+            elif col in df.columns:
+                s = df[col]
+                out[col] = s.fillna(self.fill_value) if s.hasnans else s
+            else:
+                out[col] = self.fill_value
+        return pd.DataFrame(out, index=df.index, copy=False)
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def to_dict(self):
+        return {
+            "columns": self.columns,
+            "categories": self.categories,
+            "drop": self.drop,
+            "passthrough": self.passthrough,
+            "fill_value": self.fill_value,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = cls(drop=state["drop"], passthrough=state["passthrough"], fill_value=state["fill_value"])
+        encoder.columns = list(state["columns"])
+        encoder.categories = {col: list(cats) for col, cats in state["categories"].items()}
+        return encoder
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+        print(f"Encoding maps saved to: {path}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
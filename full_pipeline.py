@@ -1,8 +1,19 @@
 # full_pipeline_dynamic.py
 
-import pandas as pd
+import argparse
 import os
-import glob
+from cubes import CUBES, SeverityCubes, build_cubes, cubes_path, refresh_cubes
+from encoder import FeatureEncoder
+from ingest import detect_year_files, merge_years, partition_path
+from instrument import REPORT_DIR_NAME, Run
+from lookup_store import build_store
+from report_engine import ReportData, breakdown_tables, build_reports, chart_specs
+from spatial import GridIndex, build_index
+from stages import Pipeline, Stage
+from stats import STATS_VERSION, CorrelationStats, DatasetStats, compute_stats, stats_path
+from storage import EXTENSIONS, columnar_path, dataset_files, load_table, save_table, table_exists, table_rows
+from temporal import EXTRA_HOLIDAYS, MOVED_HOLIDAYS, TEMPORAL_FEATURES, TemporalFeatures
+from validate import RULES, validation_path
 
 # =========================
 # 1. Paths
@@ -10,199 +21,180 @@ import glob
 DATA_DIR = "../data"
 MERGED_FILE = os.path.join(DATA_DIR, "merged_road_accidents.csv")
 ML_READY_FILE = os.path.join(DATA_DIR, "road_accidents_ml_ready.csv")
-
-# =========================
-# 2. Detect latest CSVs
-# =========================
-def latest_csv(pattern):
-    files = glob.glob(os.path.join(DATA_DIR, pattern))
-    if not files:
-        return None
-    # Sort by year extracted from filename (assuming YYYY in name)
-    files.sort(reverse=True)
-    return files[0]
-
-coll_file = latest_csv("collisions_*.csv")
-cas_file  = latest_csv("casualties_*.csv")
-veh_file  = latest_csv("vehicles_*.csv")
-
-print("Detected CSV files:")
-print(f"Collisions: {coll_file}")
-print(f"Casualties: {cas_file}")
-print(f"Vehicles: {veh_file}")
-
-# =========================
-# 3. Load CSVs
-# =========================
-def load_csv(file_path):
-    if file_path and os.path.exists(file_path):
-        print(f"Loading {file_path} ...")
-        return pd.read_csv(file_path, low_memory=False)
-    else:
-        print(f"WARNING: {file_path} not found!")
-        return None
-
-coll = load_csv(coll_file)
-cas  = load_csv(cas_file)
-veh  = load_csv(veh_file)
-
-if coll is None:
-    raise FileNotFoundError("Collisions CSV is required. Pipeline cannot continue.")
-
-# =========================
-# 4. Merge datasets
-# =========================
-df = coll.copy()
-
-if cas is not None:
-    cas_cols = [col for col in cas.columns if col not in ["Accident_Index"]]
-    cas_agg = cas.groupby("Accident_Index")[cas_cols].sum().reset_index()
-    df = df.merge(cas_agg, how="left", on="Accident_Index")
-    print("Casualties merged successfully.")
-
-if veh is not None:
-    veh_cols = [col for col in veh.columns if col not in ["Accident_Index"]]
-    veh_agg = veh.groupby("Accident_Index")[veh_cols].sum().reset_index()
-    df = df.merge(veh_agg, how="left", on="Accident_Index")
-    print("Vehicles merged successfully.")
-
-# =========================
-# 5. Save merged dataset
-# =========================
-df.to_csv(MERGED_FILE, index=False)
-print(f"Merged dataset saved to: {MERGED_FILE}")
-
-# =========================
-# 6. Prepare ML-ready dataset
-# =========================
-ml_df = df.copy()
-
-# Example cleaning steps
-irrelevant_cols = ['Date', 'Time', 'Location_Easting_OSGR', 'Location_Northing_OSGR']
-for col in irrelevant_cols:
-    if col in ml_df.columns:
-        ml_df.drop(columns=col, inplace=True)
-
-# Fill missing numeric values
-numeric_cols = ml_df.select_dtypes(include=['int64', 'float64']).columns
-ml_df[numeric_cols] = ml_df[numeric_cols].fillna(0)
-
-# Fill missing categorical values
-categorical_cols = ml_df.select_dtypes(include=['object']).columns
-ml_df[categorical_cols] = ml_df[categorical_cols].fillna("Unknown")
-
-# Save ML-ready dataset
-ml_df.to_csv(ML_READY_FILE, index=False)
-print(f"ML-ready dataset saved to: {ML_READY_FILE}")
-# =========================
-# 7. Generate PDF report
-# =========================
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-
+ENCODING_FILE = os.path.join(DATA_DIR, "encoding_maps.json")
+STATS_FILE = stats_path(MERGED_FILE)
+CUBES_FILE = cubes_path(MERGED_FILE)
+SPATIAL_INDEX_FILE = os.path.join(DATA_DIR, "spatial_index.npz")
+HOTSPOTS_FILE = os.path.join(DATA_DIR, "hotspots.csv")
+LOOKUP_STORE_FILE = os.path.join(DATA_DIR, "accident_lookup.sqlite")
+PLOTS_DIR = "../plots"
+
+# "memory" loads whole tables; "streaming" aggregates casualties/vehicles in
+# chunks and streams collisions through a hash join (multi-year data).
+MERGE_MODE = "memory"
+# Raw chunks are checked against validate.RULES while they load; errors stop the merge
+VALIDATE = True
+VALIDATION_FILE = validation_path(MERGED_FILE)
+# Years are merged in parallel, one process per year (None = one per CPU)
+MAX_WORKERS = None
+# Modules whose source is part of a stage's cache key: an edit to any of them
+# rebuilds the stage instead of reusing outputs made by the old code
+MERGE_MODULES = ["ingest", "merge", "schema", "storage", "validate"]
+ML_READY_MODULES = ["encoder", "temporal", "storage"]
+
+# =========================
+# 7. PDF reports (basic, charts, IEEE), all built from the statistics artifact
+# =========================
+DOCS_DIR = "../Docs"
 PDF_REPORT = os.path.join(DATA_DIR, "Road_Accident_Report.pdf")
-
-def generate_pdf_report(df, pdf_path):
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-    width, height = A4
-
-    # Title
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width/2, height-50, "Road Accident Data Report")
-
-    # Author / Info
-    c.setFont("Helvetica", 12)
-    c.drawString(50, height-80, "Author: IBRAHIM AKINTUNDE AKINYERA")
-    c.drawString(50, height-100, f"Total records: {df.shape[0]}")
-    c.drawString(50, height-120, f"Total columns: {df.shape[1]}")
-
-    # Summary statistics
-    y = height - 160
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, y, "Summary Statistics")
-    y -= 20
-    c.setFont("Helvetica", 12)
-
-    numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-    if numeric_cols:
-        stats = df[numeric_cols].describe().transpose()
-        for col, row in stats.iterrows():
-            c.drawString(60, y, f"{col}: mean={row['mean']:.2f}, min={row['min']}, max={row['max']}")
-            y -= 15
-            if y < 50:  # create new page if space runs out
-                c.showPage()
-                y = height - 50
-
-    # Finish
-    c.showPage()
-    c.save()
-    print(f"PDF report generated: {pdf_path}")
-
-# Generate the report
-generate_pdf_report(df, PDF_REPORT)
-# =========================
-# 8. Generate PDF report with charts
-# =========================
-import matplotlib.pyplot as plt
-from io import BytesIO
-
 PDF_REPORT_CHARTS = os.path.join(DATA_DIR, "Road_Accident_Report_Charts.pdf")
+IEEE_REPORT = os.path.join(DOCS_DIR, "Road_Accident_Severity_IEEE_Report.pdf")
 
 
-def generate_pdf_with_charts(df, pdf_path):
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-    width, height = A4
-
-    # Title
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width / 2, height - 50, "Road Accident Data Report")
-
-    # Author / Info
-    c.setFont("Helvetica", 12)
-    c.drawString(50, height - 80, "Author: IBRAHIM AKINTUNDE AKINYERA")
-    c.drawString(50, height - 100, f"Total records: {df.shape[0]}")
-    c.drawString(50, height - 120, f"Total columns: {df.shape[1]}")
-
-    # Summary statistics
-    y = height - 160
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, y, "Summary Statistics")
-    y -= 20
-    c.setFont("Helvetica", 12)
-
-    numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-    if numeric_cols:
-        stats = df[numeric_cols].describe().transpose()
-        for col, row in stats.iterrows():
-            c.drawString(60, y, f"{col}: mean={row['mean']:.2f}, min={row['min']}, max={row['max']}")
-            y -= 15
-            if y < 50:
-                c.showPage()
-                y = height - 50
-
-    # Charts
-    chart_cols = ['Accident_Severity', 'Vehicle_Type', 'Casualty_Severity']  # adjust to your dataset
-    for col in chart_cols:
-        if col in df.columns:
-            fig, ax = plt.subplots(figsize=(6, 4))
-            df[col].value_counts().plot(kind='bar', ax=ax)
-            ax.set_title(f"{col} Distribution")
-            ax.set_xlabel(col)
-            ax.set_ylabel("Count")
-            plt.tight_layout()
-
-            img_buffer = BytesIO()
-            plt.savefig(img_buffer, format='PNG')
-            plt.close(fig)
-            img_buffer.seek(0)
-            c.showPage()
-            c.drawImage(img_buffer, 50, 200, width=500, height=400)
-
-    c.showPage()
-    c.save()
-    print(f"PDF report with charts generated: {pdf_path}")
-
-
-# Generate PDF with charts
-generate_pdf_with_charts(df, PDF_REPORT_CHARTS)
+def prepare_ml_ready(df):
+    # Existing maps are extended, never refitted, so codes stay stable across
+    # years and match what the scoring side loads. Date/Time become temporal
+    # features (hour, month, weekday, holidays) and are then dropped with the
+    # OSGR coordinates; gaps become 0 (numeric) or -1 (categories).
+    if os.path.exists(ENCODING_FILE):
+        encoder = FeatureEncoder.load(ENCODING_FILE)
+    else:
+        encoder = FeatureEncoder()
+    df = TemporalFeatures().transform(df)
+    ml_df = encoder.fit(df).transform(df)
+    encoder.save(ENCODING_FILE)
+    return ml_df
+
+
+def dataset_outputs(path):
+    return [path] + [columnar_path(path, fmt) for fmt in EXTENSIONS]
+
+
+def run_pipeline(run, force=()):
+    # =========================
+    # 2. Detect CSVs for every year
+    # =========================
+    with run.stage("detect") as record:
+        year_files = detect_year_files(DATA_DIR)
+        record.extra["years"] = sorted(year_files)
+
+    print("Detected CSV files:")
+    for year, files in year_files.items():
+        print(f"{year}: Collisions: {files.get('collisions')}, "
+              f"Casualties: {files.get('casualties')}, Vehicles: {files.get('vehicles')}")
+    raw_files = [path for files in year_files.values() for path in files.values()]
+
+    # The merged frame is loaded at most once, and only if a stage needs it
+    loaded = {}
+
+    def merged_df():
+        if "df" not in loaded:
+            loaded["df"] = load_table(MERGED_FILE)
+        return loaded["df"]
+
+    # =========================
+    # 3-5. Load, merge and save each year, then combine
+    # =========================
+    def merge_stage():
+        merge_years(year_files, MERGED_FILE, mode=MERGE_MODE, workers=MAX_WORKERS, validate=VALIDATE)
+        run.count(table_rows(MERGED_FILE))
+        print(f"Merged dataset saved to: {MERGED_FILE}")
+
+    # =========================
+    # 6. Prepare ML-ready dataset
+    # =========================
+    def ml_ready_stage():
+        ml_df = prepare_ml_ready(merged_df())
+        run.count(len(ml_df))
+        save_table(ml_df, ML_READY_FILE)
+        print(f"ML-ready dataset saved to: {ML_READY_FILE}")
+
+    # =========================
+    # 6b. Spatial grid index and per-cell hotspot table (OSGR metres)
+    # =========================
+    def spatial_stage():
+        grid = build_index(MERGED_FILE)
+        run.count(len(grid))
+        grid.save(SPATIAL_INDEX_FILE)
+        grid.hotspots().to_csv(HOTSPOTS_FILE, index=False)
+        print(f"Spatial index ({len(grid)} collisions) saved to: {SPATIAL_INDEX_FILE}")
+
+    # =========================
+    # 6c. Per-accident lookup store (raw casualty/vehicle rows by accident_index)
+    # =========================
+    def lookup_stage():
+        run.count(sum(build_store(year_files, LOOKUP_STORE_FILE).values()))
+        print(f"Lookup store saved to: {LOOKUP_STORE_FILE}")
+
+    # =========================
+    # 7-8. Column statistics and severity cubes, then the PDF reports built from them
+    # =========================
+    def stats_stage():
+        # Reuse the frame if the ml_ready stage already loaded it, else one chunked pass
+        stats = DatasetStats().update(loaded["df"]) if "df" in loaded else compute_stats(MERGED_FILE)
+        run.count(stats.rows)
+        stats.save(STATS_FILE)
+        print(f"Statistics saved to: {STATS_FILE}")
+
+    def cubes_stage():
+        # With several years the merge leaves one partition per year, so only the
+        # years whose partition changed are counted again and replaced in the cubes
+        partitions = {year: partition_path(MERGED_FILE, year)
+                      for year, files in year_files.items() if files.get("collisions")}
+        if len(partitions) > 1 and all(table_exists(p) for p in partitions.values()):
+            cubes, changed = refresh_cubes(CUBES_FILE, partitions, digest=pipeline.file_digest,
+                                           rebuild="cubes" in force)
+            run.count(sum(cubes.year_rows.get(year, 0) for year in changed))
+            print(f"Severity cubes updated for years {changed}: {CUBES_FILE}")
+        else:
+            cubes = build_cubes(MERGED_FILE)
+            run.count(cubes.rows)
+            cubes.save(CUBES_FILE)
+            print(f"Severity cubes saved to: {CUBES_FILE}")
+
+    def reports_stage():
+        # One shared pass over the artifact feeds all three reports; charts are drawn once
+        build_reports(DatasetStats.load(STATS_FILE),
+                      {"basic": PDF_REPORT, "charts": PDF_REPORT_CHARTS, "ieee": IEEE_REPORT}, PLOTS_DIR, run=run,
+                      cubes=SeverityCubes.load(CUBES_FILE))
+
+    # Each stage is keyed on the content of its inputs, its parameters and its
+    # code; unchanged stages are skipped and their outputs reused.
+    pipeline = Pipeline(DATA_DIR, run=run)
+    pipeline.run(Stage("merge", merge_stage, inputs=raw_files,
+                       outputs=dataset_outputs(MERGED_FILE) + ([VALIDATION_FILE] if VALIDATE else []),
+                       params={"mode": MERGE_MODE, "files": raw_files, "rules": RULES if VALIDATE else None},
+                       code=MERGE_MODULES),
+                 force="merge" in force)
+    pipeline.run(Stage("ml_ready", ml_ready_stage, inputs=dataset_files(MERGED_FILE), outputs=dataset_outputs(ML_READY_FILE) + [ENCODING_FILE],
+                       params={"temporal": TEMPORAL_FEATURES, "holidays": [MOVED_HOLIDAYS, EXTRA_HOLIDAYS]},
+                       code=[prepare_ml_ready] + ML_READY_MODULES), force="ml_ready" in force)
+    pipeline.run(Stage("spatial", spatial_stage, inputs=dataset_files(MERGED_FILE),
+                       outputs=[SPATIAL_INDEX_FILE, HOTSPOTS_FILE], code=[build_index, GridIndex]),
+                 force="spatial" in force)
+    pipeline.run(Stage("lookup", lookup_stage, inputs=raw_files, outputs=[LOOKUP_STORE_FILE],
+                       code=[build_store]), force="lookup" in force)
+    pipeline.run(Stage("stats", stats_stage, inputs=dataset_files(MERGED_FILE), outputs=[STATS_FILE],
+                       params={"version": STATS_VERSION}, code=[compute_stats, DatasetStats, CorrelationStats]),
+                 force="stats" in force)
+    pipeline.run(Stage("cubes", cubes_stage, inputs=dataset_files(MERGED_FILE), outputs=[CUBES_FILE],
+                       params={"cubes": CUBES}, code=[build_cubes, refresh_cubes, SeverityCubes]), force="cubes" in force)
+    pipeline.run(Stage("reports", reports_stage, inputs=[STATS_FILE, CUBES_FILE],
+                       outputs=[PDF_REPORT, PDF_REPORT_CHARTS, IEEE_REPORT],
+                       code=[build_reports, ReportData, chart_specs, breakdown_tables]), force="reports" in force)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the cached end-to-end pipeline")
+    # Stage names given on the command line are rebuilt even if cached
+    parser.add_argument("force", nargs="*", metavar="stage", help="stages to rebuild even if cached")
+    force = parser.parse_args(argv).force
+    # Per-stage time, memory, rows and bytes go to a JSON run report
+    with Run("full_pipeline", os.path.join(DATA_DIR, REPORT_DIR_NAME)) as run:
+        run.meta.update({"merge_mode": MERGE_MODE, "force": list(force)})
+        run_pipeline(run, force)
+
+
+# Worker processes import this module, so the pipeline only runs as a script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# ingest.py
+import argparse
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import pandas as pd
+from merge import merge_in_memory, merge_streaming
+from schema import read_table_csv, table_for_path
+from storage import TableWriter, columnar_available, load_table, save_table, table_dtypes, table_rows
+from validate import ValidationError, Validator, format_report, save_reports, validation_path
+
+# =========================
+# Multi-year ingestion
+# =========================
+# Every year found in the data folder is merged on its own (one process per
+# year), written as an accident_year partition, and the partitions are then
+# concatenated in year order into the combined dataset. Each year's raw
+# chunks are validated as they are loaded (see validate.py); the first
+# error-level violation stops that year and cancels the years not yet started.
+YEAR_PATTERN = re.compile(r"(19|20)\d{2}")
+PARTITION_DIR = "merged_by_year"
+
+
+def year_of(path):
+    match = YEAR_PATTERN.search(os.path.basename(path))
+    return int(match.group(0)) if match else None
+
+
+def detect_year_files(folder):
+    """Return {year: {"collisions": path, "casualties": path, "vehicles": path}}.
+
+    Files without a year in their name are grouped under None. Tables missing
+    for a year are simply absent from that year's dict.
+    """
+    years = {}
+    for f in sorted(os.listdir(folder)):
+        if not f.lower().endswith(".csv"):
+            continue
+        table = table_for_path(f)
+        if table is None:
+            continue
+        years.setdefault(year_of(f), {})[table] = os.path.join(folder, f)
+    return dict(sorted(years.items(), key=lambda item: (item[0] is None, item[0] or 0)))
+
+
+def partition_path(out_path, year):
+    folder = os.path.join(os.path.dirname(out_path), PARTITION_DIR)
+    stem = os.path.splitext(os.path.basename(out_path))[0]
+    return os.path.join(folder, f"{stem}_{year}.csv")
+
+
+def process_year(year, files, out_path, mode="memory", write_csv=True, validate=True):
+    """Merge one year's tables into out_path. Runs inside a worker process.
+
+    Returns (year, out_path, rows, validation report or None).
+    """
+    coll_file = files.get("collisions")
+    cas_file = files.get("casualties")
+    veh_file = files.get("vehicles")
+    validator = Validator(label=year) if validate else None
+    if mode == "streaming":
+        rows = merge_streaming(coll_file, cas_file, veh_file, out_path, write_csv=write_csv, validator=validator)
+        report = validator.finish() if validator else None
+    else:
+        coll = read_table_csv(coll_file, "collisions")
+        cas = read_table_csv(cas_file, "casualties") if cas_file else None
+        veh = read_table_csv(veh_file, "vehicles") if veh_file else None
+        report = None
+        if validator:
+            for table, df in (("collisions", coll), ("casualties", cas), ("vehicles", veh)):
+                if df is not None:
+                    validator.check(table, df)
+            report = validator.finish()
+        df = merge_in_memory(coll, cas, veh)
+        save_table(df, out_path, write_csv=write_csv)
+        rows = len(df)
+    print(f"Year {year}: {rows} rows -> {out_path}")
+    if report:
+        print(f"Year {year} validation: {format_report(report)}")
+    return year, out_path, rows, report
+
+
+def _unified_dtypes(partitions):
+    # Column order follows first appearance; a column takes the widest dtype it
+    # has in any year, and becomes float64/NaN where a numeric column is absent.
+    per_part = [table_dtypes(path) for path in partitions]
+    columns = []
+    for dtypes in per_part:
+        columns += [c for c in dtypes.index if c not in columns]
+    unified = {}
+    for col in columns:
+        seen = [dtypes[col] for dtypes in per_part if col in dtypes.index]
+        if any(isinstance(d, pd.CategoricalDtype) for d in seen):
+            unified[col] = "category"
+        elif all(pd.api.types.is_numeric_dtype(d) for d in seen):
+            if len(seen) < len(per_part) or any(pd.api.types.is_float_dtype(d) for d in seen):
+                unified[col] = "float64"
+            else:
+                unified[col] = "int64"
+        else:
+            unified[col] = "object"
+    return unified
+
+
+def combine_partitions(partitions, out_path):
+    """Concatenate year partitions into out_path one partition at a time."""
+    unified = _unified_dtypes(partitions)
+    columns = list(unified)
+    with TableWriter(out_path) as writer:
+        for path in partitions:
+            part = load_table(path).reindex(columns=columns)
+            writer.write(part.astype(unified))
+    print(f"Combined {len(partitions)} year partitions into: {out_path} ({writer.rows} rows)")
+    return writer.rows
+
+
+def merge_years(year_files, out_path, mode="memory", workers=None, validate=True):
+    """Merge every detected year in parallel and combine them into out_path.
+
+    Returns {year: partition path}. A single year is merged straight into
+    out_path without a pool. With validate, the per-year validation reports
+    are written to validation_path(out_path), also when a year fails.
+    """
+    jobs = {year: files for year, files in year_files.items() if files.get("collisions")}
+    for year in year_files:
+        if year not in jobs:
+            print(f"WARNING: no collisions CSV for year {year}; skipping.")
+    if not jobs:
+        raise FileNotFoundError("Collisions CSV is required. Pipeline cannot continue.")
+
+    reports = {}
+    try:
+        if len(jobs) == 1:
+            year, files = next(iter(jobs.items()))
+            reports[year] = process_year(year, files, out_path, mode, validate=validate)[3]
+            return {year: out_path}
+
+        # Partitions are internal, so skip their CSV when a columnar copy can be written
+        write_csv = not columnar_available()
+
+        for year in jobs:
+            os.makedirs(os.path.dirname(partition_path(out_path, year)), exist_ok=True)
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        print(f"Merging {len(jobs)} years with {workers} worker processes ...")
+        done_paths, queue, running = {}, list(jobs.items()), set()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # One year per free worker, so a failed year stops the ones not yet started
+            while queue or running:
+                while queue and len(running) < workers:
+                    year, files = queue.pop(0)
+                    running.add(pool.submit(process_year, year, files, partition_path(out_path, year),
+                                            mode, write_csv, validate))
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    year, path, _, reports[year] = future.result()
+                    done_paths[year] = path
+        partitions = {year: done_paths[year] for year in jobs}
+        combine_partitions(list(partitions.values()), out_path)
+        return partitions
+    except ValidationError as e:
+        reports[e.report["label"]] = e.report
+        raise
+    finally:
+        if validate and reports:
+            save_reports(reports, validation_path(out_path))
+            print(f"Validation report saved to: {validation_path(out_path)}")
+
+
+def main(argv=None):
+    from instrument import REPORT_DIR_NAME, Run
+
+    parser = argparse.ArgumentParser(description="Validate and merge every year's raw DfT tables")
+    parser.add_argument("--data-dir", default="../data")
+    parser.add_argument("--out", help="merged dataset path (default: <data-dir>/merged_road_accidents.csv)")
+    parser.add_argument("--mode", choices=("memory", "streaming"), default="memory")
+    parser.add_argument("--workers", type=int, default=None, help="year processes (default: one per CPU)")
+    parser.add_argument("--no-validate", action="store_true", help="skip the raw data validation")
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join(args.data_dir, "merged_road_accidents.csv")
+    year_files = detect_year_files(args.data_dir)
+    with Run("merge", os.path.join(args.data_dir, REPORT_DIR_NAME)) as run:
+        with run.stage("merge", inputs=[p for files in year_files.values() for p in files.values()]) as record:
+            merge_years(year_files, out, mode=args.mode, workers=args.workers, validate=not args.no_validate)
+            record.count(table_rows(out))
+    print(f"Merged dataset saved to: {out}")
+
+
+# Year workers import this module, so merging only runs as a script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# instrument.py
+import functools
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# =========================
+# Run instrumentation
+# =========================
+# A Run collects one record per stage: wall and CPU seconds, RSS before/after
+# and the peak RSS of the stage itself (ru_maxrss is the high-water mark of
+# the whole process, so it cannot tell stages apart: on Linux the kernel's
+# mark is reset per stage, elsewhere RSS is sampled in the background), optional
+# tracemalloc peak (Python allocations only), row counts and the bytes of
+# the files it read and wrote.
+# On exit it writes a JSON run report, so nightly runs can be compared
+# stage by stage. Optional extras, switched on per run or by environment:
+#   INSTRUMENT_TRACEMALLOC=1  tracemalloc peak per stage (slows allocation-heavy code)
+#   INSTRUMENT_PROFILE=1      cProfile over the whole run, dumped next to the report
+REPORT_DIR_NAME = "run_reports"
+PROFILE_TOP = 25
+# How often RSS is sampled while a stage is open, where the peak cannot be reset
+RSS_SAMPLE_SECONDS = 0.05
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").lower() in ("1", "true", "yes", "on")
+
+
+def rss_mb():
+    """Current resident set size in MiB (psutil if installed, else /proc, else the peak)."""
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+# Process high-water mark from before the last reset_peak_rss(), which also lowers ru_maxrss
+_peak_before_reset = 0.0
+
+
+def peak_rss_mb():
+    """High-water mark of the whole process in MiB, across reset_peak_rss() calls."""
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    return max(round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1), _peak_before_reset)
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark (Linux); False where that is not possible."""
+    global _peak_before_reset
+    _peak_before_reset = peak_rss_mb()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def stage_peak_rss_mb():
+    """RSS high-water mark since the last reset_peak_rss() (VmHWM), or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 2**10, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def file_bytes(paths):
+    return sum(os.path.getsize(p) for p in paths if p and os.path.isfile(p))
+
+
+class StageRecord:
+    def __init__(self, name, inputs=(), outputs=()):
+        self.name = name
+        self.inputs = [p for p in inputs if p]
+        self.outputs = [p for p in outputs if p]
+        self.rows = None
+        self.status = "ok"
+        self.extra = {}
+        self.data = {}
+        self.traced_peak = 0
+        self.rss_peak = 0.0
+
+    def count(self, rows):
+        self.rows = (self.rows or 0) + int(rows)
+
+    def to_dict(self):
+        out = {"name": self.name, "status": self.status, "rows": self.rows}
+        out.update(self.data)
+        out.update(self.extra)
+        return out
+
+
+class RssSampler:
+    """Background thread that raises rss_peak on every open stage record."""
+
+    def __init__(self, stack, interval=RSS_SAMPLE_SECONDS):
+        self.stack = stack
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = rss_mb()
+        for record in list(self.stack):
+            record.rss_peak = max(record.rss_peak, rss)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+class Run:
+    """Instrumentation for one script run; use as a context manager.
+
+        with Run("full_pipeline", report_dir) as run:
+            with run.stage("merge", inputs=raw, outputs=[merged]) as st:
+                st.count(len(df))
+    """
+
+    def __init__(self, name, report_dir=REPORT_DIR_NAME, trace_memory=None, profile=None):
+        self.name = name
+        self.report_dir = report_dir
+        self.trace_memory = _env_flag("INSTRUMENT_TRACEMALLOC") if trace_memory is None else trace_memory
+        self.profile = _env_flag("INSTRUMENT_PROFILE") if profile is None else profile
+        self.stages = []
+        self.meta = {}
+        self.report_path = None
+        self._stack = []
+        self._sampler = RssSampler(self._stack)
+        self._peak_resettable = None
+        self._profiler = None
+        self._started = None
+        self._start = None
+
+    @property
+    def current(self):
+        """The innermost open stage (None outside stages)."""
+        return self._stack[-1] if self._stack else None
+
+    def count(self, rows):
+        if self.current is not None:
+            self.current.count(rows)
+
+    # ---- stages -----------------------------------------------------------
+    @contextmanager
+    def stage(self, name, inputs=(), outputs=()):
+        record = StageRecord(name, inputs, outputs)
+        parent = self.current
+        rss_before = rss_mb()
+        record.rss_peak = rss_before
+        # Resetting the high-water mark would hide the enclosing stage's peak so far, so carry it over
+        if parent is not None and self._peak_resettable:
+            parent.rss_peak = max(parent.rss_peak, stage_peak_rss_mb() or 0.0)
+        if self._peak_resettable is not False:
+            self._peak_resettable = reset_peak_rss() and stage_peak_rss_mb() is not None
+        self._stack.append(record)
+        if not self._peak_resettable:
+            self._sampler.start()
+        if self.trace_memory:
+            # reset_peak() would hide the enclosing stage's peak so far, so carry it over
+            if parent is not None:
+                parent.traced_peak = max(parent.traced_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record.status = f"failed: {type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds, cpu_seconds = time.perf_counter() - wall, time.process_time() - cpu
+            if self._peak_resettable:
+                record.rss_peak = max(record.rss_peak, stage_peak_rss_mb() or 0.0)
+            else:
+                self._sampler.sample()
+            record.data = {
+                "seconds": round(seconds, 4),
+                "cpu_seconds": round(cpu_seconds, 4),
+                "rss_mb_before": rss_before,
+                "rss_mb_after": rss_mb(),
+                # Highest RSS while this stage ran, and how far it rose above the start
+                "peak_rss_mb": record.rss_peak,
+                "rss_growth_mb": round(record.rss_peak - rss_before, 1),
+                "bytes_in": file_bytes(record.inputs),
+                "bytes_out": file_bytes(record.outputs),
+            }
+            if self.trace_memory:
+                peak = max(record.traced_peak, tracemalloc.get_traced_memory()[1])
+                record.data["tracemalloc_peak_mb"] = round(peak / 2**20, 2)
+            record.data["parent"] = parent.name if parent is not None else None
+            self._stack.pop()
+            if not self._stack:
+                self._sampler.stop()
+            self.stages.append(record)
+
+    def timed(self, name=None):
+        """Decorator form of stage(): every call becomes a stage record."""
+        def wrap(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return inner
+        return wrap
+
+    # ---- run lifecycle ----------------------------------------------------
+    def start(self):
+        """Begin the run (what `with Run(...)` does); pair with finish()."""
+        self._started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def finish(self, status="ok"):
+        """End the run and write its report; returns the report path."""
+        if self._profiler is not None:
+            self._profiler.disable()
+        path = self.write_report(status)
+        if self.trace_memory:
+            tracemalloc.stop()
+        return path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish("ok" if exc_type is None else f"failed: {exc_type.__name__}: {exc}")
+        return False
+
+    def report(self, status="ok"):
+        return {
+            "run": self.name,
+            "status": status,
+            "started": self._started.isoformat() if self._started else None,
+            "seconds": round(time.perf_counter() - self._start, 4) if self._start else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "argv": sys.argv,
+            "options": {"tracemalloc": self.trace_memory, "profile": self.profile},
+            "meta": self.meta,
+            "stages": [s.to_dict() for s in self.stages],
+        }
+
+    def write_report(self, status="ok"):
+        os.makedirs(self.report_dir, exist_ok=True)
+        stamp = (self._started or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+        base = os.path.join(self.report_dir, f"{self.name}_{stamp}")
+        report = self.report(status)
+        if self._profiler is not None:
+            report["profile"] = self._dump_profile(base + ".prof")
+        self.report_path = base + ".json"
+        with open(self.report_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Run report saved to: {self.report_path}")
+        return self.report_path
+
+    def _dump_profile(self, path):
+        import pstats
+        self._profiler.dump_stats(path)
+        stats = pstats.Stats(self._profiler)
+        top = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:PROFILE_TOP]
+        return {
+            "dump": path,
+            "top_cumulative": [
+                {"function": f"{file}:{line}({func})", "calls": calls, "total_seconds": round(tt, 4),
+                 "cumulative_seconds": round(ct, 4)}
+                for (file, line, func), (_, calls, tt, ct, _) in top
+            ],
+        }
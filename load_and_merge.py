@@ -1,39 +1,34 @@
+import argparse
 import os
 import pandas as pd
+from encoder import FeatureEncoder
+from ingest import detect_year_files
+from instrument import REPORT_DIR_NAME, Run
+from schema import read_table_csv
+from storage import dataset_files, save_table
+from temporal import TemporalFeatures
 
 # === CONFIG ===
 data_folder = "/Users/akinyeraakintunde/Desktop/GlobalTalent_Project/road-accident-severity/data"
 
-
 # === Function to detect CSVs automatically by type ===
+# Every matching file is kept (one per year), in year order. The table names
+# come from the same registry as ingest, so casualties_2023.csv is found too.
 def detect_csv_files(folder):
-    files = os.listdir(folder)
-    candidates = {"Collisions": None, "Casualties": None, "Vehicles": None}
-
-    for f in files:
-        if f.lower().endswith('.csv'):
-            fname = f.lower()
-            full_path = os.path.join(folder, f)
-            if "collision" in fname:
-                candidates["Collisions"] = full_path
-            elif "casualty" in fname:
-                candidates["Casualties"] = full_path
-            elif "vehicle" in fname:
-                candidates["Vehicles"] = full_path
+    candidates = {"Collisions": [], "Casualties": [], "Vehicles": []}
+    for files in detect_year_files(folder).values():
+        for table, path in files.items():
+            candidates[table.capitalize()].append(path)
     return candidates
 
 
-csv_files = detect_csv_files(data_folder)
-print("Detected CSV files:", csv_files)
-
-
 # === Safe CSV loader ===
 def safe_load(path, name):
     if path is None:
         print(f"WARNING: {name} CSV not found!")
         return None
     try:
-        df = pd.read_csv(path, low_memory=False)
+        df = read_table_csv(path, name.lower())
         if df.empty:
             print(f"WARNING: {name} CSV is empty!")
             return None
@@ -44,62 +39,97 @@ def safe_load(path, name):
         return None
 
 
-coll = safe_load(csv_files["Collisions"], "Collisions")
-cas = safe_load(csv_files["Casualties"], "Casualties")
-veh = safe_load(csv_files["Vehicles"], "Vehicles")
-
-# === Aggregate Casualties ===
-if cas is not None and 'Accident_Index' in cas.columns:
-    casualty_cols = [col for col in ['Casualty_Severity', 'Casualty_Type'] if col in cas.columns]
-    if casualty_cols:
-        cas_agg = cas.groupby('Accident_Index')[casualty_cols].agg('count').reset_index()
-        print("Aggregated Casualties.")
-    else:
-        print("WARNING: No columns to aggregate in Casualties.")
-        cas_agg = None
-else:
-    cas_agg = None
-
-# === Aggregate Vehicles ===
-if veh is not None and 'Accident_Index' in veh.columns:
-    veh_agg = veh.groupby('Accident_Index')['Vehicle_Type'].count().reset_index().rename(
-        columns={'Vehicle_Type': 'Vehicle_Count'})
-    print("Aggregated Vehicles.")
-else:
-    veh_agg = None
-
-# === Merge datasets ===
-merged_df = coll.copy() if coll is not None else None
-
-if merged_df is not None:
-    if cas_agg is not None:
-        merged_df = pd.merge(merged_df, cas_agg, on='Accident_Index', how='left')
-        print("Merged Collisions + Casualties")
-    if veh_agg is not None:
-        merged_df = pd.merge(merged_df, veh_agg, on='Accident_Index', how='left')
-        print("Merged with Vehicles data")
-
-print("Final merged dataframe shape:", merged_df.shape if merged_df is not None else "No data merged")
-
-# === Optional: Save merged dataset for ML ===
-if merged_df is not None:
-    merged_path = os.path.join(data_folder, "merged_road_accidents.csv")
-    merged_df.to_csv(merged_path, index=False)
-    print(f"Merged dataset saved to: {merged_path}")
-
-# === Feature Engineering Example (ready for ML) ===
-if merged_df is not None:
-    # Convert categorical columns to category dtype
-    cat_cols = merged_df.select_dtypes(include='object').columns.tolist()
-    for col in cat_cols:
-        merged_df[col] = merged_df[col].astype('category')
-
-    # Example: encode categories as numbers for ML
-    merged_df_encoded = merged_df.copy()
-    for col in cat_cols:
-        merged_df_encoded[col] = merged_df_encoded[col].cat.codes
-
-    # Save ready-to-use ML dataset
-    ml_path = os.path.join(data_folder, "road_accidents_ml_ready.csv")
-    merged_df_encoded.to_csv(ml_path, index=False)
-    print(f"ML-ready dataset saved to: {ml_path}")
+# === Load all years of one table ===
+def load_all_years(paths, name):
+    frames = [df for df in (safe_load(path, name) for path in paths) if df is not None]
+    if not frames:
+        print(f"WARNING: {name} CSV not found!")
+        return None
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def main(argv=None):
+    argparse.ArgumentParser(description="Load every year's tables, merge them and write the ML-ready dataset").parse_args(argv)
+    # The run report is written even if a stage fails
+    with Run("load_and_merge", os.path.join(data_folder, REPORT_DIR_NAME)) as run:
+        csv_files = detect_csv_files(data_folder)
+        print("Detected CSV files:", csv_files)
+
+        with run.stage("load", inputs=[p for paths in csv_files.values() for p in paths]) as record:
+            coll = load_all_years(csv_files["Collisions"], "Collisions")
+            cas = load_all_years(csv_files["Casualties"], "Casualties")
+            veh = load_all_years(csv_files["Vehicles"], "Vehicles")
+            record.count(sum(len(df) for df in (coll, cas, veh) if df is not None))
+
+        # groupby time for both tables lands in one "aggregate" stage
+        with run.stage("aggregate"):
+            # === Aggregate Casualties ===
+            if cas is not None and 'Accident_Index' in cas.columns:
+                casualty_cols = [col for col in ['Casualty_Severity', 'Casualty_Type'] if col in cas.columns]
+                if casualty_cols:
+                    cas_agg = cas.groupby('Accident_Index')[casualty_cols].agg('count').reset_index()
+                    print("Aggregated Casualties.")
+                else:
+                    print("WARNING: No columns to aggregate in Casualties.")
+                    cas_agg = None
+            else:
+                cas_agg = None
+
+            # === Aggregate Vehicles ===
+            if veh is not None and 'Accident_Index' in veh.columns:
+                veh_agg = veh.groupby('Accident_Index')['Vehicle_Type'].count().reset_index().rename(
+                    columns={'Vehicle_Type': 'Vehicle_Count'})
+                print("Aggregated Vehicles.")
+            else:
+                veh_agg = None
+
+        # === Merge datasets ===
+        merged_df = coll.copy() if coll is not None else None
+
+        if merged_df is not None:
+            with run.stage("merge") as record:
+                if cas_agg is not None:
+                    merged_df = pd.merge(merged_df, cas_agg, on='Accident_Index', how='left')
+                    print("Merged Collisions + Casualties")
+                if veh_agg is not None:
+                    merged_df = pd.merge(merged_df, veh_agg, on='Accident_Index', how='left')
+                    print("Merged with Vehicles data")
+                record.count(len(merged_df))
+
+        print("Final merged dataframe shape:", merged_df.shape if merged_df is not None else "No data merged")
+
+        # === Optional: Save merged dataset for ML ===
+        if merged_df is not None:
+            merged_path = os.path.join(data_folder, "merged_road_accidents.csv")
+            with run.stage("save_merged") as record:
+                save_table(merged_df, merged_path)
+                record.outputs = dataset_files(merged_path)
+            print(f"Merged dataset saved to: {merged_path}")
+
+        # === Feature Engineering Example (ready for ML) ===
+        if merged_df is not None:
+            # The saved category maps are extended, never refitted, so codes stay
+            # stable across years and match what full_pipeline and scoring load.
+            # Date/Time become temporal features and are then dropped.
+            with run.stage("encode") as record:
+                encoding_file = os.path.join(data_folder, "encoding_maps.json")
+                if os.path.exists(encoding_file):
+                    encoder = FeatureEncoder.load(encoding_file)
+                else:
+                    encoder = FeatureEncoder()
+                merged_df = TemporalFeatures().transform(merged_df)
+                merged_df_encoded = encoder.fit(merged_df).transform(merged_df)
+                encoder.save(encoding_file)
+                record.count(len(merged_df_encoded))
+
+            # Save ready-to-use ML dataset
+            ml_path = os.path.join(data_folder, "road_accidents_ml_ready.csv")
+            with run.stage("save_ml_ready") as record:
+                save_table(merged_df_encoded, ml_path)
+                record.outputs = dataset_files(ml_path)
+            print(f"ML-ready dataset saved to: {ml_path}")
+
+
+# The helpers above can be imported without loading anything; the merge runs as a script
+if __name__ == "__main__":
+    main()
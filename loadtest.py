@@ -0,0 +1,138 @@
+# loadtest.py
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from predict import MERGED_FILE
+from storage import iter_table
+
+# =========================
+# Load test for serve.py
+# =========================
+# Opens N keep-alive connections to the local scoring service and fires
+# POST /predict requests as fast as each connection allows, then reports
+# throughput, latency percentiles and the server's own batch metrics.
+# Records come from the first SAMPLE_ROWS rows of the merged dataset.
+SAMPLE_ROWS = 5000
+# How long to wait for the server to start listening and load its model
+READY_TIMEOUT = 120.0
+
+
+async def _request(reader, writer, host, body):
+    writer.write((f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _worker(host, port, bodies, deadline, count, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while count[0] > 0 and time.perf_counter() < deadline:
+            count[0] -= 1
+            start = time.perf_counter()
+            status = await _request(reader, writer, host, bodies[i % len(bodies)])
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            i += 1
+    finally:
+        writer.close()
+
+
+async def _get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    data = await reader.read()
+    writer.close()
+    return data.split(b"\r\n\r\n", 1)[1].decode()
+
+
+async def _wait_ready(host, port, timeout=READY_TIMEOUT):
+    # The server may not be listening yet (refused) or still loading the model (503)
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if "true" in await _get(host, port, "/readyz"):
+                return
+        except ConnectionRefusedError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"Scoring service at {host}:{port} not ready after {timeout:g}s")
+        await asyncio.sleep(0.2)
+
+
+async def run(host, port, records, concurrency=32, requests=2000, rows_per_request=1, duration=60.0):
+    bodies = []
+    for start in range(0, len(records), rows_per_request):
+        batch = records[start:start + rows_per_request]
+        if len(batch) == rows_per_request:
+            bodies.append(json.dumps({"records": batch}, default=str).encode())
+
+    await _wait_ready(host, port)
+
+    latencies, statuses, count = [], {}, [requests]
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _worker(host, port, bodies, deadline, count, latencies, statuses) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    lat_ms = np.array(latencies) * 1000
+    report = {
+        "concurrency": concurrency,
+        "rows_per_request": rows_per_request,
+        "requests": len(latencies),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "rows_per_second": round(len(latencies) * rows_per_request / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+    }
+    print(json.dumps(report, indent=2))
+
+    metrics = await _get(host, port, "/metrics")
+    batches = {line.split()[0]: float(line.split()[1]) for line in metrics.splitlines()
+               if line.startswith("scoring_batch_size_sum") or line.startswith("scoring_batch_size_count")}
+    if batches.get("scoring_batch_size_count"):
+        mean = batches["scoring_batch_size_sum"] / batches["scoring_batch_size_count"]
+        print(f"Server batches: {batches['scoring_batch_size_count']:.0f}, mean rows per model call: {mean:.1f}")
+        report["mean_batch_rows"] = round(mean, 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the local scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", default=MERGED_FILE, help="merged dataset to sample records from")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rows-per-request", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=60.0, help="stop after this many seconds")
+    args = parser.parse_args(argv)
+
+    # Only the first chunk is read; the load test never needs the whole table
+    sample = next(iter_table(args.data, chunksize=SAMPLE_ROWS), None)
+    if sample is None:
+        raise SystemExit(f"No records in {args.data}")
+    records = json.loads(sample.to_json(orient="records"))
+    asyncio.run(run(args.host, args.port, records, args.concurrency, args.requests,
+                    args.rows_per_request, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# lookup_store.py
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from ingest import detect_year_files
+from instrument import REPORT_DIR_NAME, Run
+from merge import KEY
+from schema import iter_table_csv, read_dtypes
+
+# =========================
+# Per-accident lookup store
+# =========================
+# The merge keeps one row per accident (casualties and vehicles summed), so
+# the per-row detail lives only in the raw CSVs. This store bulk-loads the
+# raw collisions, casualties and vehicles of every year into one SQLite file,
+# indexed on accident_index. Looking up an accident, or thousands at once,
+# reads only the matching index pages and rows, never the whole table.
+# Column names are stored lower-case so headers from different years line up;
+# accident_index is always text.
+DATA_DIR = "../data"
+STORE_FILE = os.path.join(DATA_DIR, "accident_lookup.sqlite")
+TABLES = ("collisions", "casualties", "vehicles")
+CHUNK_SIZE = 250_000
+# Up to this many keys go into an IN (...) list; more are joined via a temp table
+IN_LIST_MAX = 500
+META_TABLE = "_store_meta"
+
+
+def _sql_type(dtype):
+    # Registry dtypes (int8, float64, str, category); unknown columns keep SQLite's dynamic typing
+    if dtype is None:
+        return ""
+    if dtype.startswith("int"):
+        return "INTEGER"
+    if dtype.startswith("float"):
+        return "REAL"
+    return "TEXT"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sources(year_files):
+    return {table: [files[table] for files in year_files.values() if table in files] for table in TABLES}
+
+
+def source_signature(paths):
+    return {os.path.abspath(p): [os.path.getsize(p), os.path.getmtime(p)] for p in paths}
+
+
+def build_store(year_files, path=STORE_FILE, chunksize=CHUNK_SIZE):
+    """Bulk-load every year's raw tables into path; returns {table: rows}.
+
+    The store is written to a temporary file and renamed into place, so
+    readers never see a half-built store. The key index is created after the
+    load, which is much faster than maintaining it row by row.
+    """
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    # Nothing to recover if the build dies: the temporary file is simply rebuilt
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    rows = {}
+    sources = _sources(year_files)
+    try:
+        for table, paths in sources.items():
+            if not paths:
+                print(f"WARNING: no {table} files found; the store will not have that table.")
+                continue
+            # Union of every year's header, in first-seen order
+            columns = {}
+            for p in paths:
+                dtypes = read_dtypes(p, table)
+                for col in pd.read_csv(p, nrows=0).columns:
+                    columns.setdefault(col.lower(), _sql_type(dtypes.get(col)))
+            if KEY not in columns:
+                print(f"WARNING: {table} has no {KEY} column; skipped.")
+                continue
+            columns[KEY] = "TEXT"
+            names = list(columns)
+            conn.execute(f"CREATE TABLE {table} ({', '.join(f'{_quote(c)} {t}'.strip() for c, t in columns.items())})")
+            insert = f"INSERT INTO {table} ({', '.join(map(_quote, names))}) VALUES ({', '.join('?' * len(names))})"
+            rows[table] = 0
+            for p in paths:
+                for chunk in iter_table_csv(p, table, chunksize=chunksize):
+                    chunk.columns = [c.lower() for c in chunk.columns]
+                    chunk = chunk.reindex(columns=names)
+                    chunk[KEY] = chunk[KEY].astype(str)
+                    # sqlite3 binds Python scalars only; NaN becomes NULL
+                    values = chunk.astype(object).where(chunk.notna(), None)
+                    conn.executemany(insert, values.itertuples(index=False, name=None))
+                    rows[table] += len(chunk)
+            conn.execute(f"CREATE INDEX idx_{table}_key ON {table} ({_quote(KEY)})")
+            print(f"{table}: {rows[table]} rows loaded from {len(paths)} file(s)")
+        conn.execute(f"CREATE TABLE {META_TABLE} (name TEXT PRIMARY KEY, value TEXT)")
+        meta = {"built": datetime.now(timezone.utc).isoformat(), "rows": rows,
+                "sources": source_signature([p for paths in sources.values() for p in paths])}
+        conn.executemany(f"INSERT INTO {META_TABLE} VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()])
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return rows
+
+
+def store_fresh(path, year_files):
+    """True if the store exists and was built from exactly these source files, unchanged."""
+    if not os.path.exists(path):
+        return False
+    with LookupStore(path) as store:
+        sources = store.meta().get("sources", {})
+    paths = [p for paths in _sources(year_files).values() for p in paths]
+    return sources == json.loads(json.dumps(source_signature(paths)))
+
+
+class LookupStore:
+    """Read-only access to a built store; use as a context manager."""
+
+    def __init__(self, path=STORE_FILE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No lookup store at {path}; build it first")
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        self.tables = [t for t in TABLES if self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (t,)).fetchone()]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.conn.close()
+
+    def meta(self):
+        return {name: json.loads(value) for name, value in self.conn.execute(f"SELECT name, value FROM {META_TABLE}")}
+
+    def lookup(self, keys, tables=None):
+        """{table: rows for any of keys} for each table; keys that match nothing are simply absent."""
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        tables = [t for t in (tables or self.tables) if t in self.tables]
+        if not keys:
+            return {table: pd.DataFrame() for table in tables}
+        if len(keys) <= IN_LIST_MAX:
+            where = f"{_quote(KEY)} IN ({', '.join('?' * len(keys))})"
+            return {table: pd.read_sql_query(f"SELECT * FROM {table} WHERE {where}", self.conn, params=keys)
+                    for table in tables}
+        # Large batches: one indexed join against a temporary key table
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (k TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM lookup_keys")
+        self.conn.executemany("INSERT INTO lookup_keys VALUES (?)", ((k,) for k in keys))
+        try:
+            return {table: pd.read_sql_query(
+                f"SELECT t.* FROM lookup_keys CROSS JOIN {table} AS t ON t.{_quote(KEY)} = lookup_keys.k",
+                self.conn) for table in tables}
+        finally:
+            self.conn.execute("DELETE FROM lookup_keys")
+
+    def get(self, key, tables=None):
+        """Every row of every table for one accident."""
+        return self.lookup([key], tables)
+
+    def sample_keys(self, n, seed=42):
+        """n random accident_index values from the collisions (for benchmarks)."""
+        total = self.conn.execute("SELECT max(rowid) FROM collisions").fetchone()[0] or 0
+        rowids = np.random.default_rng(seed).integers(1, total + 1, size=n)
+        keys = []
+        for start in range(0, n, IN_LIST_MAX):
+            batch = [int(r) for r in rowids[start:start + IN_LIST_MAX]]
+            keys += [k for (k,) in self.conn.execute(
+                f"SELECT {_quote(KEY)} FROM collisions WHERE rowid IN ({', '.join('?' * len(batch))})", batch)]
+        return keys
+
+
+def benchmark(store, batch_sizes=(1, 100, 1000, 10_000), repeats=5):
+    """Milliseconds per batch lookup (all tables) for each batch size."""
+    results = {}
+    for size in batch_sizes:
+        keys = store.sample_keys(size)
+        store.lookup(keys)  # warm the page cache
+        start = time.perf_counter()
+        for _ in range(repeats):
+            found = store.lookup(keys)
+        ms = (time.perf_counter() - start) / repeats * 1000
+        results[size] = {"ms_per_batch": round(ms, 2), "rows": {t: len(df) for t, df in found.items()}}
+        print(f"{size:>6} keys: {ms:8.2f} ms per batch, rows {results[size]['rows']}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-accident lookup store for the raw DfT tables")
+    parser.add_argument("--store", default=STORE_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="(re)build the store from the raw CSVs")
+    build.add_argument("--data-dir", default=DATA_DIR)
+    build.add_argument("--force", action="store_true", help="rebuild even if the sources are unchanged")
+    get = sub.add_parser("get", help="print or save the rows for some accidents")
+    get.add_argument("keys", nargs="*", help="accident_index values")
+    get.add_argument("--keys-file", help="file with one accident_index per line")
+    get.add_argument("--tables", nargs="+", choices=TABLES)
+    get.add_argument("--out-dir", help="write <table>.csv here instead of printing")
+    sub.add_parser("benchmark", help="time batch lookups of random accidents")
+    args = parser.parse_args(argv)
+
+    with Run("lookup_store", os.path.join(os.path.dirname(args.store) or ".", REPORT_DIR_NAME)) as run:
+        if args.command == "build":
+            year_files = detect_year_files(args.data_dir)
+            if not args.force and store_fresh(args.store, year_files):
+                print(f"Lookup store is up to date: {args.store}")
+            else:
+                with run.stage("build", inputs=[p for f in year_files.values() for p in f.values()],
+                               outputs=[args.store]) as record:
+                    record.count(sum(build_store(year_files, args.store).values()))
+                print(f"Lookup store saved to: {args.store}")
+        elif args.command == "get":
+            keys = list(args.keys)
+            if args.keys_file:
+                with open(args.keys_file) as f:
+                    keys += [line.strip() for line in f if line.strip()]
+            with run.stage("lookup") as record, LookupStore(args.store) as store:
+                found = store.lookup(keys, args.tables)
+                record.count(sum(len(df) for df in found.values()))
+            for table, df in found.items():
+                if args.out_dir:
+                    os.makedirs(args.out_dir, exist_ok=True)
+                    df.to_csv(os.path.join(args.out_dir, f"{table}.csv"), index=False)
+                else:
+                    print(f"== {table} ({len(df)} rows) ==")
+                    print(df.to_string(index=False) if len(df) else "(none)")
+            if args.out_dir:
+                print(f"Rows for {len(keys)} accident(s) saved to: {args.out_dir}")
+        else:
+            with run.stage("benchmark") as record, LookupStore(args.store) as store:
+                record.extra["results"] = benchmark(store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# merge.py
+import pandas as pd
+from schema import find_column, iter_table_csv
+from storage import TableWriter
+
+# =========================
+# Collision / casualty / vehicle merge
+# =========================
+# Casualties and vehicles are summed per accident and left-joined onto the
+# collisions table. Two engines produce the same frame:
+#   merge_in_memory  - whole tables in RAM (one year at a time)
+#   merge_streaming  - chunked aggregation + hash join, bounded by the number
+#                      of distinct accidents rather than raw rows, with the
+#                      output written chunk by chunk
+KEY = "accident_index"
+CHUNK_SIZE = 250_000
+
+
+def aggregate_per_accident(df, key):
+    """Sum every numeric column per accident (category/text columns have no sum)."""
+    cols = [col for col in df.select_dtypes(include="number").columns if col != key]
+    return df.groupby(key)[cols].sum()
+
+
+def merge_in_memory(coll, cas=None, veh=None):
+    key = find_column(coll.columns, KEY)
+    if key is None:
+        raise KeyError(f"Collisions table has no {KEY} column")
+
+    df = coll
+    if cas is not None:
+        cas_agg = aggregate_per_accident(cas, find_column(cas.columns, KEY)).reset_index()
+        cas_agg = cas_agg.rename(columns={cas_agg.columns[0]: key})
+        df = df.merge(cas_agg, how="left", on=key)
+        print("Casualties merged successfully.")
+    if veh is not None:
+        veh_agg = aggregate_per_accident(veh, find_column(veh.columns, KEY)).reset_index()
+        veh_agg = veh_agg.rename(columns={veh_agg.columns[0]: key})
+        df = df.merge(veh_agg, how="left", on=key)
+        print("Vehicles merged successfully.")
+    return df
+
+
+def aggregate_csv_chunked(path, table, chunksize=CHUNK_SIZE, validator=None):
+    """Per-accident sums of a casualty/vehicle CSV, read chunk by chunk.
+
+    Partial sums are compacted whenever they grow past a few chunks' worth of
+    rows, so memory tracks the number of accidents, not the number of rows.
+    Partials are combined in file order, matching a single groupby. Each
+    chunk is passed to validator.check() first, if given.
+    """
+    partials, buffered = [], 0
+    for chunk in iter_table_csv(path, table, chunksize=chunksize):
+        if validator is not None:
+            validator.check(table, chunk)
+        key = find_column(chunk.columns, KEY)
+        part = aggregate_per_accident(chunk, key)
+        part.index.name = KEY
+        partials.append(part)
+        buffered += len(part)
+        if buffered > 4 * chunksize:
+            partials = [pd.concat(partials).groupby(level=0).sum()]
+            buffered = len(partials[0])
+    if not partials:
+        return None
+    return pd.concat(partials).groupby(level=0).sum()
+
+
+def _key_coverage(coll_path, key_index, chunksize):
+    # Cheap pre-pass over the key column only: do all collisions find a match?
+    # Decides whether joined columns end up int or float (NaN), as in pandas' merge.
+    for chunk in pd.read_csv(coll_path, usecols=lambda c: c.lower() == KEY, dtype=str, chunksize=chunksize):
+        if not chunk.iloc[:, 0].isin(key_index).all():
+            return False
+    return True
+
+
+def merge_streaming(coll_path, cas_path, veh_path, out_path, chunksize=CHUNK_SIZE, write_csv=True, validator=None):
+    """Stream collisions through a hash join against the per-accident aggregates.
+
+    Writes out_path (CSV plus columnar copy) incrementally and returns the
+    number of rows written. Same columns, order and values as merge_in_memory.
+    Every raw chunk goes through validator.check(), if given; the caller runs
+    validator.finish() for the cross-table checks.
+    """
+    aggs = []
+    for path, table, label in ((cas_path, "casualties", "Casualties"), (veh_path, "vehicles", "Vehicles")):
+        if path is None:
+            continue
+        agg = aggregate_csv_chunked(path, table, chunksize, validator)
+        if agg is not None:
+            aggs.append((agg, _key_coverage(coll_path, agg.index, chunksize)))
+            print(f"{label} aggregated: {len(agg)} accidents.")
+
+    with TableWriter(out_path, write_csv=write_csv) as writer:
+        for chunk in iter_table_csv(coll_path, "collisions", chunksize=chunksize):
+            if validator is not None:
+                validator.check("collisions", chunk)
+            key = find_column(chunk.columns, KEY)
+            for agg, covered in aggs:
+                # DataFrame.join on the aggregate's index reuses its hash table
+                # across chunks; suffixes mirror merge(how="left")
+                chunk = chunk.join(agg, on=key, lsuffix="_x", rsuffix="_y")
+                if not covered:
+                    joined = list(chunk.columns[-agg.shape[1]:])
+                    chunk[joined] = chunk[joined].astype("float64")
+            writer.write(chunk.reset_index(drop=True))
+    print(f"Merged dataset streamed to: {out_path} ({writer.rows} rows)")
+    return writer.rows
@@ -1,171 +1,50 @@
 # Scripts/pdf_ieee_report.py
 
+import argparse
 import os
-import pandas as pd
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
-from reportlab.lib import colors
+from cubes import load_cubes
+from instrument import REPORT_DIR_NAME, Run
+from report_engine import build_reports
+from stats import load_stats
 
 # === CONFIGURATION ===
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 PLOTS_DIR = os.path.join(BASE_DIR, "plots")
 DOCS_DIR = os.path.join(BASE_DIR, "Docs")
-os.makedirs(DOCS_DIR, exist_ok=True)
 
 PDF_FILE = os.path.join(DOCS_DIR, "Road_Accident_Severity_IEEE_Report.pdf")
 DATA_FILE = os.path.join(DATA_DIR, "merged_road_accidents.csv")
 
-# === LOAD DATA ===
-try:
-    df = pd.read_csv(DATA_FILE)
-    print(f"Dataset loaded: {df.shape[0]} rows, {df.shape[1]} columns")
-except FileNotFoundError:
-    raise FileNotFoundError(f"Dataset not found at {DATA_FILE}")
 
-# === PDF SETUP ===
-doc = SimpleDocTemplate(PDF_FILE, pagesize=A4, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
-styles = getSampleStyleSheet()
-styleN = styles['Normal']
-styleH = styles['Heading1']
-styleSubH = styles['Heading2']
-styleSubSubH = styles['Heading3']
-
-story = []
-
-# === TITLE PAGE ===
-story.append(Paragraph("Road Accident Severity Analysis and Predictive Modeling", styleH))
-story.append(Spacer(1, 12))
-story.append(Paragraph("Author: Akinyera Ibrahim", styleSubH))
-story.append(Spacer(1, 12))
-story.append(Paragraph("Personal Project", styleN))
-story.append(Paragraph("September 2025", styleN))
-story.append(Spacer(1, 24))
-
-# === ABSTRACT ===
-story.append(Paragraph("Abstract", styleSubH))
-abstract_text = """
-This report presents a comprehensive analysis of road accident severity using a merged dataset of collisions, casualties, and vehicles. 
-The project explores patterns, visualizes distributions, and prepares the data for predictive modeling using machine learning techniques. 
-This study aims to provide actionable insights to improve road safety and establish a machine learning pipeline capable of predicting accident severity.
-"""
-story.append(Paragraph(abstract_text, styleN))
-story.append(Spacer(1, 24))
-
-# === INTRODUCTION ===
-story.append(Paragraph("1. Introduction", styleSubH))
-intro_text = """
-Road traffic accidents are a significant global concern, leading to loss of life and economic impact. 
-Analyzing accident data is critical for understanding contributing factors and predicting high-risk scenarios. 
-This study uses UK road accident data to examine collision patterns, casualties, and vehicle involvement to model accident severity.
-"""
-story.append(Paragraph(intro_text, styleN))
-story.append(Spacer(1, 12))
-
-# === DATA SUMMARY ===
-story.append(Paragraph("2. Data Summary", styleSubH))
-story.append(Spacer(1, 12))
-summary_df = df.describe(include='all').transpose().reset_index()
-summary_table_data = [summary_df.columns.tolist()] + summary_df.fillna("").values.tolist()
-summary_table = Table(summary_table_data, repeatRows=1)
-summary_table.setStyle(TableStyle([
-    ('BACKGROUND', (0,0), (-1,0), colors.grey),
-    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-    ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-    ('FONTSIZE', (0,0), (-1,-1), 7)
-]))
-story.append(summary_table)
-story.append(Spacer(1, 24))
-
-# === METHODOLOGY ===
-story.append(Paragraph("3. Methodology", styleSubH))
-method_text = """
-The methodology of this study involves several stages:
-1. Data acquisition and merging of collisions, casualties, and vehicle datasets.
-2. Data cleaning to handle missing values and ensure consistency.
-3. Feature engineering to create predictive attributes.
-4. Exploratory data analysis (EDA) to identify trends and distributions.
-5. Machine learning preparation, including encoding and scaling features.
-6. Model training and evaluation using advanced algorithms such as Random Forest and Gradient Boosting.
-"""
-story.append(Paragraph(method_text, styleN))
-story.append(Spacer(1, 12))
-
-# === EDA & FIGURES ===
-story.append(Paragraph("4. Exploratory Data Analysis (EDA)", styleSubH))
-story.append(Spacer(1, 12))
-
-plot_files = [
-    "accident_severity.png",
-    "vehicles_distribution.png",
-    "casualty_severity.png"
-]
-
-for plot_name in plot_files:
-    plot_path = os.path.join(PLOTS_DIR, plot_name)
-    if os.path.exists(plot_path):
-        story.append(Paragraph(plot_name.replace(".png","").replace("_"," ").title(), styleSubSubH))
-        story.append(Spacer(1, 6))
-        story.append(Image(plot_path, width=400, height=250))
-        story.append(Spacer(1, 12))
-    else:
-        story.append(Paragraph(f"Plot not found: {plot_name}", styleN))
-        story.append(Spacer(1, 12))
-
-# === PIPELINE STEPS ===
-story.append(Paragraph("5. Data Pipeline & Machine Learning Preparation", styleSubH))
-pipeline_text = """
-The data pipeline consists of the following stages:
-- Data Loading & Merging
-- Data Cleaning & Preprocessing
-- Feature Engineering
-- Machine Learning Dataset Preparation
-- Model Training and Evaluation
-The pipeline ensures reproducibility and rigorous preparation of features for predictive modeling.
-"""
-story.append(Paragraph(pipeline_text, styleN))
-story.append(Spacer(1, 12))
-
-pipeline_diagram = os.path.join(PLOTS_DIR, "pipeline_diagram.png")
-if os.path.exists(pipeline_diagram):
-    story.append(Image(pipeline_diagram, width=400, height=250))
-    story.append(Spacer(1, 12))
-else:
-    story.append(Paragraph("Pipeline diagram not found.", styleN))
-    story.append(Spacer(1, 12))
-
-# === RESULTS & DISCUSSION ===
-story.append(Paragraph("6. Results & Discussion", styleSubH))
-results_text = """
-The results indicate significant patterns in accident severity:
-- Certain road types and light/weather conditions correlate with higher severity.
-- Vehicle type and casualty characteristics affect the severity outcome.
-- Predictive models trained on this dataset can achieve high accuracy and support road safety interventions.
-"""
-story.append(Paragraph(results_text, styleN))
-story.append(Spacer(1, 12))
-
-# === CONCLUSION ===
-story.append(Paragraph("7. Conclusion", styleSubH))
-conclusion_text = """
-This report provides a rigorous analysis of road accident severity and prepares a dataset suitable for predictive modeling. 
-The methodology and pipeline described ensure reproducibility and scientific rigor, meeting MSc/PhD-level standards.
-"""
-story.append(Paragraph(conclusion_text, styleN))
-story.append(Spacer(1, 12))
-
-# === REFERENCES ===
-story.append(Paragraph("References", styleSubH))
-references_text = """
-[1] Department for Transport, "Reported Road Casualties in Great Britain: 2023 Annual Report", DfT, UK.
-[2] Pedregosa et al., "Scikit-learn: Machine Learning in Python", Journal of Machine Learning Research, 2011.
-[3] Bishop, C.M., "Pattern Recognition and Machine Learning", Springer, 2006.
-"""
-story.append(Paragraph(references_text, styleN))
-story.append(Spacer(1, 12))
-
-# === SAVE PDF ===
-doc.build(story)
-print(f"IEEE-style PDF successfully created at: {PDF_FILE}")
+def main(argv=None):
+    argparse.ArgumentParser(description="Build the IEEE-style PDF report from the statistics").parse_args(argv)
+    os.makedirs(DOCS_DIR, exist_ok=True)
+
+    # === INSTRUMENTATION ===
+    # The run report is written even if a stage fails
+    with Run("pdf_report", os.path.join(DATA_DIR, REPORT_DIR_NAME)) as run:
+        # === LOAD DATA ===
+        # Only the column statistics are needed; the artifact is recomputed if the data is newer
+        try:
+            with run.stage("stats", inputs=[DATA_FILE]) as record:
+                stats = load_stats(DATA_FILE)
+                record.count(stats.rows)
+            print(f"Dataset statistics loaded: {stats.rows} rows, {len(stats.columns)} columns")
+            # Severity breakdown tables are answered from the cubes, built once per dataset
+            with run.stage("cubes", inputs=[DATA_FILE]):
+                cubes = load_cubes(DATA_FILE)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Dataset not found at {DATA_FILE}")
+
+        # === BUILD PDF ===
+        # Text, the summary table (split into page-sized chunks) and the charts come
+        # from report_engine; charts are rendered from the statistics, not the data
+        with run.stage("build_pdf", outputs=[PDF_FILE]):
+            build_reports(stats, {"ieee": PDF_FILE}, PLOTS_DIR, run, cubes)
+        print(f"IEEE-style PDF successfully created at: {PDF_FILE}")
+
+
+# Importing the module (for its paths) does nothing; the report is built when run as a script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# predict.py
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from encoder import FeatureEncoder, UNKNOWN_CODE
+from instrument import REPORT_DIR_NAME, Run
+from schema import find_column
+from storage import iter_table
+from temporal import DATE_COLUMN, TEMPORAL_FEATURES, TIME_COLUMN, TemporalFeatures
+
+# =========================
+# Severity scoring
+# =========================
+# Loads the trained model and the encoding maps once and keeps them warm.
+# Records go through the same encoding as the ml_ready stage of
+# full_pipeline.py (Date/Time/OSGR dropped, numeric gaps -> 0, categories ->
+# stable codes, unknown -> -1), then straight into a float32 matrix in the
+# model's feature order. Models trained with the temporal features get them
+# derived from the raw date/time strings here too, from a warm parse cache.
+DATA_DIR = "../data"
+MODEL_FILE = os.path.join(DATA_DIR, "severity_model.joblib")
+ENCODING_FILE = os.path.join(DATA_DIR, "encoding_maps.json")
+MERGED_FILE = os.path.join(DATA_DIR, "merged_road_accidents.csv")
+SAMPLE_ROWS = 10_000
+SCORE_CHUNK_SIZE = 100_000
+
+
+class SeverityPredictor:
+    def __init__(self, model_path=MODEL_FILE, encoding_path=ENCODING_FILE):
+        import joblib
+        artifact = joblib.load(model_path)
+        self.model = artifact["model"]
+        if "n_jobs" in self.model.get_params():
+            # Thread fan-out costs more than it saves on small batches
+            self.model.set_params(n_jobs=1)
+        self.features = artifact["features"]
+        self.classes = artifact["classes"]
+        self.encoder = FeatureEncoder.load(encoding_path)
+
+        # Per-feature lookup for the row-at-a-time path: a code map for
+        # categories, None (plain float) for numeric features
+        self._code_maps = [
+            {cat: code for code, cat in enumerate(self.encoder.categories[f])}
+            if f in self.encoder.categories else None
+            for f in self.features
+        ]
+        self._fill = float(self.encoder.fill_value)
+        self.temporal = TemporalFeatures() if set(TEMPORAL_FEATURES) & set(self.features) else None
+        # First call pays sklearn's lazy imports/validation setup, not the caller
+        self.predict_proba(np.zeros((1, len(self.features)), dtype=np.float32))
+
+    # ---- encoding ---------------------------------------------------------
+    def _encode_record(self, record, out):
+        for i, (name, codes) in enumerate(zip(self.features, self._code_maps)):
+            value = record.get(name)
+            if codes is not None:
+                out[i] = codes.get(str(value), UNKNOWN_CODE) if value is not None else UNKNOWN_CODE
+            elif value is None or value != value:  # missing or NaN
+                out[i] = self._fill
+            else:
+                out[i] = value
+
+    def _with_temporal(self, record):
+        date_value = record.get(DATE_COLUMN, record.get(DATE_COLUMN.capitalize()))
+        time_value = record.get(TIME_COLUMN, record.get(TIME_COLUMN.capitalize()))
+        return {**record, **self.temporal.record(date_value, time_value)}
+
+    def _encode_records(self, records):
+        X = np.empty((len(records), len(self.features)), dtype=np.float32)
+        for row, record in enumerate(records):
+            self._encode_record(self._with_temporal(record) if self.temporal else record, X[row])
+        return X
+
+    def _encode_frame(self, df):
+        if self.temporal:
+            df = self.temporal.transform(df)
+        return self.encoder.transform(df)[self.features].to_numpy(dtype=np.float32)
+
+    def _encode_arrow(self, table):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        X = np.empty((table.num_rows, len(self.features)), dtype=np.float32)
+        derived = {}
+        if self.temporal:
+            columns = [find_column(table.column_names, name) for name in (DATE_COLUMN, TIME_COLUMN)]
+            derived = self.temporal.features(
+                *(table.column(c).to_numpy(zero_copy_only=False) if c else None for c in columns),
+                index=range(table.num_rows))
+        for i, name in enumerate(self.features):
+            if name in derived:
+                X[:, i] = derived[name].to_numpy()
+                continue
+            if name not in table.column_names:
+                X[:, i] = UNKNOWN_CODE if name in self.encoder.categories else self._fill
+                continue
+            column = table.column(name)
+            if name in self.encoder.categories:
+                if pa.types.is_dictionary(column.type):
+                    column = column.cast(column.type.value_type)
+                codes = pc.index_in(column.cast(pa.string()), value_set=pa.array(self.encoder.categories[name]))
+                X[:, i] = pc.fill_null(codes, UNKNOWN_CODE).to_numpy(zero_copy_only=False)
+            else:
+                X[:, i] = pc.fill_null(column.cast(pa.float64()), self._fill).to_numpy(zero_copy_only=False)
+        return X
+
+    def encode(self, records):
+        """Feature matrix for a dict, a list of dicts, a DataFrame or an Arrow table."""
+        if isinstance(records, np.ndarray):
+            return records
+        if isinstance(records, dict):
+            return self._encode_records([records])
+        if isinstance(records, pd.DataFrame):
+            return self._encode_frame(records)
+        if isinstance(records, (list, tuple)):
+            return self._encode_records(records)
+        if type(records).__module__.startswith("pyarrow"):
+            return self._encode_arrow(records)
+        raise TypeError(f"Unsupported input type: {type(records).__name__}")
+
+    # ---- scoring ----------------------------------------------------------
+    def predict_proba(self, records):
+        """Class probabilities, one row per record, columns in self.classes order."""
+        return self.model.predict_proba(self.encode(records))
+
+    def score(self, record):
+        """Probabilities for a single record as {severity class: probability}."""
+        proba = self.predict_proba(record)[0]
+        return {int(c): float(p) for c, p in zip(self.classes, proba)}
+
+
+def benchmark(predictor, sample, batch_sizes=(1, 100, 10_000), min_seconds=2.0):
+    """p50/p99 latency and rows/second per batch size.
+
+    Batch size 1 uses the dict path (one record, no pandas); larger batches
+    go through the DataFrame path.
+    """
+    results = []
+    records = sample.to_dict("records")
+    for size in batch_sizes:
+        if size == 1:
+            batches = records
+        else:
+            reps = -(-size // len(sample))
+            frame = pd.concat([sample] * reps, ignore_index=True).iloc[:size] if reps > 1 else sample.iloc[:size]
+            batches = [frame]
+        latencies = []
+        start = time.perf_counter()
+        i = 0
+        while time.perf_counter() - start < min_seconds or len(latencies) < 5:
+            batch = batches[i % len(batches)]
+            t0 = time.perf_counter()
+            predictor.predict_proba(batch)
+            latencies.append(time.perf_counter() - t0)
+            i += 1
+        lat_ms = np.array(latencies) * 1000
+        result = {
+            "batch_size": size,
+            "calls": len(latencies),
+            "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+            "rows_per_second": round(size * len(latencies) / (lat_ms.sum() / 1000), 1),
+        }
+        print(f"batch={size:>6}  p50={result['p50_ms']:.3f} ms  p99={result['p99_ms']:.3f} ms  "
+              f"rows/s={result['rows_per_second']:.0f}")
+        results.append(result)
+    return results
+
+
+def score_file(predictor, in_path, out_path, chunksize=SCORE_CHUNK_SIZE):
+    """Score every record of a dataset chunk by chunk into a CSV; returns the rows written.
+
+    The output keeps accident_index (when present) and adds one probability
+    column per class plus the predicted class.
+    """
+    rows = 0
+    prob_columns = [f"p_{c}" for c in predictor.classes]
+    for chunk in iter_table(in_path, chunksize=chunksize):
+        proba = predictor.predict_proba(chunk)
+        out = pd.DataFrame(proba, columns=prob_columns, index=chunk.index)
+        out.insert(0, "predicted_severity", np.asarray(predictor.classes)[proba.argmax(axis=1)])
+        key = next((c for c in chunk.columns if c.lower() == "accident_index"), None)
+        if key:
+            out.insert(0, key, chunk[key])
+        out.to_csv(out_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+        rows += len(out)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score collision records for severity")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--encoding", default=ENCODING_FILE)
+    parser.add_argument("--data", default=MERGED_FILE, help="merged dataset to sample records from")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--input", help="CSV (or dataset with a columnar copy) to score")
+    parser.add_argument("--output", help="where --input's scores go (default: <input>_scores.csv)")
+    args = parser.parse_args(argv)
+
+    with Run("predict", os.path.join(os.path.dirname(args.model) or ".", REPORT_DIR_NAME)) as run:
+        with run.stage("load_model", inputs=[args.model, args.encoding]):
+            predictor = SeverityPredictor(args.model, args.encoding)
+        if args.input:
+            output = args.output or os.path.splitext(args.input)[0] + "_scores.csv"
+            with run.stage("score_file", inputs=[args.input], outputs=[output]) as stage:
+                rows = score_file(predictor, args.input, output)
+                stage.count(rows)
+            print(f"Scores for {rows} records saved to: {output}")
+            return
+        with run.stage("load_sample") as stage:
+            # Only the first chunk is read, however many years the dataset holds
+            sample = next(iter_table(args.data, chunksize=SAMPLE_ROWS), pd.DataFrame())
+            stage.count(len(sample))
+        if args.benchmark:
+            with run.stage("benchmark") as stage:
+                stage.extra["results"] = benchmark(predictor, sample)
+        else:
+            with run.stage("score") as stage:
+                for record in sample.head(5).to_dict("records"):
+                    print(record.get("accident_index"), predictor.score(record))
+                stage.count(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# render.py
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# =========================
+# Cached, parallel chart rendering
+# =========================
+# Charts are described by a spec (kind, titles, file name) plus the small
+# aggregate they plot (value counts, histogram bins, a correlation matrix),
+# never the full DataFrame. Each PNG is cached under a hash of spec + data:
+# unchanged charts are copied from the cache, the rest are drawn in a
+# process pool, one figure per task.
+CACHE_DIR_NAME = ".chart_cache"
+# Annotating every heatmap cell is what makes wide heatmaps slow
+ANNOTATE_MAX_COLUMNS = 12
+
+
+# ---- aggregates (computed once in the caller) -----------------------------
+# Every builder takes an aggregate the caller already has (usually from the
+# statistics artifact), so drawing a chart never needs the rows themselves.
+def counts_bar_spec(counts, filename, title, xlabel=None, ylabel="Count", sort_index=True, figsize=(8, 6)):
+    """Bar chart of precomputed value counts."""
+    if sort_index:
+        counts = counts.sort_index()
+    return {
+        "kind": "bar", "filename": filename, "title": title, "figsize": list(figsize),
+        "xlabel": xlabel or counts.name, "ylabel": ylabel,
+        "data": {"labels": [str(v) for v in counts.index], "counts": counts.astype(int).tolist()},
+    }
+
+
+def counts_hist_spec(counts, filename, title, bins=20, xlabel=None, ylabel="Count"):
+    """Histogram of precomputed value counts; same bins as the raw values would give."""
+    binned, edges = np.histogram(counts.index.to_numpy(dtype=float), bins=bins, weights=counts.to_numpy())
+    return {
+        "kind": "hist", "filename": filename, "title": title,
+        "xlabel": xlabel or counts.name, "ylabel": ylabel,
+        "data": {"counts": binned.astype(int).tolist(), "edges": edges.tolist()},
+    }
+
+
+def corr_heatmap_spec(corr, filename, title):
+    """Heatmap of a precomputed correlation matrix."""
+    return {
+        "kind": "heatmap", "filename": filename, "title": title,
+        "data": {"labels": [str(c) for c in corr.columns], "matrix": np.round(corr.to_numpy(), 4).tolist()},
+    }
+
+
+def counts_scatter_spec(pairs, filename, title, xlabel=None, ylabel=None):
+    """Scatter of precomputed counts of (x, y) value pairs."""
+    # Coded counts overlap heavily, so plot distinct (x, y) pairs sized by frequency
+    xs, ys = pairs.index.get_level_values(0), pairs.index.get_level_values(1)
+    return {
+        "kind": "scatter", "filename": filename, "title": title,
+        "xlabel": xlabel or xs.name, "ylabel": ylabel or ys.name,
+        "data": {
+            "x": [float(v) for v in xs],
+            "y": [float(v) for v in ys],
+            "counts": pairs.astype(int).tolist(),
+        },
+    }
+
+
+# ---- drawing (runs in worker processes) ----------------------------------
+def _draw(spec, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    data = spec["data"]
+    kind = spec["kind"]
+    if kind == "heatmap":
+        n = len(data["labels"])
+        fig, ax = plt.subplots(figsize=(max(6, 0.45 * n + 2), max(5, 0.4 * n + 2)))
+        matrix = np.array(data["matrix"], dtype=float)
+        im = ax.imshow(matrix, cmap="coolwarm", vmin=-1, vmax=1)
+        ax.set_xticks(range(n), data["labels"], rotation=90, fontsize=7)
+        ax.set_yticks(range(n), data["labels"], fontsize=7)
+        fig.colorbar(im, ax=ax)
+        if n <= ANNOTATE_MAX_COLUMNS:
+            for i in range(n):
+                for j in range(n):
+                    if not np.isnan(matrix[i, j]):
+                        ax.text(j, i, f"{matrix[i, j]:.2f}", ha="center", va="center", fontsize=7)
+    else:
+        fig, ax = plt.subplots(figsize=tuple(spec.get("figsize", (8, 6))))
+        if kind == "bar":
+            colors = plt.cm.viridis(np.linspace(0, 1, max(len(data["counts"]), 1)))
+            ax.bar(data["labels"], data["counts"], color=colors)
+        elif kind == "hist":
+            edges = np.array(data["edges"])
+            ax.bar(edges[:-1], data["counts"], width=np.diff(edges), align="edge", color="orange", edgecolor="white")
+        elif kind == "scatter":
+            counts = np.array(data["counts"], dtype=float)
+            ax.scatter(data["x"], data["y"], s=10 + 190 * counts / max(counts.max(), 1), alpha=0.6)
+        else:
+            raise ValueError(f"Unknown chart kind: {kind}")
+        ax.set_xlabel(spec.get("xlabel") or "")
+        ax.set_ylabel(spec.get("ylabel") or "")
+    ax.set_title(spec["title"])
+    fig.tight_layout()
+    fig.savefig(path, format="png")
+    plt.close(fig)
+    return path
+
+
+def chart_key(spec):
+    return hashlib.blake2b(json.dumps(spec, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def render_charts(specs, out_dir, workers=None):
+    """Write every spec's PNG into out_dir and return {filename: path}.
+
+    Charts whose spec and data hash is already cached are copied, not redrawn.
+    """
+    cache_dir = os.path.join(out_dir, CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    todo = {}
+    for spec in specs:
+        cached = os.path.join(cache_dir, chart_key(spec) + ".png")
+        if not os.path.exists(cached):
+            todo[cached] = spec
+
+    if todo:
+        workers = min(workers or os.cpu_count() or 1, len(todo))
+        if workers == 1:
+            for cached, spec in todo.items():
+                _draw(spec, cached)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_draw, todo.values(), todo.keys()))
+    print(f"Charts: {len(todo)} rendered, {len(specs) - len(todo)} reused from cache.")
+
+    paths = {}
+    for spec in specs:
+        cached = os.path.join(cache_dir, chart_key(spec) + ".png")
+        target = os.path.join(out_dir, spec["filename"])
+        shutil.copyfile(cached, target)
+        paths[spec["filename"]] = target
+    return paths
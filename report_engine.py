@@ -0,0 +1,358 @@
+# report_engine.py
+import argparse
+import math
+import os
+from contextlib import nullcontext
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from render import counts_bar_spec, render_charts
+from schema import find_column
+
+# =========================
+# Streaming PDF report engine
+# =========================
+# The three reports (basic summary, summary + charts, IEEE-style paper) are
+# built from the statistics artifact, never the data. ReportData gathers
+# what they draw in one pass: the numeric summary, the describe() table and
+# the charts, rendered once and decoded once. Each report is a generator of
+# flowables that doc.build consumes as it lays out pages, so only a page or
+# so of flowables is alive at a time. Large tables are emitted in row chunks
+# and column groups that fit the page, rather than one Table holding every
+# cell. Severity breakdowns come from the severity cubes (cubes.py) when given.
+PLOTS_DIR = "../plots"
+PAGE_MARGIN = 50
+# Rows per emitted table; each chunk repeats the header
+TABLE_ROWS = 40
+# describe() columns per table, so wide summaries fit across the page
+TABLE_GROUPS = (("count", "unique", "top", "freq", "exact"),
+                ("mean", "std", "min", "25%", "50%", "75%", "max"))
+# Flowables pulled ahead of the one being laid out (keepWithNext looks ahead)
+LOOKAHEAD = 8
+
+AUTHOR = "IBRAHIM AKINTUNDE AKINYERA"
+REPORT_TITLE = "Road Accident Data Report"
+CHART_COLUMNS = ("Accident_Severity", "Vehicle_Type", "Casualty_Severity")  # adjust to your dataset
+PIPELINE_DIAGRAM = "pipeline_diagram.png"
+# (title, dimensions) of the severity share tables in the IEEE report
+BREAKDOWNS = (("Severity share by speed limit", ("speed_limit",)),
+              ("Severity share by light conditions", ("light_conditions",)),
+              ("Severity share by weather conditions", ("weather_conditions",)),
+              ("Severity share by year", ("accident_year",)))
+
+IEEE_TITLE = "Road Accident Severity Analysis and Predictive Modeling"
+IEEE_AUTHOR = "Akinyera Ibrahim"
+IEEE_FRONT = ("Personal Project", "September 2025")
+IEEE_ABSTRACT = """
+This report presents a comprehensive analysis of road accident severity using a merged dataset of collisions, casualties, and vehicles.
+The project explores patterns, visualizes distributions, and prepares the data for predictive modeling using machine learning techniques.
+This study aims to provide actionable insights to improve road safety and establish a machine learning pipeline capable of predicting accident severity.
+"""
+IEEE_INTRODUCTION = """
+Road traffic accidents are a significant global concern, leading to loss of life and economic impact.
+Analyzing accident data is critical for understanding contributing factors and predicting high-risk scenarios.
+This study uses UK road accident data to examine collision patterns, casualties, and vehicle involvement to model accident severity.
+"""
+IEEE_METHODOLOGY = """
+The methodology of this study involves several stages:
+1. Data acquisition and merging of collisions, casualties, and vehicle datasets.
+2. Data cleaning to handle missing values and ensure consistency.
+3. Feature engineering to create predictive attributes.
+4. Exploratory data analysis (EDA) to identify trends and distributions.
+5. Machine learning preparation, including encoding and scaling features.
+6. Model training and evaluation using advanced algorithms such as Random Forest and Gradient Boosting.
+"""
+IEEE_PIPELINE = """
+The data pipeline consists of the following stages:
+- Data Loading & Merging
+- Data Cleaning & Preprocessing
+- Feature Engineering
+- Machine Learning Dataset Preparation
+- Model Training and Evaluation
+The pipeline ensures reproducibility and rigorous preparation of features for predictive modeling.
+"""
+IEEE_RESULTS = """
+The results indicate significant patterns in accident severity:
+- Certain road types and light/weather conditions correlate with higher severity.
+- Vehicle type and casualty characteristics affect the severity outcome.
+- Predictive models trained on this dataset can achieve high accuracy and support road safety interventions.
+"""
+IEEE_CONCLUSION = """
+This report provides a rigorous analysis of road accident severity and prepares a dataset suitable for predictive modeling.
+The methodology and pipeline described ensure reproducibility and scientific rigor, meeting MSc/PhD-level standards.
+"""
+IEEE_REFERENCES = """
+[1] Department for Transport, "Reported Road Casualties in Great Britain: 2023 Annual Report", DfT, UK.
+[2] Pedregosa et al., "Scikit-learn: Machine Learning in Python", Journal of Machine Learning Research, 2011.
+[3] Bishop, C.M., "Pattern Recognition and Machine Learning", Springer, 2006.
+"""
+
+
+# ---- building blocks -------------------------------------------------------
+class FlowableStream(list):
+    """A story filled from a generator while doc.build consumes it.
+
+    build() checks len() before every flowable; topping the list up there
+    keeps only LOOKAHEAD flowables queued instead of the whole report.
+    """
+
+    def __init__(self, flowables, lookahead=LOOKAHEAD):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return list.__len__(self)
+
+
+class ChartImage(Flowable):
+    """Draws a shared ImageReader, so an image is decoded once for every report."""
+
+    def __init__(self, reader, width, height):
+        super().__init__()
+        self.reader = reader
+        self.width = width
+        self.height = height
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height)
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def table_chunks(frame, groups=TABLE_GROUPS, rows=TABLE_ROWS, font_size=7, index_label="column"):
+    """Yield a frame as page-sized Tables: column groups, then row chunks, header repeated."""
+    style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), font_size),
+    ])
+    for group in groups:
+        columns = [c for c in group if c in frame.columns]
+        if not columns:
+            continue
+        header = [index_label] + [str(c) for c in columns]
+        for start in range(0, len(frame), rows):
+            part = frame.iloc[start:start + rows][columns]
+            body = [[name] + [_cell(v) for v in values] for name, values in zip(part.index, part.itertuples(index=False))]
+            table = Table([header] + body, repeatRows=1)
+            table.setStyle(style)
+            yield table
+            yield Spacer(1, 12)
+
+
+def chart_specs(stats, columns=CHART_COLUMNS):
+    """Bar charts of the chart columns' value counts (exact counts only)."""
+    specs = []
+    for col in columns:
+        found = find_column(stats.columns, col)
+        counts = stats.columns[found].value_counts(found) if found else None
+        if counts is not None:
+            specs.append(counts_bar_spec(counts, f"report_{found.lower()}.png", f"{col} Distribution",
+                                         xlabel=col, sort_index=False, figsize=(6, 4)))
+    return specs
+
+
+def breakdown_tables(cubes, breakdowns=BREAKDOWNS):
+    """(title, dimension, table) per breakdown the cubes can answer: severity shares and totals."""
+    tables = []
+    for title, dims in breakdowns:
+        try:
+            table = cubes.query(dims, rates=True)
+        except KeyError:
+            continue
+        severities = [c for c in table.columns if c != "total"]
+        table[severities] = table[severities].round(4)
+        tables.append((title, ", ".join(dims), table))
+    return tables
+
+
+class ReportData:
+    """Everything the reports draw, gathered in one pass over the statistics artifact."""
+
+    def __init__(self, stats, plots_dir=PLOTS_DIR, charts=True, cubes=None):
+        self.rows = stats.rows
+        self.n_columns = len(stats.columns)
+        self.numeric = [(name, stats.columns[name]) for name in stats.numeric_columns()
+                        if stats.columns[name].count]
+        self.describe = stats.describe()
+        # (title, reader) per chart; readers cache the decoded pixels across reports
+        self.charts = []
+        if charts:
+            specs = chart_specs(stats)
+            paths = render_charts(specs, plots_dir)
+            self.charts = [(spec["title"], ImageReader(paths[spec["filename"]])) for spec in specs]
+        self.breakdowns = breakdown_tables(cubes) if cubes is not None else []
+        diagram = os.path.join(plots_dir, PIPELINE_DIAGRAM)
+        self.diagram = ImageReader(diagram) if os.path.exists(diagram) else None
+
+
+def _styles():
+    styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle("ReportTitle", fontName="Helvetica-Bold", fontSize=20, leading=24,
+                                alignment=TA_CENTER, spaceAfter=18),
+        "info": ParagraphStyle("ReportInfo", fontName="Helvetica", fontSize=12, leading=20),
+        "heading": ParagraphStyle("ReportHeading", fontName="Helvetica-Bold", fontSize=14, leading=20,
+                                  spaceBefore=20),
+        "line": ParagraphStyle("ReportLine", fontName="Helvetica", fontSize=12, leading=15, leftIndent=10),
+        "normal": styles["Normal"],
+        "h1": styles["Heading1"],
+        "h2": styles["Heading2"],
+        "h3": styles["Heading3"],
+    }
+
+
+# ---- report variants -------------------------------------------------------
+def basic_flowables(data, styles):
+    yield Paragraph(REPORT_TITLE, styles["title"])
+    yield Paragraph(f"Author: {AUTHOR}", styles["info"])
+    yield Paragraph(f"Total records: {data.rows}", styles["info"])
+    yield Paragraph(f"Total columns: {data.n_columns}", styles["info"])
+    yield Paragraph("Summary Statistics", styles["heading"])
+    for name, col in data.numeric:
+        yield Paragraph(f"{name}: mean={col.mean:.2f}, min={col.min}, max={col.max}", styles["line"])
+
+
+def charts_flowables(data, styles):
+    yield from basic_flowables(data, styles)
+    for _, reader in data.charts:
+        yield PageBreak()
+        yield Spacer(1, 150)
+        yield ChartImage(reader, 500, 400)
+
+
+def ieee_flowables(data, styles):
+    normal, h2 = styles["normal"], styles["h2"]
+    yield Paragraph(IEEE_TITLE, styles["h1"])
+    yield Spacer(1, 12)
+    yield Paragraph(f"Author: {IEEE_AUTHOR}", h2)
+    yield Spacer(1, 12)
+    for line in IEEE_FRONT:
+        yield Paragraph(line, normal)
+    yield Spacer(1, 24)
+    for heading, text, space in (("Abstract", IEEE_ABSTRACT, 24), ("1. Introduction", IEEE_INTRODUCTION, 12)):
+        yield Paragraph(heading, h2)
+        yield Paragraph(text, normal)
+        yield Spacer(1, space)
+
+    yield Paragraph("2. Data Summary", h2)
+    yield Paragraph(f"{data.rows} records, {data.n_columns} columns. Values marked exact=False are "
+                    f"sketch estimates.", normal)
+    yield Spacer(1, 12)
+    yield from table_chunks(data.describe)
+    yield Spacer(1, 12)
+
+    yield Paragraph("3. Methodology", h2)
+    yield Paragraph(IEEE_METHODOLOGY, normal)
+    yield Spacer(1, 12)
+
+    yield Paragraph("4. Exploratory Data Analysis (EDA)", h2)
+    yield Spacer(1, 12)
+    for title, reader in data.charts:
+        yield Paragraph(title, styles["h3"])
+        yield Spacer(1, 6)
+        yield ChartImage(reader, 400, 250)
+        yield Spacer(1, 12)
+    if not data.charts:
+        yield Paragraph("No charts available for this dataset.", normal)
+        yield Spacer(1, 12)
+    for title, label, table in data.breakdowns:
+        yield Paragraph(title, styles["h3"])
+        yield from table_chunks(table, groups=[list(table.columns)], index_label=label)
+
+    yield Paragraph("5. Data Pipeline & Machine Learning Preparation", h2)
+    yield Paragraph(IEEE_PIPELINE, normal)
+    yield Spacer(1, 12)
+    if data.diagram is not None:
+        yield ChartImage(data.diagram, 400, 250)
+    else:
+        yield Paragraph("Pipeline diagram not found.", normal)
+    yield Spacer(1, 12)
+
+    for heading, text in (("6. Results & Discussion", IEEE_RESULTS), ("7. Conclusion", IEEE_CONCLUSION),
+                          ("References", IEEE_REFERENCES)):
+        yield Paragraph(heading, h2)
+        yield Paragraph(text, normal)
+        yield Spacer(1, 12)
+
+
+VARIANTS = {
+    "basic": basic_flowables,
+    "charts": charts_flowables,
+    "ieee": ieee_flowables,
+}
+
+
+def build_report(data, variant, pdf_path):
+    doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=PAGE_MARGIN, leftMargin=PAGE_MARGIN,
+                            topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN)
+    doc.build(FlowableStream(VARIANTS[variant](data, _styles())))
+    return pdf_path
+
+
+def build_reports(stats, targets, plots_dir=PLOTS_DIR, run=None, cubes=None):
+    """Build each {variant: pdf_path} in targets from one ReportData; returns the paths.
+
+    With a Run, the shared data pass and every report are recorded as stages.
+    With SeverityCubes, the IEEE report adds the BREAKDOWNS tables.
+    """
+    unknown = set(targets) - set(VARIANTS)
+    if unknown:
+        raise ValueError(f"Unknown report variants: {sorted(unknown)} (choose from {sorted(VARIANTS)})")
+    stage = run.stage if run is not None else (lambda name, **kwargs: nullcontext())
+    with stage("report_data"):
+        data = ReportData(stats, plots_dir, charts=bool({"charts", "ieee"} & set(targets)), cubes=cubes)
+    for variant, pdf_path in targets.items():
+        os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+        with stage(f"report_{variant}", outputs=[pdf_path]):
+            build_report(data, variant, pdf_path)
+        print(f"PDF report ({variant}) generated: {pdf_path}")
+    return targets
+
+
+def main(argv=None):
+    from cubes import load_cubes
+    from instrument import REPORT_DIR_NAME, Run
+    from stats import load_stats
+
+    parser = argparse.ArgumentParser(description="Build the PDF reports from the statistics artifact")
+    parser.add_argument("--data", default="../data/merged_road_accidents.csv")
+    parser.add_argument("--out-dir", default="../Docs")
+    parser.add_argument("--plots-dir", default=PLOTS_DIR)
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=sorted(VARIANTS))
+    args = parser.parse_args(argv)
+
+    names = {"basic": "Road_Accident_Report.pdf", "charts": "Road_Accident_Report_Charts.pdf",
+             "ieee": "Road_Accident_Severity_IEEE_Report.pdf"}
+    with Run("reports", os.path.join(os.path.dirname(args.data) or ".", REPORT_DIR_NAME)) as run:
+        with run.stage("stats", inputs=[args.data]) as record:
+            stats = load_stats(args.data)
+            record.count(stats.rows)
+        with run.stage("cubes", inputs=[args.data]):
+            cubes = load_cubes(args.data)
+        build_reports(stats, {v: os.path.join(args.out_dir, names[v]) for v in args.variants}, args.plots_dir, run,
+                      cubes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# schema.py
+import os
+import pandas as pd
+
+# =========================
+# DfT dtype registry
+# =========================
+# Narrowest dtype for each column of the three DfT road safety tables, keyed by
+# the lower-case column name used in the published files. Coded lookup fields
+# use -1 for "missing or out of range", so they are signed. Widths follow the
+# ranges in the DfT data guide with headroom for older years (read_csv wraps
+# silently on overflow, so never go narrower than the documented range).
+# Columns that can genuinely be blank (coordinates) stay float.
+COLLISION_DTYPES = {
+    "accident_index": "str",
+    "accident_year": "int16",
+    "accident_reference": "str",
+    "location_easting_osgr": "float64",
+    "location_northing_osgr": "float64",
+    "longitude": "float64",
+    "latitude": "float64",
+    "police_force": "int8",
+    "accident_severity": "int8",
+    "number_of_vehicles": "int16",
+    "number_of_casualties": "int16",
+    "date": "str",
+    "day_of_week": "int8",
+    "time": "str",
+    "local_authority_district": "int16",
+    "local_authority_ons_district": "category",
+    "local_authority_highway": "category",
+    "first_road_class": "int8",
+    "first_road_number": "int16",
+    "road_type": "int8",
+    "speed_limit": "int8",
+    "junction_detail": "int8",
+    "junction_control": "int8",
+    "second_road_class": "int8",
+    "second_road_number": "int16",
+    "pedestrian_crossing_human_control": "int8",
+    "pedestrian_crossing_physical_facilities": "int8",
+    "light_conditions": "int8",
+    "weather_conditions": "int8",
+    "road_surface_conditions": "int8",
+    "special_conditions_at_site": "int8",
+    "carriageway_hazards": "int8",
+    "urban_or_rural_area": "int8",
+    "did_police_officer_attend_scene_of_accident": "int8",
+    "trunk_road_flag": "int8",
+    "lsoa_of_accident_location": "category",
+    "enhanced_severity_collision": "int8",
+}
+
+CASUALTY_DTYPES = {
+    "accident_index": "str",
+    "accident_year": "int16",
+    "accident_reference": "str",
+    "vehicle_reference": "int16",
+    "casualty_reference": "int16",
+    "casualty_class": "int8",
+    "sex_of_casualty": "int8",
+    "age_of_casualty": "int16",
+    "age_band_of_casualty": "int8",
+    "casualty_severity": "int8",
+    "pedestrian_location": "int8",
+    "pedestrian_movement": "int8",
+    "car_passenger": "int8",
+    "bus_or_coach_passenger": "int8",
+    "pedestrian_road_maintenance_worker": "int8",
+    "casualty_type": "int8",
+    "casualty_home_area_type": "int8",
+    "casualty_imd_decile": "int8",
+    "lsoa_of_casualty": "category",
+    "enhanced_casualty_severity": "int8",
+    "casualty_distance_banding": "int8",
+}
+
+VEHICLE_DTYPES = {
+    "accident_index": "str",
+    "accident_year": "int16",
+    "accident_reference": "str",
+    "vehicle_reference": "int16",
+    "vehicle_type": "int8",
+    "towing_and_articulation": "int8",
+    "vehicle_manoeuvre": "int8",
+    "vehicle_direction_from": "int8",
+    "vehicle_direction_to": "int8",
+    "vehicle_location_restricted_lane": "int8",
+    "junction_location": "int8",
+    "skidding_and_overturning": "int8",
+    "hit_object_in_carriageway": "int8",
+    "vehicle_leaving_carriageway": "int8",
+    "hit_object_off_carriageway": "int8",
+    "first_point_of_impact": "int8",
+    "vehicle_left_hand_drive": "int8",
+    "journey_purpose_of_driver": "int8",
+    "sex_of_driver": "int8",
+    "age_of_driver": "int16",
+    "age_band_of_driver": "int8",
+    "engine_capacity_cc": "int32",
+    "propulsion_code": "int8",
+    "age_of_vehicle": "int16",
+    "generic_make_model": "category",
+    "driver_imd_decile": "int8",
+    "driver_home_area_type": "int8",
+    "lsoa_of_driver": "category",
+    "escooter_flag": "int8",
+    "dir_from_e": "float64",
+    "dir_from_n": "float64",
+    "dir_to_e": "float64",
+    "dir_to_n": "float64",
+    "driver_distance_banding": "int8",
+}
+
+SCHEMAS = {
+    "collisions": COLLISION_DTYPES,
+    "casualties": CASUALTY_DTYPES,
+    "vehicles": VEHICLE_DTYPES,
+}
+
+
+def table_for_path(path):
+    """Guess which DfT table a file holds from its name (collision/casualty/vehicle)."""
+    fname = os.path.basename(path).lower()
+    if "collision" in fname:
+        return "collisions"
+    if "casualt" in fname:
+        return "casualties"
+    if "vehicle" in fname:
+        return "vehicles"
+    return None
+
+
+def dtypes_for(columns, table):
+    """Map the header names actually present in a file to registry dtypes.
+
+    Matching is case-insensitive so older exports (Accident_Index, Road_Type)
+    resolve to the same entries as the current lower-case files. Unknown
+    columns are left for pandas to infer.
+    """
+    registry = SCHEMAS.get(table, {})
+    return {col: registry[col.lower()] for col in columns if col.lower() in registry}
+
+
+def read_dtypes(path, table=None):
+    table = table or table_for_path(path)
+    header = pd.read_csv(path, nrows=0).columns
+    return dtypes_for(header, table)
+
+
+def find_column(columns, name):
+    """Return the header name matching name case-insensitively, or None."""
+    wanted = name.lower()
+    for col in columns:
+        if col.lower() == wanted:
+            return col
+    return None
+
+
+def _split_dtypes(dtype):
+    """(dtypes read_csv can apply, numeric dtypes to cast to afterwards)."""
+    # str/category accept any cell; numeric columns are parsed by inference
+    # and cast per column, so one stray blank or word cannot fail a read
+    text = {col: t for col, t in dtype.items() if t in ("str", "category")}
+    return text, {col: t for col, t in dtype.items() if col not in text}
+
+
+def _cast(df, numeric, path, table, warned):
+    """Cast each column to its registry dtype if its values fit; warn once per column that does not."""
+    for col, target in numeric.items():
+        if col not in df.columns:
+            continue
+        s = df[col]
+        fits = pd.api.types.is_integer_dtype(s) if target.startswith("int") else pd.api.types.is_numeric_dtype(s)
+        if fits:
+            df[col] = s.astype(target)
+        elif col not in warned:
+            warned.add(col)
+            print(f"WARNING: {path} column {col} does not fit the {table or table_for_path(path)} schema "
+                  f"({target}, read as {s.dtype}); keeping inferred values.")
+    return df
+
+
+def iter_table_csv(path, table=None, chunksize=250_000, **kwargs):
+    """Yield read_csv chunks with the registry dtypes for the given DfT table.
+
+    Each chunk falls back to inferred dtypes only for the columns whose
+    values do not fit (a blank or a word in an integer column), exactly as
+    read_table_csv does for the whole file, so a bad row deep in a file
+    never stops the stream.
+    """
+    text, numeric = _split_dtypes(read_dtypes(path, table))
+    warned = set()
+    for chunk in pd.read_csv(path, dtype=text, chunksize=chunksize, low_memory=False, **kwargs):
+        yield _cast(chunk, numeric, path, table, warned)
+
+
+def read_table_csv(path, table=None, **kwargs):
+    """read_csv with the registry dtypes for the given DfT table.
+
+    If a file does not fit the registry (e.g. a blank in an integer column),
+    the columns that do not fit keep inferred dtypes instead of failing the run.
+    """
+    dtype = read_dtypes(path, table)
+    try:
+        return pd.read_csv(path, dtype=dtype, **kwargs)
+    except (ValueError, TypeError):
+        text, numeric = _split_dtypes(dtype)
+        return _cast(pd.read_csv(path, dtype=text, low_memory=False, **kwargs), numeric, path, table, set())
@@ -0,0 +1,296 @@
+# serve.py
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from predict import ENCODING_FILE, MODEL_FILE, SeverityPredictor
+
+# =========================
+# Local severity scoring service
+# =========================
+# Plain asyncio HTTP/1.1 (keep-alive) in front of a micro-batcher: concurrent
+# requests are queued and scored together, one model call per batch of up to
+# MAX_BATCH_SIZE rows or MAX_WAIT_MS of waiting, whichever comes first.
+# Each request is parsed and encoded in a thread pool before it joins a
+# batch, so a large body never stalls the event loop and a malformed record
+# is answered with a 400 on its own, without failing the rest of its batch.
+#   POST /predict   {"records": [...]} or a single record object
+#   GET  /healthz   process is up
+#   GET  /readyz    model loaded and batcher running (503 until then)
+#   GET  /metrics   Prometheus text: queue depth, batch size histogram, ...
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_BATCH_SIZE = 512
+MAX_WAIT_MS = 5.0
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Threads that parse and encode request bodies off the event loop
+ENCODE_WORKERS = 2
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class MicroBatcher:
+    def __init__(self, predictor, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.queued_rows = 0
+        # The model call runs off the event loop so requests keep being accepted
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batch_counts = [0] * (len(BATCH_BUCKETS) + 1)
+        self.batches = 0
+        self.rows = 0
+        self.model_seconds = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def submit(self, X):
+        """Probabilities for an encoded feature matrix, scored with whatever else is queued."""
+        future = asyncio.get_running_loop().create_future()
+        self.queued_rows += len(X)
+        await self.queue.put((X, future))
+        return await future
+
+    async def _collect(self):
+        items = [await self.queue.get()]
+        rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items, rows
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items, rows = await self._collect()
+            self.queued_rows -= rows
+            X = items[0][0] if len(items) == 1 else np.vstack([batch for batch, _ in items])
+            start = time.perf_counter()
+            try:
+                proba = await loop.run_in_executor(self.executor, self.predictor.predict_proba, X)
+            except Exception:
+                # Score the requests one by one, so a failure only reaches its own request
+                for batch, future in items:
+                    try:
+                        result = await loop.run_in_executor(self.executor, self.predictor.predict_proba, batch)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                        continue
+                    if not future.done():
+                        future.set_result(result.tolist())
+                self.model_seconds += time.perf_counter() - start
+                self._observe(rows)
+                continue
+            self.model_seconds += time.perf_counter() - start
+            self._observe(rows)
+            offset = 0
+            for batch, future in items:
+                if not future.done():
+                    future.set_result(proba[offset:offset + len(batch)].tolist())
+                offset += len(batch)
+
+    def _observe(self, rows):
+        self.batches += 1
+        self.rows += rows
+        for i, bound in enumerate(BATCH_BUCKETS):
+            if rows <= bound:
+                self.batch_counts[i] += 1
+                break
+        else:
+            self.batch_counts[-1] += 1
+
+
+class ScoringServer:
+    def __init__(self, model_path=MODEL_FILE, encoding_path=ENCODING_FILE,
+                 max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model_path = model_path
+        self.encoding_path = encoding_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.predictor = None
+        self.batcher = None
+        self.encoder = ThreadPoolExecutor(max_workers=ENCODE_WORKERS)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.started = time.time()
+
+    async def load(self):
+        # Loading can take seconds; the server answers /healthz meanwhile
+        loop = asyncio.get_running_loop()
+        self.predictor = await loop.run_in_executor(
+            None, SeverityPredictor, self.model_path, self.encoding_path)
+        self.batcher = MicroBatcher(self.predictor, self.max_batch_size, self.max_wait_ms)
+        self.batcher.start()
+        print("Model loaded; ready to score.")
+
+    @property
+    def ready(self):
+        return self.batcher is not None and self.batcher.running
+
+    # ---- HTTP -------------------------------------------------------------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": "request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                status, payload, content_type = await self.route(method, path, body)
+                await self.respond(writer, status, payload, content_type, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, content_type="application/json", close=False):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                   500: "Internal Server Error", 503: "Service Unavailable"}
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def route(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if method == "GET" and path == "/healthz":
+            return 200, {"status": "ok", "uptime_seconds": round(time.time() - self.started, 1)}, "application/json"
+        if method == "GET" and path == "/readyz":
+            return (200, {"ready": True}, "application/json") if self.ready else (503, {"ready": False}, "application/json")
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics(), "text/plain; version=0.0.4"
+        if method == "POST" and path == "/predict":
+            return await self.predict(body)
+        return 404, {"error": f"no route for {method} {path}"}, "application/json"
+
+    async def predict(self, body):
+        if not self.ready:
+            return 503, {"error": "model not loaded"}, "application/json"
+        self.requests += 1
+        try:
+            X = await asyncio.get_running_loop().run_in_executor(self.encoder, self.encode, body)
+        except ValueError as e:
+            self.errors += 1
+            return 400, {"error": str(e)}, "application/json"
+        if X is None:
+            return 200, {"classes": self.predictor.classes, "probabilities": []}, "application/json"
+        self.in_flight += 1
+        try:
+            proba = await self.batcher.submit(X)
+        except Exception as e:
+            self.errors += 1
+            return 500, {"error": str(e)}, "application/json"
+        finally:
+            self.in_flight -= 1
+        return 200, {"classes": self.predictor.classes, "probabilities": proba}, "application/json"
+
+    def encode(self, body):
+        """Feature matrix for a request body (None if it has no records); ValueError if it is malformed."""
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}")
+        records = payload.get("records", [payload]) if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise ValueError("expected a record object or {\"records\": [...]}")
+        if not records:
+            return None
+        try:
+            return self.predictor.encode(records)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"invalid record: {e}")
+
+    def metrics(self):
+        b = self.batcher
+        lines = [
+            "# TYPE scoring_requests_total counter",
+            f"scoring_requests_total {self.requests}",
+            "# TYPE scoring_errors_total counter",
+            f"scoring_errors_total {self.errors}",
+            "# TYPE scoring_in_flight gauge",
+            f"scoring_in_flight {self.in_flight}",
+            "# TYPE scoring_ready gauge",
+            f"scoring_ready {int(self.ready)}",
+        ]
+        if b is not None:
+            lines += [
+                "# TYPE scoring_queue_depth gauge",
+                f"scoring_queue_depth {b.queue.qsize()}",
+                "# TYPE scoring_queue_rows gauge",
+                f"scoring_queue_rows {b.queued_rows}",
+                "# TYPE scoring_rows_total counter",
+                f"scoring_rows_total {b.rows}",
+                "# TYPE scoring_model_seconds_total counter",
+                f"scoring_model_seconds_total {b.model_seconds:.6f}",
+                "# TYPE scoring_batch_size histogram",
+            ]
+            cumulative = 0
+            for bound, count in zip(BATCH_BUCKETS, b.batch_counts):
+                cumulative += count
+                lines.append(f'scoring_batch_size_bucket{{le="{bound}"}} {cumulative}')
+            lines += [
+                f'scoring_batch_size_bucket{{le="+Inf"}} {b.batches}',
+                f"scoring_batch_size_sum {b.rows}",
+                f"scoring_batch_size_count {b.batches}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+async def serve(host=HOST, port=PORT, **kwargs):
+    app = ScoringServer(**kwargs)
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"Scoring service listening on http://{host}:{port}")
+    await app.load()
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP severity scoring service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--encoding", default=ENCODING_FILE)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port, model_path=args.model, encoding_path=args.encoding,
+                      max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms))
+
+
+if __name__ == "__main__":
+    main()
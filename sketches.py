@@ -0,0 +1,364 @@
+# sketches.py
+import base64
+import math
+import zlib
+import numpy as np
+import pandas as pd
+
+# =========================
+# Mergeable streaming sketches
+# =========================
+# Fixed-size summaries that are updated chunk by chunk and merged across
+# chunks, years or worker processes, so per-column statistics over decades
+# of data stay in constant memory:
+#   KLLSketch       quantiles, rank error ~ quantile_error
+#   HyperLogLog     distinct counts, relative error ~ 1.04 / sqrt(registers)
+#   FrequencySketch count-min counts plus a bounded candidate set for top-k
+# All three take pre-aggregated input (distinct values and their counts per
+# chunk), which is what pandas' value_counts() already produces.
+#   ReservoirSample    uniform sample of whole rows, at most capacity kept
+#   StratifiedSample   one reservoir per label, e.g. a validation set that
+#                      keeps the rare classes however large the data grows
+QUANTILE_ERROR = 0.01
+DISTINCT_ERROR = 0.02
+FREQUENCY_ERROR = 0.005
+FREQUENCY_CONFIDENCE = 0.99
+TOP_CANDIDATES = 64
+
+
+def hash_keys(keys):
+    """64-bit hashes of string keys, stable across processes and runs."""
+    # Callers pass distinct keys, so pandas' factorize-first shortcut only costs time
+    return pd.util.hash_array(np.asarray(keys, dtype=object), categorize=False)
+
+
+def _pack(array):
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes())).decode("ascii")
+
+
+def _unpack(text, dtype, shape):
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).reshape(shape).copy()
+
+
+def _bit_length(x):
+    # Exact bit length of uint64 values (no float rounding near powers of two)
+    x = x.copy()
+    n = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        n[big] += shift
+        x[big] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+class KLLSketch:
+    """KLL quantile sketch; k follows from the target rank error."""
+
+    def __init__(self, error=QUANTILE_ERROR, k=None):
+        self.k = k or max(8, math.ceil(1.7 / error))
+        self.n = 0
+        self.levels = [np.empty(0)]
+        # Unseeded on purpose: sketches merged from parts must not share coin flips
+        self._rng = np.random.default_rng()
+
+    def _capacity(self, h):
+        return max(2, math.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - h)))
+
+    def update(self, values, weights=None):
+        """Add values; integer weights are inserted exactly by their binary digits."""
+        values = np.asarray(values, dtype=float)
+        if weights is None:
+            weights = np.ones(len(values), dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.int64)
+        keep = ~np.isnan(values) & (weights > 0)
+        values, weights = values[keep], weights[keep]
+        self.n += int(weights.sum())
+        h = 0
+        while len(values):
+            bit = (weights & 1).astype(bool)
+            while h >= len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], values[bit]])
+            weights = weights >> 1
+            values, weights = values[weights > 0], weights[weights > 0]
+            h += 1
+        self._compress()
+        return self
+
+    def _compress(self):
+        while True:
+            over = [h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h)]
+            if not over:
+                return
+            h = over[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            level = np.sort(self.levels[h])
+            # An odd item out stays behind; the rest are halved into the next level
+            leftover = level[-1:] if len(level) % 2 else level[:0]
+            pairs = level[:len(level) - len(leftover)]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], pairs[self._rng.integers(2)::2]])
+            self.levels[h] = leftover
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        if not self.n:
+            return [None for _ in qs]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cum = values[order], np.cumsum(weights[order])
+        idx = np.searchsorted(cum, [q * (cum[-1] - 1) for q in qs], side="right")
+        return [float(values[min(i, len(values) - 1)]) for i in idx]
+
+    def to_dict(self):
+        return {"k": self.k, "n": self.n, "levels": [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data["k"])
+        sketch.n = data["n"]
+        sketch.levels = [np.array(level, dtype=float) for level in data["levels"]]
+        return sketch
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit key hashes."""
+
+    def __init__(self, error=DISTINCT_ERROR, p=None):
+        self.p = p or min(18, max(4, math.ceil(math.log2((1.04 / error) ** 2))))
+        self.registers = np.zeros(1 << self.p, dtype=np.uint8)
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def update(self, keys):
+        return self.update_hashes(hash_keys(keys))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HyperLogLog with p={other.p} into p={self.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {"p": self.p, "registers": _pack(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(p=data["p"])
+        sketch.registers = _unpack(data["registers"], np.uint8, (1 << sketch.p,))
+        return sketch
+
+
+class FrequencySketch:
+    """Count-min sketch with a bounded candidate set for top-k queries.
+
+    Estimates never undercount and overcount by at most error * total with
+    the given confidence.
+    """
+
+    def __init__(self, error=FREQUENCY_ERROR, confidence=FREQUENCY_CONFIDENCE,
+                 candidates=TOP_CANDIDATES, width=None, depth=None):
+        self.width = width or math.ceil(math.e / error)
+        self.depth = depth or math.ceil(math.log(1 / (1 - confidence)))
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.capacity = candidates
+        self.candidates = {}
+        self.total = 0
+
+    def _cells(self, hashes):
+        # Kirsch-Mitzenmacher: depth hash functions from the two 32-bit halves
+        low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        high = (hashes >> np.uint64(32)).astype(np.int64)
+        return [(low + d * high) % self.width for d in range(self.depth)]
+
+    def estimate(self, keys):
+        keys = list(keys)
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        cells = self._cells(hash_keys(keys))
+        return np.min([self.table[d, idx] for d, idx in enumerate(cells)], axis=0)
+
+    def update(self, keys, counts, hashes=None):
+        keys = np.asarray(keys, dtype=object)
+        counts = np.asarray(counts, dtype=np.int64)
+        hashes = hash_keys(keys) if hashes is None else hashes
+        for d, idx in enumerate(self._cells(hashes)):
+            np.add.at(self.table[d], idx, counts)
+        self.total += int(counts.sum())
+        # Only this chunk's heaviest keys can displace existing candidates
+        heaviest = np.argsort(-counts, kind="stable")[:self.capacity]
+        self._refresh(list(self.candidates) + keys[heaviest].tolist())
+        return self
+
+    def _refresh(self, keys):
+        keys = list(dict.fromkeys(keys))
+        estimates = self.estimate(keys)
+        order = np.argsort(-estimates, kind="stable")[:self.capacity]
+        self.candidates = {keys[i]: int(estimates[i]) for i in order}
+
+    def merge(self, other):
+        if other.table.shape != self.table.shape:
+            raise ValueError("Cannot merge count-min sketches of different shapes")
+        self.table += other.table
+        self.total += other.total
+        self._refresh(list(self.candidates) + list(other.candidates))
+        return self
+
+    def top(self, k):
+        return sorted(self.candidates.items(), key=lambda kv: -kv[1])[:k]
+
+    def to_dict(self):
+        return {"width": self.width, "depth": self.depth, "capacity": self.capacity, "total": self.total,
+                "table": _pack(self.table), "candidates": [[k, n] for k, n in self.candidates.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(candidates=data["capacity"], width=data["width"], depth=data["depth"])
+        sketch.total = data["total"]
+        sketch.table = _unpack(data["table"], np.int64, (sketch.depth, sketch.width))
+        sketch.candidates = {k: n for k, n in data["candidates"]}
+        return sketch
+
+
+class ReservoirSample:
+    """Uniform random sample of up to capacity rows from a stream of chunks.
+
+    Rows are parallel arrays (e.g. a feature matrix and its labels). This is
+    Algorithm R vectorised over a chunk: row i of the stream replaces a
+    random slot with probability capacity / (i + 1).
+    """
+
+    def __init__(self, capacity, seed=None):
+        self.capacity = capacity
+        self.n = 0
+        self.arrays = None
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return min(self.n, self.capacity)
+
+    def update(self, *arrays):
+        m = len(arrays[0])
+        if self.arrays is None:
+            self.arrays = [np.empty((self.capacity,) + a.shape[1:], dtype=a.dtype) for a in arrays]
+        fill = max(0, min(m, self.capacity - self.n))
+        for store, a in zip(self.arrays, arrays):
+            store[self.n:self.n + fill] = a[:fill]
+        if fill < m:
+            rows = np.arange(fill, m)
+            slots = self._rng.integers(0, self.n + rows + 1)
+            keep = slots < self.capacity
+            rows, slots = rows[keep], slots[keep]
+            # Where rows of one chunk land in the same slot, the last one wins, as in the sequential algorithm
+            _, last = np.unique(slots[::-1], return_index=True)
+            rows, slots = rows[::-1][last], slots[::-1][last]
+            for store, a in zip(self.arrays, arrays):
+                store[slots] = a[rows]
+        self.n += m
+        return self
+
+    def sample(self):
+        """The sampled rows, one array per array passed to update()."""
+        return [store[:len(self)] for store in self.arrays or []]
+
+    def weights(self):
+        """Stream rows per sampled row (uniform)."""
+        return np.full(len(self), self.n / max(len(self), 1))
+
+    def merge(self, other):
+        """Uniform sample of both streams: the split between them is hypergeometric in their sizes."""
+        if other.arrays is None:
+            return self
+        if self.arrays is None:
+            self.arrays = [np.empty((self.capacity,) + a.shape[1:], dtype=a.dtype) for a in other.arrays]
+        mine, theirs = self.sample(), other.sample()
+        if self.n + other.n <= self.capacity:
+            take_mine, take_theirs = np.arange(len(self)), np.arange(len(other))
+        else:
+            k = int(self._rng.hypergeometric(self.n, other.n, self.capacity))
+            take_mine = self._rng.choice(len(self), size=min(k, len(self)), replace=False)
+            take_theirs = self._rng.choice(len(other), size=min(self.capacity - len(take_mine), len(other)),
+                                           replace=False)
+        merged = [np.concatenate([a[take_mine], b[take_theirs]]) for a, b in zip(mine, theirs)]
+        self.n += other.n
+        for store, a in zip(self.arrays, merged):
+            store[:len(a)] = a
+        return self
+
+
+def stratified_capacities(counts, size, minimum=0):
+    """Per-label capacities proportional to counts, with at least minimum rows (or all rows) per label."""
+    total = sum(counts.values())
+    return {label: int(min(n, max(minimum, round(size * n / total)))) for label, n in counts.items()}
+
+
+class StratifiedSample:
+    """One ReservoirSample per label; labels without a capacity are not sampled.
+
+    weights() gives each sampled row the number of stream rows it stands for
+    (its label's count over its label's sample size), so scores computed
+    with those weights estimate the scores on the whole stream even when
+    rare labels are over-sampled.
+    """
+
+    def __init__(self, capacities, seed=None):
+        seeds = np.random.SeedSequence(seed).spawn(len(capacities))
+        self.strata = {label: ReservoirSample(capacity, seed=s)
+                       for (label, capacity), s in zip(capacities.items(), seeds)}
+
+    def __len__(self):
+        return sum(len(stratum) for stratum in self.strata.values())
+
+    @property
+    def n(self):
+        return sum(stratum.n for stratum in self.strata.values())
+
+    def update(self, labels, *arrays):
+        labels = np.asarray(labels)
+        for label, stratum in self.strata.items():
+            rows = np.flatnonzero(labels == label)
+            if len(rows):
+                stratum.update(labels[rows], *(a[rows] for a in arrays))
+        return self
+
+    def sample(self):
+        """Labels then the other arrays, concatenated over the strata."""
+        parts = [stratum.sample() for stratum in self.strata.values() if len(stratum)]
+        return [np.concatenate(arrays) for arrays in zip(*parts)]
+
+    def weights(self):
+        return np.concatenate([np.full(len(stratum), stratum.n / len(stratum))
+                               for stratum in self.strata.values() if len(stratum)])
+
+    def merge(self, other):
+        for label, stratum in other.strata.items():
+            if label in self.strata:
+                self.strata[label].merge(stratum)
+            else:
+                self.strata[label] = stratum
+        return self
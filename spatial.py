@@ -0,0 +1,204 @@
+# spatial.py
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from instrument import REPORT_DIR_NAME, Run
+from schema import find_column
+from storage import load_table, table_columns
+
+# =========================
+# Spatial grid index over OSGR coordinates
+# =========================
+# Collisions are binned into square cells on the British National Grid
+# (location_easting_osgr / location_northing_osgr, metres) and stored sorted
+# by cell with CSR-style offsets. A row of neighbouring cells is then one
+# contiguous slice, so a radius or bounding-box query touches a handful of
+# slices plus one vectorised distance test. The index is built once and
+# saved as .npz; hotspot tables (collisions and severity rates per cell)
+# come straight from the cell offsets.
+DATA_DIR = "../data"
+MERGED_FILE = os.path.join(DATA_DIR, "merged_road_accidents.csv")
+INDEX_FILE = os.path.join(DATA_DIR, "spatial_index.npz")
+HOTSPOTS_FILE = os.path.join(DATA_DIR, "hotspots.csv")
+CELL_SIZE = 1000.0
+
+EASTING = "location_easting_osgr"
+NORTHING = "location_northing_osgr"
+SEVERITY = "accident_severity"
+KEY = "accident_index"
+# STATS19 accident_severity codes
+SEVERITY_LABELS = {1: "fatal", 2: "serious", 3: "slight"}
+
+
+class GridIndex:
+    def __init__(self, x, y, severity=None, keys=None, cell_size=CELL_SIZE):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # Rows without coordinates cannot be placed; rows keeps the source positions
+        valid = ~(np.isnan(x) | np.isnan(y))
+        rows = np.flatnonzero(valid)
+        x, y = x[valid], y[valid]
+        self.cell_size = float(cell_size)
+        self.x0 = float(np.floor(x.min() / cell_size) * cell_size) if len(x) else 0.0
+        self.y0 = float(np.floor(y.min() / cell_size) * cell_size) if len(y) else 0.0
+        cx = ((x - self.x0) // cell_size).astype(np.int64)
+        cy = ((y - self.y0) // cell_size).astype(np.int64)
+        self.nx = int(cx.max()) + 1 if len(x) else 1
+        self.ny = int(cy.max()) + 1 if len(y) else 1
+        cells = cy * self.nx + cx
+
+        order = np.argsort(cells, kind="stable")
+        self.x = x[order]
+        self.y = y[order]
+        self.rows = rows[order]
+        self.severity = (np.asarray(severity)[valid][order].astype(np.int8)
+                         if severity is not None else np.zeros(len(x), dtype=np.int8))
+        self.keys = np.asarray(keys)[valid][order].astype(str) if keys is not None else None
+        self.offsets = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.nx * self.ny), out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.x)
+
+    # ---- queries ----------------------------------------------------------
+    def _candidates(self, xmin, ymin, xmax, ymax):
+        # Positions (into the sorted arrays) of every point in cells overlapping the box
+        cx0 = max(int((xmin - self.x0) // self.cell_size), 0)
+        cx1 = min(int((xmax - self.x0) // self.cell_size), self.nx - 1)
+        cy0 = max(int((ymin - self.y0) // self.cell_size), 0)
+        cy1 = min(int((ymax - self.y0) // self.cell_size), self.ny - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.zeros(0, dtype=np.int64)
+        starts = self.offsets[np.arange(cy0, cy1 + 1) * self.nx + cx0]
+        ends = self.offsets[np.arange(cy0, cy1 + 1) * self.nx + cx1 + 1]
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+    def query_bbox(self, xmin, ymin, xmax, ymax):
+        """Source row positions of points inside the box (edges inclusive)."""
+        pos = self._candidates(xmin, ymin, xmax, ymax)
+        x, y = self.x[pos], self.y[pos]
+        return self.rows[pos[(x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)]]
+
+    def query_radius(self, x, y, radius):
+        """Source row positions of points within radius metres of (x, y)."""
+        pos = self._radius_positions(x, y, radius)
+        return self.rows[pos]
+
+    def _radius_positions(self, x, y, radius):
+        pos = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        dx, dy = self.x[pos] - x, self.y[pos] - y
+        return pos[dx * dx + dy * dy <= radius * radius]
+
+    def radius_summary(self, x, y, radius):
+        """Collision count and per-severity counts within radius metres of (x, y)."""
+        severity = self.severity[self._radius_positions(x, y, radius)]
+        summary = {"collisions": int(len(severity))}
+        for code, label in SEVERITY_LABELS.items():
+            summary[label] = int(np.count_nonzero(severity == code))
+        summary["severe_rate"] = (summary["fatal"] + summary["serious"]) / len(severity) if len(severity) else None
+        return summary
+
+    def hotspots(self, min_collisions=1):
+        """Per-cell collision counts and severity rates, busiest cells first."""
+        counts = np.diff(self.offsets)
+        occupied = np.flatnonzero(counts >= min_collisions)
+        cells = np.repeat(np.arange(len(counts)), counts)
+        table = pd.DataFrame({
+            "cell": occupied,
+            "easting": self.x0 + (occupied % self.nx + 0.5) * self.cell_size,
+            "northing": self.y0 + (occupied // self.nx + 0.5) * self.cell_size,
+            "collisions": counts[occupied],
+        })
+        for code, label in SEVERITY_LABELS.items():
+            table[label] = np.bincount(cells, weights=self.severity == code, minlength=len(counts))[occupied].astype(np.int64)
+        table["severe_rate"] = (table["fatal"] + table["serious"]) / table["collisions"]
+        return table.sort_values(["collisions", "severe_rate"], ascending=False, ignore_index=True)
+
+    # ---- persistence ------------------------------------------------------
+    def save(self, path=INDEX_FILE):
+        arrays = {"x": self.x, "y": self.y, "rows": self.rows, "severity": self.severity, "offsets": self.offsets,
+                  "grid": np.array([self.x0, self.y0, self.cell_size, self.nx, self.ny], dtype=np.float64)}
+        if self.keys is not None:
+            arrays["keys"] = self.keys
+        np.savez(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        index = cls.__new__(cls)
+        with np.load(path, allow_pickle=False) as data:
+            index.x, index.y, index.rows = data["x"], data["y"], data["rows"]
+            index.severity, index.offsets = data["severity"], data["offsets"]
+            index.keys = data["keys"] if "keys" in data else None
+            x0, y0, cell_size, nx, ny = data["grid"]
+        index.x0, index.y0, index.cell_size, index.nx, index.ny = x0, y0, cell_size, int(nx), int(ny)
+        return index
+
+
+def build_index(path=MERGED_FILE, cell_size=CELL_SIZE):
+    """Grid index over a dataset's OSGR coordinates, reading only the columns it needs."""
+    columns = table_columns(path)
+    names = {name: find_column(columns, name) for name in (EASTING, NORTHING, SEVERITY, KEY)}
+    if names[EASTING] is None or names[NORTHING] is None:
+        raise KeyError(f"{path} has no {EASTING}/{NORTHING} columns")
+    df = load_table(path, columns=[c for c in names.values() if c])
+    return GridIndex(df[names[EASTING]].to_numpy(dtype=float), df[names[NORTHING]].to_numpy(dtype=float),
+                     df[names[SEVERITY]].fillna(0).to_numpy() if names[SEVERITY] else None,
+                     df[names[KEY]].to_numpy() if names[KEY] else None, cell_size)
+
+
+def benchmark(index, queries=10_000, radius=1000.0, seed=42):
+    """Radius and bbox queries per second around randomly chosen collisions."""
+    rng = np.random.default_rng(seed)
+    centres = rng.integers(0, len(index), size=queries)
+    results = {}
+    for name, query in (("radius", lambda x, y: index.query_radius(x, y, radius)),
+                        ("bbox", lambda x, y: index.query_bbox(x - radius, y - radius, x + radius, y + radius))):
+        hits = 0
+        start = time.perf_counter()
+        for i in centres:
+            hits += len(query(index.x[i], index.y[i]))
+        elapsed = time.perf_counter() - start
+        results[name] = {"queries": queries, "queries_per_second": round(queries / elapsed, 1),
+                         "mean_hits": round(hits / queries, 1)}
+        print(f"{name:>6}: {results[name]['queries_per_second']:.0f} queries/s "
+              f"(r={radius:.0f} m, mean hits {results[name]['mean_hits']})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the collision grid index")
+    parser.add_argument("--data", default=MERGED_FILE)
+    parser.add_argument("--index", default=INDEX_FILE)
+    parser.add_argument("--cell-size", type=float, default=CELL_SIZE, help="grid cell size in metres")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--radius", type=float, default=1000.0, help="query radius in metres")
+    parser.add_argument("--point", type=float, nargs=2, metavar=("EASTING", "NORTHING"),
+                        help="summarise collisions within --radius of this point")
+    parser.add_argument("--hotspots", type=int, metavar="N", help="print the N busiest cells")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args(argv)
+
+    with Run("spatial", os.path.join(os.path.dirname(args.index) or ".", REPORT_DIR_NAME)) as run:
+        if args.rebuild or not os.path.exists(args.index):
+            with run.stage("build", outputs=[args.index]) as stage:
+                grid = build_index(args.data, args.cell_size)
+                grid.save(args.index)
+                stage.count(len(grid))
+            print(f"Indexed {len(grid)} collisions in {stage.data['seconds']:.2f}s: {args.index}")
+        else:
+            with run.stage("load", inputs=[args.index]):
+                grid = GridIndex.load(args.index)
+        if args.point:
+            print(grid.radius_summary(args.point[0], args.point[1], args.radius))
+        if args.hotspots:
+            print(grid.hotspots().head(args.hotspots).to_string(index=False))
+        if args.benchmark:
+            with run.stage("benchmark") as stage:
+                stage.extra["results"] = benchmark(grid, radius=args.radius)
+
+
+if __name__ == "__main__":
+    main()
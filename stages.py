@@ -0,0 +1,116 @@
+# stages.py
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import time
+
+# =========================
+# Incremental pipeline stages
+# =========================
+# A stage declares the files it reads, the files it writes and its
+# parameters. Its cache key hashes the content of every input file, the
+# parameters and the stage function's own source, so editing a chart only
+# invalidates the stages that draw charts. A stage whose key matches the last
+# successful run, and whose outputs are still on disk unchanged, is skipped.
+CACHE_NAME = ".pipeline_cache.json"
+HASH_BLOCK = 4 * 1024 * 1024
+
+
+class Stage:
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, code=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        # Helpers the stage calls whose source should also invalidate it; a
+        # module name ("merge") stands for the source of the whole module
+        self.code = [func] + list(code)
+
+
+class Pipeline:
+    def __init__(self, cache_dir, run=None):
+        # run: an instrument.Run; every stage, cached or not, gets a record in its report
+        self.instrument = run
+        self.cache_path = os.path.join(cache_dir, CACHE_NAME)
+        self.cache = {"files": {}, "stages": {}}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path) as f:
+                self.cache = json.load(f)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.cache, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.cache_path)
+
+    def file_digest(self, path):
+        """Content hash of path, memoised on (size, mtime) so unchanged files are not re-read."""
+        if not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        memo = self.cache["files"].get(os.path.abspath(path))
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["digest"]
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                digest.update(block)
+        self.cache["files"][os.path.abspath(path)] = {
+            "size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": digest.hexdigest(),
+        }
+        return digest.hexdigest()
+
+    def stage_key(self, stage):
+        code = []
+        for func in stage.code:
+            if isinstance(func, str):
+                func = importlib.import_module(func)
+            try:
+                code.append(inspect.getsource(func))
+            except (OSError, TypeError):
+                code.append(getattr(func, "__qualname__", func.__name__))
+        payload = {
+            "code": code,
+            "params": stage.params,
+            "inputs": {os.path.abspath(p): self.file_digest(p) for p in sorted(stage.inputs)},
+        }
+        return hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode(), digest_size=20).hexdigest()
+
+    def up_to_date(self, stage, key):
+        record = self.cache["stages"].get(stage.name)
+        if not record or record["key"] != key:
+            return False
+        return all(self.file_digest(p) == d for p, d in record["outputs"].items())
+
+    def run(self, stage, force=False):
+        """Run stage unless its cached outputs are still valid. Returns True if it ran."""
+        if self.instrument is None:
+            return self._run(stage, force, None)
+        with self.instrument.stage(stage.name, inputs=stage.inputs, outputs=stage.outputs) as record:
+            return self._run(stage, force, record)
+
+    def _run(self, stage, force, record):
+        key = self.stage_key(stage)
+        if not force and self.up_to_date(stage, key):
+            print(f"[{stage.name}] up to date, reusing cached outputs.")
+            if record is not None:
+                record.extra["cached"] = True
+            return False
+
+        print(f"[{stage.name}] running ...")
+        start = time.perf_counter()
+        stage.func()
+        elapsed = time.perf_counter() - start
+        if record is not None:
+            record.extra["cached"] = False
+
+        # Outputs that a stage may legitimately skip (e.g. no pyarrow) are just not recorded
+        outputs = {os.path.abspath(p): self.file_digest(p) for p in stage.outputs if os.path.exists(p)}
+        self.cache["stages"][stage.name] = {"key": key, "outputs": outputs, "seconds": round(elapsed, 3)}
+        self.save()
+        print(f"[{stage.name}] done in {elapsed:.1f}s")
+        return True
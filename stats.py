@@ -0,0 +1,501 @@
+# stats.py
+import argparse
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from instrument import REPORT_DIR_NAME, Run
+from schema import find_column
+from sketches import (DISTINCT_ERROR, FREQUENCY_ERROR, QUANTILE_ERROR, FrequencySketch, HyperLogLog,
+                      KLLSketch, hash_keys)
+from storage import dataset_files, iter_table
+
+# =========================
+# Single-pass column statistics
+# =========================
+# One pass over a dataset (whole frame or chunks) collects, per column: row
+# and null counts, min/max, mean and variance (Chan's parallel update, so
+# partial results from chunks or workers merge exactly) and value counts,
+# from which quantiles, distinct counts and top-k are answered.
+# The result is saved as a small JSON artifact next to the dataset, and the
+# EDA summary and PDF reports read that instead of re-running describe().
+#
+# Value counts are exact while a column has at most max_tracked distinct
+# values. Every column also feeds constant-size sketches (KLL quantiles,
+# HyperLogLog distinct count, count-min top-k; see sketches.py), which answer
+# once the exact counts are dropped. max_tracked=0 keeps the whole pass in
+# constant memory.
+#
+# The same pass accumulates the pairwise correlation sums of the numeric
+# columns and the joint counts of the PAIRS columns, so the correlation
+# heatmap and the scatter plots are drawn from the artifact too.
+STATS_SUFFIX = "_stats.json"
+# Bumped when the artifact gains fields; older artifacts are recomputed
+STATS_VERSION = 2
+# (x, y) columns whose joint value counts are kept for scatter plots
+PAIRS = (("number_of_vehicles", "number_of_casualties"),)
+CHUNK_SIZE = 250_000
+QUANTILES = (0.25, 0.5, 0.75)
+TOP_K = 10
+MAX_TRACKED_VALUES = 20_000
+
+
+def _is_numeric(s):
+    return pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype)
+
+
+def _key(value, numeric):
+    # Integral floats count as ints so chunks parsed as int64 and float64 agree
+    if not numeric:
+        return str(value)
+    value = value.item() if hasattr(value, "item") else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _sketch_keys(index, numeric):
+    # The string form of _key, vectorised; sketches hash these strings
+    if not numeric:
+        return np.asarray(index.astype(str), dtype=object)
+    values = index.to_numpy(dtype=float)
+    integral = np.isfinite(values) & (np.floor(values) == values)
+    keys = values.astype(str).astype(object)
+    keys[integral] = values[integral].astype(np.int64).astype(str)
+    return keys
+
+
+class ColumnStats:
+    def __init__(self, numeric=True, dtype=None, max_tracked=MAX_TRACKED_VALUES, quantile_error=QUANTILE_ERROR,
+                 distinct_error=DISTINCT_ERROR, frequency_error=FREQUENCY_ERROR):
+        self.numeric = numeric
+        self.dtype = dtype
+        self.max_tracked = max_tracked
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.counts = {} if max_tracked > 0 else None
+        self.kll = KLLSketch(quantile_error) if numeric else None
+        self.hll = HyperLogLog(distinct_error)
+        self.freq = FrequencySketch(frequency_error)
+
+    def _demote(self):
+        # A column seen as text in any chunk is text overall
+        self.numeric = False
+        self.mean = self.m2 = 0.0
+        self.min = self.max = None
+        self.kll = None
+        if self.counts is not None:
+            merged = {}
+            for k, n in self.counts.items():
+                merged[str(k)] = merged.get(str(k), 0) + n
+            self.counts = merged
+
+    def _merge_moments(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+
+    def _merge_counts(self, counts):
+        if self.counts is None or counts is None:
+            self.counts = None
+            return
+        for k, n in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + n
+        if len(self.counts) > self.max_tracked:
+            self.counts = None
+
+    def update(self, s):
+        numeric = _is_numeric(s)
+        if self.numeric and not numeric and s.notna().any():
+            self._demote()
+        valid = s.dropna()
+        n = len(valid)
+        self.nulls += len(s) - n
+        if n == 0:
+            return self
+        if self.numeric:
+            values = valid.to_numpy(dtype=float)
+            mean = values.mean()
+            self._merge_moments(n, mean, float(((values - mean) ** 2).sum()))
+            lo, hi = _key(values.min(), True), _key(values.max(), True)
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+        self.count += n
+
+        # Sketches and exact counts all consume the chunk's distinct values
+        vc = valid.value_counts(sort=False)
+        if isinstance(vc.index.dtype, pd.CategoricalDtype):
+            vc = vc[vc > 0]
+        keys = _sketch_keys(vc.index, self.numeric)
+        hashes = hash_keys(keys)
+        self.hll.update_hashes(hashes)
+        self.freq.update(keys, vc.to_numpy(), hashes)
+        if self.numeric:
+            self.kll.update(vc.index.to_numpy(dtype=float), vc.to_numpy())
+        if self.counts is not None:
+            if len(vc) > self.max_tracked:
+                self.counts = None
+            else:
+                chunk = {}
+                for v, c in vc.items():
+                    k = _key(v, self.numeric)
+                    chunk[k] = chunk.get(k, 0) + int(c)
+                self._merge_counts(chunk)
+        return self
+
+    def merge(self, other):
+        if self.numeric != other.numeric:
+            if self.numeric:
+                self._demote()
+            if other.numeric:
+                other = ColumnStats.from_dict(other.to_dict())
+                other._demote()
+        if self.numeric and other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            self.kll.merge(other.kll)
+        self.count += other.count
+        self.nulls += other.nulls
+        self._merge_counts(other.counts)
+        self.hll.merge(other.hll)
+        self.freq.merge(other.freq)
+        return self
+
+    # ---- answers ----------------------------------------------------------
+    @property
+    def exact(self):
+        """True while answers come from exact value counts rather than sketches."""
+        return self.counts is not None
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.numeric and self.count > 1 else None
+
+    @property
+    def unique(self):
+        return len(self.counts) if self.exact else self.hll.count()
+
+    def value_counts(self, name=None):
+        """Exact counts as a Series, most frequent first (None once no longer tracked)."""
+        if not self.exact:
+            return None
+        counts = pd.Series(self.counts, name=name, dtype="int64")
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def top(self, k=TOP_K):
+        if self.exact:
+            return sorted(self.counts.items(), key=lambda kv: -kv[1])[:k]
+        return self.freq.top(k)
+
+    def quantiles(self, qs=QUANTILES):
+        """Quantiles with describe()'s linear interpolation, or KLL estimates."""
+        if not self.numeric or not self.count:
+            return {q: None for q in qs}
+        if not self.exact:
+            return dict(zip(qs, self.kll.quantiles(qs)))
+        values = np.array(sorted(self.counts), dtype=float)
+        cum = np.cumsum([self.counts[v] for v in sorted(self.counts)])
+        out = {}
+        for q in qs:
+            h = (self.count - 1) * q
+            lo = values[np.searchsorted(cum, math.floor(h), side="right")]
+            hi = values[np.searchsorted(cum, math.ceil(h), side="right")]
+            out[q] = float(lo + (h - math.floor(h)) * (hi - lo))
+        return out
+
+    # ---- persistence ------------------------------------------------------
+    def to_dict(self):
+        return {
+            "numeric": self.numeric, "dtype": self.dtype, "max_tracked": self.max_tracked,
+            "count": self.count, "nulls": self.nulls,
+            "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+            "counts": None if self.counts is None else [[k, n] for k, n in self.counts.items()],
+            "kll": None if self.kll is None else self.kll.to_dict(),
+            "hll": self.hll.to_dict(), "freq": self.freq.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        col = cls.__new__(cls)
+        col.numeric, col.dtype, col.max_tracked = data["numeric"], data.get("dtype"), data["max_tracked"]
+        col.count, col.nulls = data["count"], data["nulls"]
+        col.mean, col.m2 = data["mean"], data["m2"]
+        col.min, col.max = data["min"], data["max"]
+        col.counts = None if data["counts"] is None else {k: n for k, n in data["counts"]}
+        col.kll = None if data["kll"] is None else KLLSketch.from_dict(data["kll"])
+        col.hll = HyperLogLog.from_dict(data["hll"])
+        col.freq = FrequencySketch.from_dict(data["freq"])
+        return col
+
+
+class CorrelationStats:
+    """Pairwise-complete Pearson correlations (what DataFrame.corr() gives), from mergeable sums.
+
+    For every column pair it keeps the number of rows where both are
+    present and the sums of x, x^2 and x*y over those rows. Columns are
+    shifted by their first chunk's mean so the sums do not lose precision.
+    """
+
+    def __init__(self, columns=()):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def update(self, df):
+        if not self.columns:
+            return self
+        X = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) for c in self.columns])
+        present = ~np.isnan(X)
+        if self.shift is None:
+            self.shift = np.nan_to_num(np.nanmean(np.where(present, X, np.nan), axis=0)) if len(X) else np.zeros(len(self.columns))
+        Z = np.where(present, X - self.shift, 0.0)
+        M = present.astype(float)
+        # sx[i, j] = sum of column i over the rows where column j is present too
+        self.n += M.T @ M
+        self.sx += Z.T @ M
+        self.sxx += (Z * Z).T @ M
+        self.sxy += Z.T @ Z
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("Correlation sums over different columns cannot be merged")
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift
+        # Re-centre other's sums on this shift: x - a = (x - b) + (b - a)
+        d = other.shift - self.shift
+        sx_j = other.sx.T
+        self.sxx += other.sxx + 2 * d[:, None] * other.sx + d[:, None] ** 2 * other.n
+        self.sxy += other.sxy + d[:, None] * sx_j + d[None, :] * other.sx + np.outer(d, d) * other.n
+        self.sx += other.sx + d[:, None] * other.n
+        self.n += other.n
+        return self
+
+    def matrix(self):
+        """The correlation matrix as a DataFrame (NaN where a pair has < 2 rows or no variance)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.n * self.sxy - self.sx * self.sx.T
+            var = self.n * self.sxx - self.sx ** 2
+            corr = cov / np.sqrt(var * var.T)
+        corr[self.n < 2] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+    def to_dict(self):
+        return {"columns": self.columns, "shift": None if self.shift is None else self.shift.tolist(),
+                **{name: getattr(self, name).tolist() for name in ("n", "sx", "sxx", "sxy")}}
+
+    @classmethod
+    def from_dict(cls, data):
+        corr = cls(data["columns"])
+        corr.shift = None if data["shift"] is None else np.array(data["shift"], dtype=float)
+        for name in ("n", "sx", "sxx", "sxy"):
+            setattr(corr, name, np.array(data[name], dtype=float).reshape(len(corr.columns), len(corr.columns)))
+        return corr
+
+
+class DatasetStats:
+    """Per-column ColumnStats for a dataset, built with update() or merge().
+
+    Keyword arguments (max_tracked, quantile_error, distinct_error,
+    frequency_error) configure every column; partial results to be merged
+    must share them.
+    """
+
+    def __init__(self, **config):
+        self.config = config
+        self.rows = 0
+        self.columns = {}
+        self.correlation = None
+        # (x, y) -> {(x value, y value): rows}; None once a pair has too many distinct values
+        self.pairs = {}
+
+    def update(self, df):
+        for name in df.columns:
+            s = df[name]
+            if name not in self.columns:
+                self.columns[name] = ColumnStats(_is_numeric(s), str(s.dtype), **self.config)
+            self.columns[name].update(s)
+        if self.correlation is None:
+            # Numeric as first seen; later chunks are coerced to numbers
+            self.correlation = CorrelationStats(self.numeric_columns())
+        self.correlation.update(df)
+        for x, y in PAIRS:
+            x, y = find_column(df.columns, x), find_column(df.columns, y)
+            if x and y:
+                self._update_pair((x, y), df[[x, y]].dropna().value_counts(sort=False))
+        self.rows += len(df)
+        return self
+
+    def _update_pair(self, pair, counts):
+        if pair not in self.pairs:
+            self.pairs[pair] = {}
+        joint = self.pairs[pair]
+        if joint is None:
+            return
+        for (x, y), n in counts.items():
+            key = (_key(x, True), _key(y, True))
+            joint[key] = joint.get(key, 0) + int(n)
+        if len(joint) > MAX_TRACKED_VALUES:
+            print(f"WARNING: {pair} has more than {MAX_TRACKED_VALUES} distinct pairs; its scatter is dropped.")
+            self.pairs[pair] = None
+
+    def merge(self, other):
+        for name, col in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(col)
+            else:
+                self.columns[name] = ColumnStats.from_dict(col.to_dict())
+        if other.correlation is not None:
+            if self.correlation is None:
+                self.correlation = CorrelationStats.from_dict(other.correlation.to_dict())
+            else:
+                self.correlation.merge(other.correlation)
+        for pair, joint in other.pairs.items():
+            if joint is None:
+                self.pairs[pair] = None
+            else:
+                self._update_pair(pair, pd.Series(joint, dtype="int64"))
+        self.rows += other.rows
+        return self
+
+    def numeric_columns(self):
+        return [name for name, col in self.columns.items() if col.numeric]
+
+    def corr(self):
+        """Correlation matrix of the numeric columns, like df.corr()."""
+        return self.correlation.matrix() if self.correlation else pd.DataFrame()
+
+    def pair_counts(self, x, y):
+        """Rows per distinct (x, y) value pair as a Series on an (x, y) MultiIndex, or None."""
+        pair = (find_column(self.columns, x), find_column(self.columns, y))
+        joint = self.pairs.get(pair)
+        if not joint:
+            return None
+        index = pd.MultiIndex.from_tuples(list(joint), names=list(pair))
+        return pd.Series(list(joint.values()), index=index, dtype="int64")
+
+    def describe(self):
+        """One row per column, like df.describe(include='all').transpose().
+
+        The exact column is False where unique/top/freq/quantiles are sketch
+        estimates.
+        """
+        rows = {}
+        for name, col in self.columns.items():
+            top = col.top(1)
+            q = col.quantiles()
+            rows[name] = {
+                "count": col.count, "unique": None if col.numeric else col.unique,
+                "top": top[0][0] if top and not col.numeric else None,
+                "freq": top[0][1] if top and not col.numeric else None,
+                "mean": col.mean if col.numeric and col.count else None, "std": col.std,
+                "min": col.min, "25%": q[0.25], "50%": q[0.5], "75%": q[0.75], "max": col.max,
+                "exact": col.exact,
+            }
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def nulls(self):
+        return pd.Series({name: col.nulls for name, col in self.columns.items()}, dtype="int64")
+
+    def info(self):
+        """Column / non-null count / dtype lines, like df.info()."""
+        lines = [f"Rows: {self.rows}, columns: {len(self.columns)}"]
+        width = max((len(name) for name in self.columns), default=0)
+        for name, col in self.columns.items():
+            lines.append(f"{name:<{width}}  {col.count:>10} non-null  {col.dtype}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {"version": STATS_VERSION, "rows": self.rows, "config": self.config,
+                "columns": {name: col.to_dict() for name, col in self.columns.items()},
+                "correlation": self.correlation.to_dict() if self.correlation else None,
+                "pairs": [{"columns": list(pair), "counts": None if joint is None else [[x, y, n] for (x, y), n in joint.items()]}
+                          for pair, joint in self.pairs.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(**data.get("config", {}))
+        stats.rows = data["rows"]
+        stats.columns = {name: ColumnStats.from_dict(col) for name, col in data["columns"].items()}
+        if data.get("correlation"):
+            stats.correlation = CorrelationStats.from_dict(data["correlation"])
+        stats.pairs = {tuple(p["columns"]): None if p["counts"] is None else {(x, y): n for x, y, n in p["counts"]}
+                       for p in data.get("pairs", [])}
+        return stats
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def stats_path(path):
+    return os.path.splitext(path)[0] + STATS_SUFFIX
+
+
+def compute_stats(path, chunksize=CHUNK_SIZE, **config):
+    """Statistics for a dataset in one chunked pass (columnar copy preferred)."""
+    stats = DatasetStats(**config)
+    for chunk in iter_table(path, chunksize=chunksize):
+        stats.update(chunk)
+    return stats
+
+
+def load_stats(path, chunksize=CHUNK_SIZE, **config):
+    """The saved statistics artifact for a dataset, recomputed if the data is newer."""
+    target = stats_path(path)
+    sources = dataset_files(path)
+    if os.path.exists(target) and all(os.path.getmtime(target) >= os.path.getmtime(p) for p in sources):
+        with open(target) as f:
+            data = json.load(f)
+        if data.get("version") == STATS_VERSION:
+            return DatasetStats.from_dict(data)
+    stats = compute_stats(path, chunksize, **config)
+    stats.save(target)
+    print(f"Statistics saved to: {target}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute and save column statistics for a dataset")
+    parser.add_argument("path", help="dataset CSV path (its columnar copy is preferred)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--max-tracked", type=int, default=MAX_TRACKED_VALUES,
+                        help="exact value counts up to this many distinct values; 0 = sketches only")
+    parser.add_argument("--quantile-error", type=float, default=QUANTILE_ERROR)
+    parser.add_argument("--distinct-error", type=float, default=DISTINCT_ERROR)
+    parser.add_argument("--frequency-error", type=float, default=FREQUENCY_ERROR)
+    args = parser.parse_args(argv)
+
+    with Run("stats", os.path.join(os.path.dirname(args.path) or ".", REPORT_DIR_NAME)) as run:
+        with run.stage("compute", inputs=dataset_files(args.path), outputs=[stats_path(args.path)]) as stage:
+            stats = compute_stats(args.path, args.chunksize, max_tracked=args.max_tracked,
+                                  quantile_error=args.quantile_error, distinct_error=args.distinct_error,
+                                  frequency_error=args.frequency_error)
+            stage.count(stats.rows)
+            print(f"Statistics saved to: {stats.save(stats_path(args.path))}")
+    print(stats.describe().to_string())
+
+
+if __name__ == "__main__":
+    main()
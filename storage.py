@@ -0,0 +1,253 @@
+# storage.py
+import os
+import numpy as np
+import pandas as pd
+
+# =========================
+# Columnar storage tier
+# =========================
+# Every dataset keeps its CSV path as its public name (merged_road_accidents.csv,
+# road_accidents_ml_ready.csv, ...). A columnar copy is written next to it and
+# preferred on read, so downstream scripts skip text parsing entirely.
+COLUMNAR_FORMAT = "parquet"
+EXTENSIONS = {"parquet": ".parquet", "feather": ".feather"}
+
+# Object columns with fewer unique values than this fraction of rows become category
+CATEGORY_MAX_RATIO = 0.5
+
+
+def columnar_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def columnar_path(path, fmt=COLUMNAR_FORMAT):
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+
+def compact_dtypes(df):
+    """Return a copy of df with integer codes downcast and repeated strings as category."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            out[col] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s.dtype):
+            out[col] = s
+        elif pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype):
+            if len(s) and s.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(s):
+                out[col] = s.astype("category")
+            else:
+                out[col] = s
+        else:
+            out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def save_table(df, path, fmt=COLUMNAR_FORMAT, write_csv=True):
+    """Write df to its CSV path (optional) and to a columnar copy; return the columnar path."""
+    if write_csv:
+        df.to_csv(path, index=False)
+    target = columnar_path(path, fmt)
+    compact = compact_dtypes(df).reset_index(drop=True)
+    try:
+        if fmt == "feather":
+            compact.to_feather(target)
+        else:
+            compact.to_parquet(target, index=False)
+    except ImportError as e:
+        print(f"WARNING: columnar output skipped ({e}); downstream reads fall back to CSV.")
+        return None
+    print(f"Columnar copy saved to: {target}")
+    return target
+
+
+class TableWriter:
+    """Append DataFrame chunks to a CSV path and its columnar copy.
+
+    The first chunk fixes the schema; later chunks are cast to it, with
+    category columns widened to int32 dictionary indices so chunks with
+    different category sets still line up. Use as a context manager.
+    """
+
+    def __init__(self, path, fmt=COLUMNAR_FORMAT, write_csv=True):
+        self.path = path
+        self.fmt = fmt
+        self.write_csv = write_csv
+        self.rows = 0
+        self._csv = None
+        self._writer = None
+        self._schema = None
+        self._batches = []
+
+    def __enter__(self):
+        if self.write_csv:
+            self._csv = open(self.path, "w", newline="")
+        return self
+
+    def write(self, chunk):
+        if self._csv is not None:
+            chunk.to_csv(self._csv, index=False, header=self.rows == 0)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            self.fmt = None
+        if self.fmt is not None:
+            if self._schema is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                fields = [
+                    pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+                    if pa.types.is_dictionary(f.type) else f
+                    for f in schema
+                ]
+                self._schema = pa.schema(fields)
+            table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+            if self.fmt == "feather":
+                # Feather has no append mode; keep record batches until close
+                self._batches.extend(table.to_batches())
+            else:
+                if self._writer is None:
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(columnar_path(self.path, self.fmt), self._schema)
+                self._writer.write_table(table)
+        self.rows += len(chunk)
+
+    def close(self):
+        # CSV first, so the columnar copy is never older than the CSV it shadows
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._batches:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            feather.write_feather(pa.Table.from_batches(self._batches, self._schema),
+                                  columnar_path(self.path, self.fmt))
+            self._batches = []
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _fresh_columnar(path):
+    # A columnar copy only wins if it is at least as new as the CSV it shadows
+    csv_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    for fmt in (COLUMNAR_FORMAT,) + tuple(f for f in EXTENSIONS if f != COLUMNAR_FORMAT):
+        candidate = columnar_path(path, fmt)
+        if os.path.exists(candidate) and (csv_mtime is None or os.path.getmtime(candidate) >= csv_mtime):
+            return candidate, fmt
+    return None, None
+
+
+def dataset_files(path):
+    """Every file that backs a dataset on disk: the CSV and/or its columnar copies."""
+    candidates = [path] + [columnar_path(path, fmt) for fmt in EXTENSIONS]
+    return [p for p in candidates if os.path.exists(p)]
+
+
+def table_exists(path):
+    return os.path.exists(path) or _fresh_columnar(path)[0] is not None
+
+
+def table_columns(path):
+    source, fmt = _fresh_columnar(path)
+    if source is None:
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    if fmt == "feather":
+        import pyarrow.feather as feather
+        return feather.read_table(source, memory_map=True).column_names
+    import pyarrow.parquet as pq
+    return pq.read_schema(source).names
+
+
+def table_rows(path):
+    """Row count of a dataset; columnar copies answer from metadata, CSV is scanned once."""
+    source, fmt = _fresh_columnar(path)
+    if source is None:
+        return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=1_000_000))
+    if fmt == "feather":
+        import pyarrow.feather as feather
+        return feather.read_table(source, memory_map=True).num_rows
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(source).metadata.num_rows
+
+
+def _common_dtype(a, b):
+    # Numeric chunks widen (int8 + float64 -> float64); any other mix is read back as object
+    if a == b:
+        return a
+    if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+        return np.result_type(a, b)
+    return np.dtype(object)
+
+
+def table_dtypes(path):
+    """pandas dtypes of a dataset; columnar copies answer from the schema without reading rows."""
+    source, fmt = _fresh_columnar(path)
+    if source is None:
+        # Chunked, so the dtypes of a CSV larger than memory can still be inferred
+        dtypes = None
+        for chunk in pd.read_csv(path, chunksize=250_000, low_memory=False):
+            dtypes = chunk.dtypes if dtypes is None else dtypes.combine(chunk.dtypes, _common_dtype)
+        return dtypes if dtypes is not None else pd.read_csv(path, nrows=0).dtypes
+    if fmt == "feather":
+        import pyarrow.feather as feather
+        schema = feather.read_table(source, memory_map=True).schema
+    else:
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(source)
+    return schema.empty_table().to_pandas().dtypes
+
+
+def load_table(path, columns=None):
+    """Load a dataset by its CSV path, preferring the columnar copy.
+
+    columns projects the read; names not present in the dataset are ignored so
+    callers can ask for the optional columns they know how to use.
+    """
+    if not table_exists(path):
+        raise FileNotFoundError(f"Dataset not found: {path}")
+
+    if columns is not None:
+        present = set(table_columns(path))
+        columns = [c for c in columns if c in present]
+
+    source, fmt = _fresh_columnar(path)
+    if source is None:
+        return pd.read_csv(path, usecols=columns, low_memory=False)
+    if fmt == "feather":
+        return pd.read_feather(source, columns=columns)
+    return pd.read_parquet(source, columns=columns)
+
+
+def iter_table(path, chunksize=250_000, columns=None):
+    """Yield a dataset as DataFrame chunks, preferring the columnar copy.
+
+    Parquet is read batch by batch; feather is memory-mapped and sliced;
+    CSV falls back to pandas' chunked reader.
+    """
+    if not table_exists(path):
+        raise FileNotFoundError(f"Dataset not found: {path}")
+
+    if columns is not None:
+        present = set(table_columns(path))
+        columns = [c for c in columns if c in present]
+
+    source, fmt = _fresh_columnar(path)
+    if source is None:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, low_memory=False)
+    elif fmt == "feather":
+        import pyarrow.feather as feather
+        table = feather.read_table(source, columns=columns, memory_map=True)
+        for start in range(0, max(table.num_rows, 1), chunksize):
+            yield table.slice(start, chunksize).to_pandas()
+    else:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
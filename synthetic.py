@@ -0,0 +1,536 @@
+# synthetic.py
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from schema import CASUALTY_DTYPES, COLLISION_DTYPES, VEHICLE_DTYPES
+
+# =========================
+# Synthetic DfT-shaped data
+# =========================
+# Generates collisions / casualties / vehicles CSVs with the published column
+# sets (the schema registry) and value distributions taken from
+# data_summary.txt (one year, 104,258 collisions). Each accident gets exactly
+# number_of_casualties casualty rows and number_of_vehicles vehicle rows, so
+# the 1:N ratios, the per-accident sums the merge produces and the
+# "accident severity = worst casualty" rule all hold. Accidents are written in
+# chunks, so 50x a year never has to fit in memory at once.
+#
+# Coded fields are drawn from {code: weight} tables (weights need not sum to
+# 1); -1 is the DfT "missing or out of range" sentinel throughout.
+SUMMARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_summary.txt")
+BASE_ROWS = 104_258
+YEAR = 2023
+CHUNK_SIZE = 250_000
+SEED = 42
+MANIFEST = "synthetic.json"
+
+# Urban centres on the British National Grid: (easting, northing, weight, police force).
+# Points are drawn around a centre, either in its core (mostly urban) or its wider
+# region (mostly rural); the mix reproduces the south-heavy OSGR quartiles.
+CENTRES = [
+    (530000, 180000, 0.17, 1),    # London
+    (500000, 150000, 0.04, 45),   # Surrey
+    (470000, 200000, 0.04, 43),   # Thames Valley
+    (570000, 210000, 0.03, 42),   # Essex
+    (407000, 287000, 0.07, 20),   # Birmingham
+    (384000, 398000, 0.07, 6),    # Manchester
+    (430000, 433000, 0.06, 13),   # Leeds
+    (335000, 390000, 0.04, 5),    # Liverpool
+    (435000, 387000, 0.04, 14),   # Sheffield
+    (457000, 340000, 0.04, 30),   # Nottingham
+    (359000, 173000, 0.05, 52),   # Bristol
+    (425000, 564000, 0.04, 10),   # Newcastle
+    (318000, 176000, 0.03, 62),   # Cardiff
+    (580000, 150000, 0.06, 46),   # Kent
+    (620000, 300000, 0.04, 36),   # Norfolk / Suffolk
+    (460000, 120000, 0.06, 44),   # Hampshire
+    (290000, 80000, 0.03, 50),    # Devon and Cornwall
+    (259000, 665000, 0.03, 99),   # Glasgow
+    (325000, 673000, 0.02, 99),   # Edinburgh
+    (390000, 780000, 0.01, 99),   # Aberdeen and the north
+]
+CORE_SHARE = 0.6
+CORE_SPREAD = 8000
+REGION_SPREAD = 45000
+GB_BOX = (64000, 10000, 656000, 1160000)
+MISSING_LOCATION = 12 / BASE_ROWS
+
+ONS_DISTRICTS = 351
+TOP_ONS_DISTRICT = ("E08000025", 2199 / BASE_ROWS)
+HIGHWAYS = 208
+TOP_HIGHWAY = ("E10000016", 3372 / BASE_ROWS)
+LSOA_POOL = 27_500
+LSOA_MISSING = 4245 / BASE_ROWS
+
+# DfT day_of_week: 1 = Sunday ... 7 = Saturday
+DAY_WEIGHTS = {1: 0.11, 2: 0.14, 3: 0.15, 4: 0.15, 5: 0.15, 6: 0.17, 7: 0.13}
+MONTH_WEIGHTS = [0.95, 0.9, 0.95, 0.95, 1.0, 1.0, 1.0, 0.95, 1.05, 1.1, 1.1, 1.05]
+HOUR_WEIGHTS = [0.9, 0.6, 0.5, 0.4, 0.4, 0.8, 2.0, 4.5, 7.0, 4.8, 4.6, 5.2,
+                5.8, 6.0, 6.5, 7.5, 8.4, 8.8, 7.2, 5.2, 3.8, 3.0, 2.4, 1.6]
+# Reported times bunch on the hour and half hour
+ROUNDED_TIMES = 0.2
+ROUNDED_MINUTES = {0: 0.5, 30: 0.3, 15: 0.1, 45: 0.1}
+
+SEVERITY = {1: 0.015, 2: 0.224, 3: 0.761}
+VEHICLES = {1: 0.30, 2: 0.60, 3: 0.075, 4: 0.018, 5: 0.005, 6: 0.0015, 7: 0.0005, 8: 0.0002}
+CASUALTIES = {1: 0.805, 2: 0.135, 3: 0.037, 4: 0.013, 5: 0.005, 6: 0.002, 7: 0.001}
+# Rare multi-vehicle pile-ups and coach crashes (the summary's maxima are 17 and 70)
+VEHICLE_TAIL = (1e-4, 9, 17)
+CASUALTY_TAIL = (1e-4, 8, 70)
+
+COLLISION_CODES = {
+    "first_road_class": {1: 0.04, 2: 0.004, 3: 0.42, 4: 0.12, 5: 0.08, 6: 0.336},
+    "road_type": {1: 0.07, 2: 0.02, 3: 0.13, 6: 0.75, 7: 0.01, 9: 0.02},
+    "junction_detail": {0: 0.40, 1: 0.08, 2: 0.015, 3: 0.30, 5: 0.015, 6: 0.08, 7: 0.01, 8: 0.03,
+                        9: 0.05, 99: 0.02},
+    "junction_control": {1: 0.01, 2: 0.20, 3: 0.01, 4: 0.70, 9: 0.08},
+    "second_road_class": {-1: 0.02, 1: 0.01, 3: 0.30, 4: 0.07, 5: 0.05, 6: 0.55},
+    "pedestrian_crossing_human_control": {-1: 0.005, 0: 0.93, 1: 0.005, 2: 0.01, 9: 0.05},
+    "pedestrian_crossing_physical_facilities": {-1: 0.005, 0: 0.70, 1: 0.08, 4: 0.05, 5: 0.07, 7: 0.005,
+                                                8: 0.02, 9: 0.07},
+    "light_conditions": {1: 0.72, 4: 0.20, 5: 0.01, 6: 0.04, 7: 0.03},
+    "weather_conditions": {1: 0.80, 2: 0.10, 3: 0.003, 4: 0.01, 5: 0.01, 6: 0.001, 7: 0.006, 8: 0.02, 9: 0.05},
+    "road_surface_conditions": {-1: 0.01, 1: 0.70, 2: 0.25, 3: 0.005, 4: 0.02, 5: 0.002, 9: 0.013},
+    "special_conditions_at_site": {-1: 0.005, 0: 0.95, 1: 0.002, 2: 0.002, 3: 0.001, 4: 0.006, 5: 0.003,
+                                   6: 0.004, 7: 0.002, 9: 0.025},
+    "carriageway_hazards": {-1: 0.004, 0: 0.955, 1: 0.002, 2: 0.008, 3: 0.002, 6: 0.002, 7: 0.003, 9: 0.024},
+    "did_police_officer_attend_scene_of_accident": {1: 0.65, 2: 0.20, 3: 0.15},
+    "trunk_road_flag": {-1: 0.06, 1: 0.10, 2: 0.84},
+}
+SPEED_LIMITS = {
+    1: {20: 0.24, 30: 0.68, 40: 0.06, 50: 0.01, 60: 0.005, 70: 0.005},  # urban
+    2: {20: 0.01, 30: 0.25, 40: 0.13, 50: 0.10, 60: 0.30, 70: 0.21},    # rural
+}
+URBAN_SHARE = {"core": 0.92, "region": 0.3}
+# Share of records outside the enhanced (CRASH) severity scheme
+ENHANCED_MISSING = 0.43
+ENHANCED_SERIOUS = {5: 0.3, 6: 0.4, 7: 0.3}
+
+CASUALTY_CODES = {
+    "casualty_class": {1: 0.55, 2: 0.32, 3: 0.13},
+    "sex_of_casualty": {-1: 0.005, 1: 0.58, 2: 0.41, 9: 0.005},
+    "casualty_type": {1: 0.14, 2: 0.01, 3: 0.03, 4: 0.01, 5: 0.04, 8: 0.01, 9: 0.62, 10: 0.002, 11: 0.02,
+                      19: 0.03, 20: 0.005, 21: 0.005, 22: 0.003, 23: 0.002, 90: 0.02, 97: 0.003},
+    "pedestrian_location": {1: 0.08, 2: 0.03, 3: 0.02, 4: 0.05, 5: 0.45, 6: 0.15, 7: 0.05, 8: 0.08,
+                            9: 0.04, 10: 0.05},
+    "pedestrian_movement": {1: 0.35, 2: 0.05, 3: 0.15, 4: 0.05, 5: 0.04, 6: 0.04, 7: 0.01, 8: 0.01, 9: 0.30},
+    "car_passenger": {-1: 0.01, 1: 0.33, 2: 0.61, 9: 0.05},
+    "bus_or_coach_passenger": {1: 0.1, 2: 0.1, 3: 0.5, 4: 0.3},
+    "pedestrian_road_maintenance_worker": {0: 0.95, 1: 0.01, 2: 0.04},
+    "casualty_home_area_type": {-1: 0.05, 1: 0.75, 2: 0.1, 3: 0.1},
+    "casualty_imd_decile": {-1: 0.06, 1: 0.13, 2: 0.12, 3: 0.11, 4: 0.1, 5: 0.1, 6: 0.09, 7: 0.08,
+                            8: 0.08, 9: 0.07, 10: 0.06},
+    "casualty_distance_banding": {-1: 0.06, 1: 0.55, 2: 0.2, 3: 0.1, 4: 0.06, 5: 0.03},
+}
+# Further casualties in the same accident: no worse than the accident itself
+OTHER_CASUALTY_SEVERITY = {2: 0.12, 3: 0.88}
+LSOA_CASUALTY_MISSING = 0.08
+
+VEHICLE_CODES = {
+    "vehicle_type": {1: 0.07, 2: 0.01, 3: 0.03, 4: 0.01, 5: 0.03, 8: 0.02, 9: 0.68, 10: 0.002, 11: 0.02,
+                     19: 0.06, 20: 0.005, 21: 0.02, 22: 0.003, 23: 0.003, 90: 0.015, 97: 0.002, 98: 0.005,
+                     -1: 0.005},
+    "towing_and_articulation": {-1: 0.01, 0: 0.97, 1: 0.01, 2: 0.002, 3: 0.003, 5: 0.002, 9: 0.003},
+    "vehicle_manoeuvre": {-1: 0.02, 1: 0.02, 2: 0.05, 3: 0.05, 4: 0.05, 5: 0.04, 6: 0.01, 7: 0.04, 8: 0.01,
+                          9: 0.09, 10: 0.01, 11: 0.01, 12: 0.01, 13: 0.02, 14: 0.01, 15: 0.01, 16: 0.03,
+                          17: 0.05, 18: 0.39, 99: 0.08},
+    "vehicle_direction_from": {-1: 0.02, 0: 0.03, 1: 0.11, 2: 0.1, 3: 0.11, 4: 0.1, 5: 0.11, 6: 0.1,
+                               7: 0.11, 8: 0.1, 9: 0.08},
+    "vehicle_direction_to": {-1: 0.02, 0: 0.03, 1: 0.11, 2: 0.1, 3: 0.11, 4: 0.1, 5: 0.11, 6: 0.1,
+                             7: 0.11, 8: 0.1, 9: 0.08},
+    "vehicle_location_restricted_lane": {-1: 0.01, 0: 0.95, 1: 0.005, 2: 0.005, 4: 0.01, 5: 0.005, 9: 0.005,
+                                         99: 0.01},
+    "junction_location": {-1: 0.01, 0: 0.42, 1: 0.12, 2: 0.1, 3: 0.03, 5: 0.1, 6: 0.06, 7: 0.02, 8: 0.13,
+                          9: 0.01},
+    "skidding_and_overturning": {-1: 0.01, 0: 0.93, 1: 0.04, 2: 0.005, 3: 0.003, 5: 0.002, 9: 0.01},
+    "hit_object_in_carriageway": {-1: 0.01, 0: 0.96, 4: 0.01, 7: 0.005, 10: 0.005, 11: 0.005, 99: 0.005},
+    "vehicle_leaving_carriageway": {-1: 0.01, 0: 0.95, 1: 0.015, 3: 0.005, 7: 0.01, 9: 0.01},
+    "hit_object_off_carriageway": {-1: 0.01, 0: 0.95, 1: 0.005, 4: 0.01, 9: 0.005, 10: 0.005, 11: 0.015},
+    "first_point_of_impact": {-1: 0.01, 0: 0.05, 1: 0.5, 2: 0.2, 3: 0.12, 4: 0.1, 9: 0.02},
+    "vehicle_left_hand_drive": {-1: 0.02, 1: 0.96, 2: 0.01, 9: 0.01},
+    "journey_purpose_of_driver": {-1: 0.05, 1: 0.08, 2: 0.08, 3: 0.01, 4: 0.005, 5: 0.4, 6: 0.35, 15: 0.025},
+    "sex_of_driver": {-1: 0.01, 1: 0.68, 2: 0.24, 3: 0.07},
+    "propulsion_code": {-1: 0.15, 1: 0.5, 2: 0.3, 3: 0.02, 8: 0.03},
+    "driver_imd_decile": {-1: 0.15, 1: 0.1, 2: 0.1, 3: 0.09, 4: 0.09, 5: 0.09, 6: 0.08, 7: 0.08, 8: 0.08,
+                          9: 0.07, 10: 0.07},
+    "driver_home_area_type": {-1: 0.15, 1: 0.7, 2: 0.08, 3: 0.07},
+    "driver_distance_banding": {-1: 0.15, 1: 0.45, 2: 0.2, 3: 0.1, 4: 0.07, 5: 0.03},
+}
+# Pedal cycles, ridden horses and mobility scooters have no engine
+NO_ENGINE = (1, 16, 22)
+ENGINE_MISSING = 0.18
+VEHICLE_AGE_MISSING = 0.25
+DRIVER_AGE_MISSING = 0.12
+LSOA_DRIVER_MISSING = 0.15
+ESCOOTER = 0.006
+MAKE_MODELS = [
+    "FORD FIESTA", "VAUXHALL CORSA", "VOLKSWAGEN GOLF", "FORD FOCUS", "VAUXHALL ASTRA", "NISSAN QASHQAI",
+    "BMW 1 SERIES", "MERCEDES C CLASS", "TOYOTA YARIS", "FORD TRANSIT", "MINI MINI", "PEUGEOT 208",
+    "AUDI A3", "KIA SPORTAGE", "HONDA CIVIC", "TOYOTA PRIUS", "RENAULT CLIO", "VOLKSWAGEN POLO",
+    "SKODA OCTAVIA", "BMW 3 SERIES", "HYUNDAI TUCSON", "MERCEDES SPRINTER", "TESLA MODEL 3", "FIAT 500",
+    "CITROEN BERLINGO", "LAND ROVER RANGE ROVER", "HONDA PCX", "YAMAHA MT-07", "MERCEDES A CLASS", "AUDI A4",
+]
+MAKE_MODEL_TAIL = 2000
+MAKE_MODEL_MISSING = 0.2
+
+# DfT age bands: 1 = 0-5, 2 = 6-10, 3 = 11-15, 4 = 16-20, 5 = 21-25, 6 = 26-35,
+# 7 = 36-45, 8 = 46-55, 9 = 56-65, 10 = 66-75, 11 = over 75
+AGE_BAND_EDGES = [6, 11, 16, 21, 26, 36, 46, 56, 66, 76]
+
+
+# ---- helpers ---------------------------------------------------------------
+def draw(rng, table, n):
+    codes = np.array(list(table))
+    weights = np.array(list(table.values()), dtype=float)
+    return rng.choice(codes, size=n, p=weights / weights.sum())
+
+
+def with_tail(rng, values, tail):
+    """Replace a small share of values with uniform draws from [lo, hi]."""
+    share, lo, hi = tail
+    hit = rng.random(len(values)) < share
+    values[hit] = rng.integers(lo, hi + 1, size=int(hit.sum()))
+    return values
+
+
+def missing(rng, values, share, sentinel=-1):
+    values[rng.random(len(values)) < share] = sentinel
+    return values
+
+
+def zipf_weights(count, top_share):
+    """Weights 1/rank**s over count codes, with s chosen so the first gets top_share."""
+    ranks = np.arange(1, count + 1, dtype=float)
+    lo, hi = 0.0, 5.0
+    for _ in range(60):
+        s = (lo + hi) / 2
+        w = ranks ** -s
+        if w[0] / w.sum() < top_share:
+            lo = s
+        else:
+            hi = s
+    return w / w.sum()
+
+
+def ranked_codes(top, prefixes, count):
+    # The real top code first, then made-up codes in the same style
+    return np.array([top] + [f"{prefixes[i % len(prefixes)]}{i:06d}" for i in range(1, count)], dtype=object)
+
+
+def age_band(age):
+    return np.where(age < 0, -1, np.digitize(age, AGE_BAND_EDGES) + 1)
+
+
+def osgr_to_lonlat(easting, northing):
+    # Linear approximation of the OSGB36 -> WGS84 transform; close enough for
+    # plausible coordinates, not for survey work
+    lat = 49.766 + northing / 111_000
+    lon = -2 + (easting - 400000) / (111_320 * np.cos(np.radians(lat)))
+    return lon, lat
+
+
+def summary_targets(path=SUMMARY_FILE):
+    """Per-column describe() rows (count, mean, std, min, 25%, ...) from data_summary.txt."""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    start = next(i for i, line in enumerate(lines) if "Descriptive Statistics" in line)
+    columns = lines[start + 1].split()
+    targets = {c: {} for c in columns}
+    for line in lines[start + 2:]:
+        parts = line.split()
+        if len(parts) != len(columns) + 1:
+            break
+        for col, value in zip(columns, parts[1:]):
+            try:
+                targets[col][parts[0]] = float(value)
+            except ValueError:
+                targets[col][parts[0]] = value
+    return targets
+
+
+# ---- tables ----------------------------------------------------------------
+class _Calendar:
+    """Per-year date strings and sampling weights, built once per year."""
+
+    def __init__(self, year):
+        days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+        self.dates = np.array(days.strftime("%d/%m/%Y"), dtype=object)
+        # pandas Monday = 0 -> DfT Monday = 2, Sunday = 1
+        self.day_of_week = ((days.dayofweek + 1) % 7 + 1).to_numpy()
+        weights = (np.array([DAY_WEIGHTS[d] for d in self.day_of_week])
+                   * np.array(MONTH_WEIGHTS)[days.month.to_numpy() - 1])
+        self.weights = weights / weights.sum()
+        self.times = np.array([f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)], dtype=object)
+        hours = np.array(HOUR_WEIGHTS)
+        self.hour_weights = hours / hours.sum()
+
+
+class _Pools:
+    """Code lists shared by every chunk (districts, LSOAs, make/models)."""
+
+    def __init__(self):
+        self.ons = ranked_codes(TOP_ONS_DISTRICT[0], ("E06", "E07", "E08", "E09", "W06", "S12"), ONS_DISTRICTS)
+        self.ons_weights = zipf_weights(ONS_DISTRICTS, TOP_ONS_DISTRICT[1])
+        self.highway = ranked_codes(TOP_HIGHWAY[0], ("E06", "E10", "E09", "W06", "S12"), HIGHWAYS)
+        self.highway_weights = zipf_weights(HIGHWAYS, TOP_HIGHWAY[1])
+        self.lsoa = np.array([f"E01{i:06d}" for i in range(LSOA_POOL)], dtype=object)
+        self.make_model = np.array(MAKE_MODELS + [f"MAKE {i:04d} MODEL" for i in range(MAKE_MODEL_TAIL)],
+                                   dtype=object)
+        self.make_model_weights = zipf_weights(len(self.make_model), 0.06)
+
+    def lsoa_codes(self, rng, n, missing_share):
+        codes = self.lsoa[rng.integers(0, LSOA_POOL, size=n)]
+        codes[rng.random(n) < missing_share] = "-1"
+        return codes
+
+
+def _check_columns(data, registry, table):
+    if set(data) != set(registry):
+        raise ValueError(f"Synthetic {table} columns drifted from the schema registry: "
+                         f"{sorted(set(data) ^ set(registry))}")
+    return pd.DataFrame({col: data[col] for col in registry})
+
+
+def collisions(rng, n, year, first_seq, calendar, pools):
+    """n synthetic collisions for one year, references numbered from first_seq."""
+    centre = rng.choice(len(CENTRES), size=n, p=np.array([c[2] for c in CENTRES]) / sum(c[2] for c in CENTRES))
+    core = rng.random(n) < CORE_SHARE
+    spread = np.where(core, CORE_SPREAD, REGION_SPREAD)
+    xy = np.array([(c[0], c[1]) for c in CENTRES], dtype=float)[centre]
+    easting = np.clip(np.round(xy[:, 0] + rng.normal(0, 1, n) * spread), GB_BOX[0], GB_BOX[2])
+    northing = np.clip(np.round(xy[:, 1] + rng.normal(0, 1, n) * spread), GB_BOX[1], GB_BOX[3])
+    longitude, latitude = osgr_to_lonlat(easting, northing)
+    lost = rng.random(n) < MISSING_LOCATION
+    for values in (easting, northing, longitude, latitude):
+        values[lost] = np.nan
+    police_force = np.array([c[3] for c in CENTRES])[centre]
+
+    urban = np.where(rng.random(n) < np.where(core, URBAN_SHARE["core"], URBAN_SHARE["region"]), 1, 2)
+    speed_limit = np.where(urban == 1, draw(rng, SPEED_LIMITS[1], n), draw(rng, SPEED_LIMITS[2], n))
+    codes = {col: draw(rng, table, n) for col, table in COLLISION_CODES.items()}
+
+    # Severity leans on speed, darkness and rural roads while keeping the overall split
+    risk = 1 + 0.8 * (speed_limit >= 60) + 0.4 * (codes["light_conditions"] >= 4) + 0.3 * (urban == 2)
+    risk = risk / risk.mean()
+    u = rng.random(n)
+    severity = np.full(n, 3)
+    severity[u < (SEVERITY[1] + SEVERITY[2]) * risk] = 2
+    severity[u < SEVERITY[1] * risk] = 1
+    enhanced = np.where(severity == 2, draw(rng, ENHANCED_SERIOUS, n), severity)
+    enhanced = missing(rng, enhanced, ENHANCED_MISSING)
+
+    # Not at a junction: no junction control and no second road
+    junction = codes["junction_detail"]
+    at_junction = junction != 0
+    codes["junction_control"] = np.where(at_junction, codes["junction_control"], -1)
+    codes["second_road_class"] = np.where(at_junction, codes["second_road_class"], 0)
+    road_class = codes["first_road_class"]
+    first_number = np.select(
+        [road_class <= 2, road_class == 3, road_class == 4],
+        [rng.integers(1, 70, n), np.exp(rng.uniform(np.log(10), np.log(6000), n)).astype(int),
+         rng.integers(1000, 9177, n)], 0)
+    second_class = codes["second_road_class"]
+    second_number = np.select(
+        [~at_junction, second_class == 3, second_class == 4],
+        [-1, np.exp(rng.uniform(0, np.log(2000), n)).astype(int), rng.integers(1000, 10000, n)], 0)
+
+    day = rng.choice(len(calendar.dates), size=n, p=calendar.weights)
+    hour = rng.choice(24, size=n, p=calendar.hour_weights)
+    minute = np.where(rng.random(n) < ROUNDED_TIMES, draw(rng, ROUNDED_MINUTES, n), rng.integers(0, 60, n))
+
+    reference = pd.Series(police_force).map("{:02d}".format) + pd.Series(np.arange(first_seq, first_seq + n)).map(
+        "{:07d}".format)
+    data = {
+        "accident_index": (str(year) + reference).to_numpy(),
+        "accident_year": np.full(n, year),
+        "accident_reference": reference.to_numpy(),
+        "location_easting_osgr": easting,
+        "location_northing_osgr": northing,
+        "longitude": np.round(longitude, 6),
+        "latitude": np.round(latitude, 6),
+        "police_force": police_force,
+        "accident_severity": severity,
+        "number_of_vehicles": with_tail(rng, draw(rng, VEHICLES, n), VEHICLE_TAIL),
+        "number_of_casualties": with_tail(rng, draw(rng, CASUALTIES, n), CASUALTY_TAIL),
+        "date": calendar.dates[day],
+        "day_of_week": calendar.day_of_week[day],
+        "time": calendar.times[hour * 60 + minute],
+        # Retired by DfT in 2019; published as -1
+        "local_authority_district": np.full(n, -1),
+        "local_authority_ons_district": rng.choice(pools.ons, size=n, p=pools.ons_weights),
+        "local_authority_highway": rng.choice(pools.highway, size=n, p=pools.highway_weights),
+        "first_road_number": first_number,
+        "speed_limit": speed_limit,
+        "second_road_number": second_number,
+        "urban_or_rural_area": urban,
+        "lsoa_of_accident_location": pools.lsoa_codes(rng, n, LSOA_MISSING),
+        "enhanced_severity_collision": enhanced,
+    }
+    data.update(codes)
+    return _check_columns(data, COLLISION_DTYPES, "collisions")
+
+
+def _expand(coll, counts):
+    # Row i of the child table belongs to accident owner[i] and is its ref[i]-th row
+    counts = counts.to_numpy()
+    owner = np.repeat(np.arange(len(coll)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.arange(len(owner)) - starts + 1
+
+
+def casualties(rng, coll, pools):
+    """number_of_casualties rows per collision; the first carries the accident's severity."""
+    owner, ref = _expand(coll, coll["number_of_casualties"])
+    n = len(owner)
+    accident_severity = coll["accident_severity"].to_numpy()[owner]
+    severity = np.where(ref == 1, accident_severity,
+                        np.maximum(accident_severity, draw(rng, OTHER_CASUALTY_SEVERITY, n)))
+    codes = {col: draw(rng, table, n) for col, table in CASUALTY_CODES.items()}
+    pedestrian = codes["casualty_class"] == 3
+    casualty_type = np.where(pedestrian, 0, codes["casualty_type"])
+    age = missing(rng, np.clip(np.round(rng.normal(36, 19, n)), 0, 100).astype(int), 0.03)
+    vehicles = coll["number_of_vehicles"].to_numpy()[owner]
+    enhanced = missing(rng, np.where(severity == 2, draw(rng, ENHANCED_SERIOUS, n), severity), ENHANCED_MISSING)
+
+    data = {
+        "accident_index": coll["accident_index"].to_numpy()[owner],
+        "accident_year": coll["accident_year"].to_numpy()[owner],
+        "accident_reference": coll["accident_reference"].to_numpy()[owner],
+        "vehicle_reference": (rng.random(n) * vehicles).astype(int) + 1,
+        "casualty_reference": ref,
+        "age_of_casualty": age,
+        "age_band_of_casualty": age_band(age),
+        "casualty_severity": severity,
+        "casualty_type": casualty_type,
+        "lsoa_of_casualty": pools.lsoa_codes(rng, n, LSOA_CASUALTY_MISSING),
+        "enhanced_casualty_severity": enhanced,
+    }
+    data.update({col: codes[col] for col in CASUALTY_CODES if col not in data})
+    # Pedestrian-only and passenger-only fields are 0 for everyone else
+    for col in ("pedestrian_location", "pedestrian_movement", "pedestrian_road_maintenance_worker"):
+        data[col] = np.where(pedestrian, data[col], 0)
+    data["car_passenger"] = np.where((codes["casualty_class"] == 2) & (casualty_type == 9), data["car_passenger"], 0)
+    data["bus_or_coach_passenger"] = np.where(casualty_type == 11, data["bus_or_coach_passenger"], 0)
+    return _check_columns(data, CASUALTY_DTYPES, "casualties")
+
+
+def vehicles(rng, coll, pools):
+    """number_of_vehicles rows per collision."""
+    owner, ref = _expand(coll, coll["number_of_vehicles"])
+    n = len(owner)
+    codes = {col: draw(rng, table, n) for col, table in VEHICLE_CODES.items()}
+    vehicle_type = codes["vehicle_type"]
+    engine = np.round(rng.lognormal(np.log(1600), 0.35, n), -1).astype(int)
+    engine = missing(rng, np.where(np.isin(vehicle_type, NO_ENGINE), -1, engine), ENGINE_MISSING)
+    codes["propulsion_code"] = np.where(np.isin(vehicle_type, NO_ENGINE), -1, codes["propulsion_code"])
+    age = missing(rng, np.clip(np.round(rng.normal(40, 15, n)), 17, 95).astype(int), DRIVER_AGE_MISSING)
+    make_model = rng.choice(pools.make_model, size=n, p=pools.make_model_weights)
+    make_model[rng.random(n) < MAKE_MODEL_MISSING] = "-1"
+
+    data = {
+        "accident_index": coll["accident_index"].to_numpy()[owner],
+        "accident_year": coll["accident_year"].to_numpy()[owner],
+        "accident_reference": coll["accident_reference"].to_numpy()[owner],
+        "vehicle_reference": ref,
+        "age_of_driver": age,
+        "age_band_of_driver": age_band(age),
+        "engine_capacity_cc": engine,
+        "age_of_vehicle": missing(rng, rng.integers(0, 26, n), VEHICLE_AGE_MISSING),
+        "generic_make_model": make_model,
+        "lsoa_of_driver": pools.lsoa_codes(rng, n, LSOA_DRIVER_MISSING),
+        "escooter_flag": (rng.random(n) < ESCOOTER).astype(int),
+        # Grid references of the direction of travel are not modelled; left blank
+        "dir_from_e": np.full(n, np.nan),
+        "dir_from_n": np.full(n, np.nan),
+        "dir_to_e": np.full(n, np.nan),
+        "dir_to_n": np.full(n, np.nan),
+    }
+    data.update(codes)
+    return _check_columns(data, VEHICLE_DTYPES, "vehicles")
+
+
+# ---- writer ----------------------------------------------------------------
+def generate(out_dir, scale=1.0, years=(YEAR,), seed=SEED, chunksize=CHUNK_SIZE):
+    """Write collisions/casualties/vehicles_<year>.csv for scale x BASE_ROWS collisions.
+
+    The rows are split evenly over years. Returns {year: {table: path}} and
+    records the parameters in synthetic.json, so callers can tell whether an
+    existing directory already holds the requested data.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    total = int(round(BASE_ROWS * scale))
+    per_year = np.diff(np.linspace(0, total, len(years) + 1).round().astype(int))
+    pools = _Pools()
+    seeds = np.random.SeedSequence(seed).spawn(len(years))
+    files, rows = {}, {}
+    for year, n_year, seq in zip(years, per_year, seeds):
+        calendar = _Calendar(year)
+        rng = np.random.default_rng(seq)
+        paths = {table: os.path.join(out_dir, f"{table}_{year}.csv")
+                 for table in ("collisions", "casualties", "vehicles")}
+        counts = dict.fromkeys(paths, 0)
+        for start in range(0, int(n_year), chunksize):
+            coll = collisions(rng, min(chunksize, int(n_year) - start), year, start, calendar, pools)
+            for table, df in (("collisions", coll), ("casualties", casualties(rng, coll, pools)),
+                              ("vehicles", vehicles(rng, coll, pools))):
+                df.to_csv(paths[table], mode="w" if start == 0 else "a", header=start == 0, index=False)
+                counts[table] += len(df)
+        files[year], rows[year] = paths, counts
+        print(f"{year}: " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump({"params": manifest_params(scale, years, seed), "rows": rows, "files": files}, f, indent=2)
+    return files
+
+
+def manifest_params(scale, years, seed):
+    return {"scale": scale, "base_rows": BASE_ROWS, "years": list(years), "seed": seed}
+
+
+def is_generated(out_dir, scale=1.0, years=(YEAR,), seed=SEED):
+    """True if out_dir already holds data generated with these parameters."""
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        manifest = json.load(f)
+    return (manifest.get("params") == manifest_params(scale, years, seed)
+            and all(os.path.exists(p) for paths in manifest["files"].values() for p in paths.values()))
+
+
+def compare_to_summary(path, summary_path=SUMMARY_FILE):
+    """Generated vs published mean/std/quartiles for every numeric collision column."""
+    from stats import compute_stats
+    stats = compute_stats(path)
+    targets = summary_targets(summary_path)
+    rows = []
+    for name in stats.numeric_columns():
+        target = targets.get(name, {})
+        if not isinstance(target.get("mean"), float):
+            continue
+        col = stats.columns[name]
+        q1, median, q3 = col.quantiles((0.25, 0.5, 0.75)).values()
+        rows.append({"column": name, "mean": col.mean, "target_mean": target["mean"],
+                     "std": col.std, "target_std": target["std"],
+                     "quartiles": (q1, median, q3), "target_quartiles": (target["25%"], target["50%"], target["75%"])})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic DfT-shaped collision data")
+    parser.add_argument("--out", default="../data/synthetic")
+    parser.add_argument("--scale", type=float, default=1.0, help=f"multiple of {BASE_ROWS} collisions")
+    parser.add_argument("--years", type=int, nargs="+", default=[YEAR], help="rows are split evenly over these")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--check", action="store_true", help="compare the collisions with data_summary.txt")
+    args = parser.parse_args(argv)
+
+    files = generate(args.out, args.scale, args.years, args.seed)
+    if args.check:
+        pd.set_option("display.width", 200)
+        print(compare_to_summary(files[args.years[0]]["collisions"]).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# temporal.py
+import argparse
+import math
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from schema import find_column
+
+# =========================
+# Temporal features from the DfT date / time columns
+# =========================
+# Dates ("26/08/2021") and times ("05:46") repeat heavily: a year has at most
+# 366 distinct dates and a day 1,440 distinct minutes. Each chunk is
+# factorized, only strings not seen before are parsed (with a fixed format),
+# and the features of every distinct string are cached for later chunks and
+# later records. Rows then take their features by code, so the cost per row
+# is one factorize and one take, whatever the number of years.
+#
+# Hour and month are encoded cyclically (23:59 sits next to 00:00, December
+# next to January). Bank holidays come from a local calendar table built
+# from the England and Wales rules plus the one-off changes below; Scotland
+# and Northern Ireland have further regional holidays that are not flagged.
+DATE_COLUMN = "date"
+TIME_COLUMN = "time"
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S")
+DATE_FEATURES = ("month", "month_sin", "month_cos", "weekday", "is_weekend",
+                 "is_bank_holiday", "is_holiday_period")
+TIME_FEATURES = ("hour", "hour_sin", "hour_cos")
+TEMPORAL_FEATURES = DATE_FEATURES + TIME_FEATURES
+FEATURE_DTYPES = {name: np.float32 if name.endswith(("_sin", "_cos")) else np.int8 for name in TEMPORAL_FEATURES}
+# Unparseable or missing: codes -1, cyclical features at the origin, flags off
+UNKNOWN = {name: 0.0 if name.endswith(("_sin", "_cos")) else (-1 if name in ("month", "weekday", "hour") else 0)
+           for name in TEMPORAL_FEATURES}
+# Christmas to New Year counts as a holiday period in its own right
+CHRISTMAS_PERIOD = ((12, 24), (1, 1))
+# One-off changes to the England and Wales bank holidays
+MOVED_HOLIDAYS = {
+    "1995-05-01": "1995-05-08",  # early May, VE Day 50th anniversary
+    "2002-05-27": "2002-06-04",  # spring, Golden Jubilee
+    "2012-05-28": "2012-06-04",  # spring, Diamond Jubilee
+    "2020-05-04": "2020-05-08",  # early May, VE Day 75th anniversary
+    "2022-05-30": "2022-06-02",  # spring, Platinum Jubilee
+}
+EXTRA_HOLIDAYS = {
+    "1999-12-31": "Millennium",
+    "2002-06-03": "Golden Jubilee",
+    "2011-04-29": "Royal wedding",
+    "2012-06-05": "Diamond Jubilee",
+    "2022-06-03": "Platinum Jubilee",
+    "2022-09-19": "State funeral of Queen Elizabeth II",
+    "2023-05-08": "Coronation of King Charles III",
+}
+BENCH_ROWS = 1_000_000
+BENCH_CHUNK_SIZE = 100_000
+
+
+# ---- calendar --------------------------------------------------------------
+def easter_sunday(year):
+    # Anonymous Gregorian computus
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (b - (b + 8) // 25 + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _monday(year, month, last=False):
+    # First (or last) Monday of a month
+    day = date(year, month, 1) if not last else date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    step = 1 if not last else -1
+    while day.weekday() != 0:
+        day += timedelta(days=step)
+    return day
+
+
+def bank_holidays(year):
+    """{date: name} of the England and Wales bank holidays in a year."""
+    easter = easter_sunday(year)
+    fixed = {date(year, 1, 1): "New Year's Day", date(year, 12, 25): "Christmas Day", date(year, 12, 26): "Boxing Day"}
+    holidays = {
+        easter - timedelta(days=2): "Good Friday",
+        easter + timedelta(days=1): "Easter Monday",
+        _monday(year, 5): "Early May bank holiday",
+        _monday(year, 5, last=True): "Spring bank holiday",
+        _monday(year, 8, last=True): "Summer bank holiday",
+    }
+    # Fixed-date holidays on a weekend move to the next weekday that is not already a holiday
+    holidays.update({day: name for day, name in fixed.items() if day.weekday() < 5})
+    for day, name in sorted(fixed.items()):
+        if day.weekday() >= 5:
+            substitute = day
+            while substitute.weekday() >= 5 or substitute in holidays:
+                substitute += timedelta(days=1)
+            holidays[substitute] = f"{name} (substitute day)"
+    for old, new in MOVED_HOLIDAYS.items():
+        old, new = date.fromisoformat(old), date.fromisoformat(new)
+        if old in holidays:
+            holidays[new] = holidays.pop(old)
+    holidays.update({date.fromisoformat(day): name for day, name in EXTRA_HOLIDAYS.items()
+                     if date.fromisoformat(day).year == year})
+    return dict(sorted(holidays.items()))
+
+
+def calendar_table(years):
+    """The local calendar table: one row per bank holiday (date, name)."""
+    rows = [(day, name) for year in years for day, name in bank_holidays(year).items()]
+    return pd.DataFrame(rows, columns=["date", "name"])
+
+
+def holiday_periods(holidays):
+    """Bank holidays plus the weekend days joined to them, as a set of dates."""
+    days = set(holidays)
+    for day in holidays:
+        for step in (-1, 1):
+            other = day + timedelta(days=step)
+            while other.weekday() >= 5:
+                days.add(other)
+                other += timedelta(days=step)
+    return days
+
+
+# ---- features --------------------------------------------------------------
+def _parse(values, formats):
+    # Fixed formats only, tried in order on whatever the previous one left unparsed
+    parsed = pd.Series(pd.NaT, index=range(len(values)), dtype="datetime64[ns]")
+    values = pd.Series(values, dtype=object)
+    for fmt in formats:
+        missing = parsed.isna().to_numpy()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors="coerce").to_numpy()
+    return parsed
+
+
+def _cyclical(values, period):
+    angle = 2 * np.pi * values / period
+    return np.sin(angle), np.cos(angle)
+
+
+class TemporalFeatures:
+    """Vectorised temporal features with a cache of every date and time string seen.
+
+    transform() works on whole frames or on streaming chunks alike; record()
+    gives the features of a single (date, time) pair for row-at-a-time scoring.
+    """
+
+    def __init__(self):
+        self._tables = {"date": pd.DataFrame(columns=list(DATE_FEATURES), dtype=float),
+                        "time": pd.DataFrame(columns=list(TIME_FEATURES), dtype=float)}
+        self._holidays = {}
+        # Per-string feature dicts for record(), filled on first use
+        self._records = {"date": {}, "time": {}}
+
+    def _holiday_sets(self, years):
+        for year in years:
+            if year not in self._holidays:
+                # A period can spill into the neighbouring years (New Year's Day on a Monday)
+                days = {}
+                for y in (year - 1, year, year + 1):
+                    days.update(bank_holidays(y))
+                self._holidays[year] = (set(bank_holidays(year)), holiday_periods(days))
+        return self._holidays
+
+    def _date_features(self, strings):
+        parsed = _parse(strings, DATE_FORMATS)
+        ok = parsed.notna().to_numpy()
+        days = parsed[ok].dt
+        month = days.month.to_numpy()
+        features = pd.DataFrame(np.nan, index=strings, columns=list(DATE_FEATURES))
+        if ok.any():
+            sets = self._holiday_sets(set(days.year.tolist()))
+            dates = parsed[ok].dt.date
+            holiday = np.array([d in sets[d.year][0] for d in dates])
+            period = np.array([d in sets[d.year][1] or (d.month, d.day) >= CHRISTMAS_PERIOD[0]
+                               or (d.month, d.day) <= CHRISTMAS_PERIOD[1] for d in dates])
+            month_sin, month_cos = _cyclical(month - 1, 12)
+            weekday = days.weekday.to_numpy()
+            features.loc[ok, :] = np.column_stack([month, month_sin, month_cos, weekday, weekday >= 5,
+                                                   holiday, period])
+        return features
+
+    def _time_features(self, strings):
+        parsed = _parse(strings, TIME_FORMATS)
+        ok = parsed.notna().to_numpy()
+        features = pd.DataFrame(np.nan, index=strings, columns=list(TIME_FEATURES))
+        if ok.any():
+            hour = parsed[ok].dt.hour.to_numpy()
+            # Minute of the day, so 07:59 and 08:00 are neighbours too
+            hour_sin, hour_cos = _cyclical(hour * 60 + parsed[ok].dt.minute.to_numpy(), 24 * 60)
+            features.loc[ok, :] = np.column_stack([hour, hour_sin, hour_cos])
+        return features
+
+    def _lookup(self, kind, values):
+        """Feature rows (float, NaN = unknown) for values, parsing only unseen strings."""
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Index(np.asarray(uniques, dtype=object).astype(str))
+        table = self._tables[kind]
+        new = uniques.difference(table.index)
+        if len(new):
+            build = self._date_features if kind == "date" else self._time_features
+            table = self._tables[kind] = pd.concat([table, build(new)])
+        rows = np.vstack([table.reindex(uniques).to_numpy(dtype=float), np.full((1, table.shape[1]), np.nan)])
+        # Missing values (code -1) take the all-unknown row at the end
+        return rows[np.where(codes < 0, len(uniques), codes)]
+
+    def features(self, dates=None, times=None, index=None):
+        """The temporal feature frame for aligned date and time arrays (either may be None)."""
+        out = {}
+        for kind, values, names in (("date", dates, DATE_FEATURES), ("time", times, TIME_FEATURES)):
+            if values is None:
+                for name in names:
+                    out[name] = np.full(len(index), UNKNOWN[name], dtype=FEATURE_DTYPES[name])
+                continue
+            rows = self._lookup(kind, values)
+            for i, name in enumerate(names):
+                column = rows[:, i]
+                out[name] = np.where(np.isnan(column), UNKNOWN[name], column).astype(FEATURE_DTYPES[name])
+        return pd.DataFrame(out, index=index, copy=False)
+
+    def transform(self, df):
+        """df with the temporal features added (the date/time columns are left in place)."""
+        date_col, time_col = find_column(df.columns, DATE_COLUMN), find_column(df.columns, TIME_COLUMN)
+        if date_col is None and time_col is None:
+            print(f"WARNING: no {DATE_COLUMN} or {TIME_COLUMN} column; temporal features are all unknown.")
+        features = self.features(df[date_col].to_numpy() if date_col else None,
+                                 df[time_col].to_numpy() if time_col else None, index=df.index)
+        return pd.concat([df.drop(columns=[c for c in TEMPORAL_FEATURES if c in df.columns]), features], axis=1)
+
+    def record(self, date_value=None, time_value=None):
+        """{feature: value} for one date and time string (None or unparseable -> unknown)."""
+        out = {}
+        for kind, value, names in (("date", date_value, DATE_FEATURES), ("time", time_value, TIME_FEATURES)):
+            cache = self._records[kind]
+            if value not in cache:
+                frame = self.features(**{kind + "s": np.array([value], dtype=object)}, index=[0])
+                cache[value] = {name: frame[name].iat[0].item() for name in names}
+            out.update(cache[value])
+        return out
+
+
+def add_temporal_features(df, extractor=None):
+    return (extractor or TemporalFeatures()).transform(df)
+
+
+# ---- benchmark -------------------------------------------------------------
+def _row_by_row(dates, times):
+    # The per-row approach this module replaces: strptime and Python arithmetic for every row
+    holidays = {}
+    out = []
+    for d, t in zip(dates, times):
+        day = datetime.strptime(d, DATE_FORMATS[0]).date()
+        if day.year not in holidays:
+            holidays[day.year] = set(bank_holidays(day.year))
+        clock = datetime.strptime(t, TIME_FORMATS[0])
+        minutes = clock.hour * 60 + clock.minute
+        out.append((day.month, math.sin(2 * math.pi * (day.month - 1) / 12), day.weekday(),
+                    day in holidays[day.year], clock.hour, math.sin(2 * math.pi * minutes / 1440)))
+    return out
+
+
+def sample_strings(rows, years=(2019, 2020, 2021, 2022, 2023), seed=42):
+    """DfT-formatted date and time strings for rows random accidents."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(f"{min(years)}-01-01")
+    span = (np.datetime64(f"{max(years) + 1}-01-01") - start).astype(int)
+    days = pd.to_datetime(start + rng.integers(0, span, rows).astype("timedelta64[D]"))
+    minutes = rng.integers(0, 24 * 60, rows)
+    dates = days.strftime("%d/%m/%Y").to_numpy(dtype=object)
+    times = np.char.add(np.char.add(np.char.zfill((minutes // 60).astype(str), 2), ":"),
+                        np.char.zfill((minutes % 60).astype(str), 2)).astype(object)
+    return dates, times
+
+
+def benchmark(rows=BENCH_ROWS, chunksize=BENCH_CHUNK_SIZE, baseline_rows=100_000):
+    """Rows per second: row-by-row parsing, then chunked extraction with a cold and a warm cache."""
+    dates, times = sample_strings(rows)
+    results = {}
+
+    start = time.perf_counter()
+    _row_by_row(dates[:baseline_rows], times[:baseline_rows])
+    results["row_by_row"] = baseline_rows / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pd.to_datetime(pd.Series(dates) + " " + pd.Series(times), format="%d/%m/%Y %H:%M")
+    results["to_datetime_only"] = rows / (time.perf_counter() - start)
+
+    extractor = TemporalFeatures()
+    for label in ("chunked_cold_cache", "chunked_warm_cache"):
+        start = time.perf_counter()
+        for offset in range(0, rows, chunksize):
+            extractor.features(dates[offset:offset + chunksize], times[offset:offset + chunksize],
+                               index=range(min(chunksize, rows - offset)))
+        results[label] = rows / (time.perf_counter() - start)
+
+    for label, rate in results.items():
+        print(f"{label:<20} {rate:>14,.0f} rows/s")
+    return {label: round(rate) for label, rate in results.items()}
+
+
+def main(argv=None):
+    from instrument import REPORT_DIR_NAME, Run
+
+    parser = argparse.ArgumentParser(description="Temporal features from the DfT date/time columns")
+    sub = parser.add_subparsers(dest="command", required=True)
+    calendar = sub.add_parser("calendar", help="print or save the local bank holiday table")
+    calendar.add_argument("years", nargs="+", type=int, help="first and last year")
+    calendar.add_argument("--out", help="CSV path instead of printing")
+    bench = sub.add_parser("benchmark", help="rows per second on synthetic date/time strings")
+    bench.add_argument("--rows", type=int, default=BENCH_ROWS)
+    bench.add_argument("--chunksize", type=int, default=BENCH_CHUNK_SIZE)
+    bench.add_argument("--report-dir", default=REPORT_DIR_NAME)
+    args = parser.parse_args(argv)
+
+    if args.command == "calendar":
+        table = calendar_table(range(min(args.years), max(args.years) + 1))
+        if args.out:
+            table.to_csv(args.out, index=False)
+            print(f"{len(table)} bank holidays saved to: {args.out}")
+        else:
+            print(table.to_string(index=False))
+    else:
+        with Run("temporal_benchmark", args.report_dir) as run:
+            with run.stage("benchmark") as record:
+                record.extra["rows_per_second"] = benchmark(args.rows, args.chunksize)
+                record.count(args.rows)
+
+
+if __name__ == "__main__":
+    main()
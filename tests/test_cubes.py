@@ -0,0 +1,41 @@
+import pandas as pd
+from cubes import build_cubes, refresh_cubes
+
+
+def write_year(path, year, rows):
+    pd.DataFrame({
+        "accident_year": [year] * rows,
+        "accident_severity": [1 + i % 3 for i in range(rows)],
+        "speed_limit": [30 + 10 * (i % 2) for i in range(rows)],
+        "light_conditions": [1] * rows,
+        "weather_conditions": [1 + i % 2 for i in range(rows)],
+        "road_type": [6] * rows,
+        "urban_or_rural_area": [1 + i % 2 for i in range(rows)],
+        "police_force": [i % 4 for i in range(rows)],
+        "day_of_week": [1 + i % 7 for i in range(rows)],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def same(a, b):
+    return a.year_rows == b.year_rows and all(a.cube(n).sort_index().equals(b.cube(n).sort_index())
+                                              for n in a.dimensions)
+
+
+def test_only_changed_years_are_rebuilt(tmp_path):
+    partitions = {year: write_year(tmp_path / f"merged_{year}.csv", year, 50) for year in (2021, 2022, 2023)}
+    target = str(tmp_path / "cubes.json")
+
+    _, changed = refresh_cubes(target, partitions)
+    assert changed == [2021, 2022, 2023]
+    assert refresh_cubes(target, partitions)[1] == []
+
+    write_year(partitions[2022], 2022, 40)
+    cubes, changed = refresh_cubes(target, partitions)
+    assert changed == [2022]
+    merged = tmp_path / "merged.csv"
+    pd.concat([pd.read_csv(p) for p in partitions.values()]).to_csv(merged, index=False)
+    assert same(cubes, build_cubes(str(merged)))
+
+    cubes, changed = refresh_cubes(target, {2022: partitions[2022], 2023: partitions[2023]})
+    assert changed == [] and cubes.years() == [2022, 2023]
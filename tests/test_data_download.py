@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import data_download
+from data_download import MANIFEST_NAME, download, load_manifest
+
+CONTENT = bytes(range(256)) * 4096 * 3  # 3 MiB, several download chunks
+
+
+class StandIn:
+    """What the local stand-in for data.dft.gov.uk serves, and what it was asked."""
+
+    def __init__(self, content=CONTENT, etag='"v1"'):
+        self.content = content
+        self.etag = etag
+        self.cut_after = None  # close the connection after this many body bytes
+        self.requests = []
+
+
+def _handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            headers = dict(self.headers.items())
+            self.requests_entry = {"headers": headers}
+            state.requests.append(self.requests_entry)
+            content, etag = state.content, state.etag
+            if headers.get("If-None-Match") == etag:
+                return self._send(304, b"")
+            start = 0
+            if "Range" in headers and headers.get("If-Range", etag) == etag:
+                start = int(headers["Range"].split("=")[1].rstrip("-"))
+                if start >= len(content):
+                    return self._send(416, b"", {"Content-Range": f"bytes */{len(content)}"})
+                body = content[start:]
+                return self._send(206, body, {"Content-Range": f"bytes {start}-{len(content) - 1}/{len(content)}"})
+            self._send(200, content)
+
+        def _send(self, status, body, extra=None):
+            self.requests_entry["status"] = status
+            self.send_response(status)
+            self.send_header("ETag", state.etag)
+            for name, value in (extra or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if state.cut_after is not None and len(body) > state.cut_after:
+                self.wfile.write(body[:state.cut_after])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def server():
+    state = StandIn()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(state))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{httpd.server_address[1]}/collisions_2023.csv"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(data_download.time, "sleep", lambda seconds: None)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def interrupted_download(server, outpath, monkeypatch, cut_after=1_500_000):
+    # One attempt that dies mid-body, as if the process had been killed
+    server.cut_after = cut_after
+    monkeypatch.setattr(data_download, "ATTEMPTS", 1)
+    with pytest.raises(RuntimeError):
+        download(server.url, str(outpath))
+    server.cut_after = None
+    monkeypatch.setattr(data_download, "ATTEMPTS", 5)
+
+
+def test_resume_across_runs_uses_range_and_if_range(server, tmp_path, monkeypatch):
+    outpath = tmp_path / "collisions_2023.csv"
+    interrupted_download(server, outpath, monkeypatch)
+    part_size = os.path.getsize(str(outpath) + ".part")
+    assert 0 < part_size < len(CONTENT)
+    # The validators reached the manifest on disk before the run died
+    assert load_manifest(str(tmp_path))["collisions_2023.csv"]["partial"]["etag"] == '"v1"'
+
+    entry = download(server.url, str(outpath))
+    resumed = server.requests[-1]
+    assert resumed["headers"]["Range"] == f"bytes={part_size}-"
+    assert resumed["headers"]["If-Range"] == '"v1"'
+    assert resumed["status"] == 206
+    assert outpath.read_bytes() == CONTENT
+    assert entry["sha256"] == sha256(CONTENT)
+    assert "partial" not in load_manifest(str(tmp_path))["collisions_2023.csv"]
+
+
+def test_unchanged_file_is_skipped_on_304(server, tmp_path):
+    outpath = tmp_path / "collisions_2023.csv"
+    first = download(server.url, str(outpath))
+    second = download(server.url, str(outpath))
+    assert server.requests[-1]["headers"]["If-None-Match"] == '"v1"'
+    assert server.requests[-1]["status"] == 304
+    assert second == first
+    assert len(server.requests) == 2
+
+
+def test_etag_change_forces_full_download_instead_of_resume(server, tmp_path, monkeypatch):
+    outpath = tmp_path / "collisions_2023.csv"
+    interrupted_download(server, outpath, monkeypatch)
+    server.content, server.etag = CONTENT[::-1], '"v2"'
+
+    entry = download(server.url, str(outpath))
+    assert server.requests[-1]["headers"]["If-Range"] == '"v1"'
+    assert server.requests[-1]["status"] == 200
+    assert outpath.read_bytes() == CONTENT[::-1]
+    assert entry["etag"] == '"v2"' and entry["sha256"] == sha256(CONTENT[::-1])
+
+
+def test_etag_change_replaces_a_complete_file(server, tmp_path):
+    outpath = tmp_path / "collisions_2023.csv"
+    download(server.url, str(outpath))
+    server.content, server.etag = b"new,data\n", '"v2"'
+    entry = download(server.url, str(outpath))
+    assert server.requests[-1]["status"] == 200
+    assert outpath.read_bytes() == b"new,data\n"
+    assert entry["sha256"] == sha256(b"new,data\n")
+
+
+def test_checksum_mismatch_downloads_again(server, tmp_path):
+    outpath = tmp_path / "collisions_2023.csv"
+    download(server.url, str(outpath))
+    outpath.write_bytes(b"corrupted")
+
+    entry = download(server.url, str(outpath))
+    statuses = [r["status"] for r in server.requests]
+    assert statuses == [200, 304, 200]
+    assert outpath.read_bytes() == CONTENT
+    assert entry["sha256"] == sha256(CONTENT)
+
+
+def test_complete_part_file_is_kept_on_416(server, tmp_path):
+    outpath = tmp_path / "collisions_2023.csv"
+    part = tmp_path / "collisions_2023.csv.part"
+    part.write_bytes(CONTENT)
+    manifest = {"collisions_2023.csv": {"url": server.url, "partial": {"etag": '"v1"', "size": len(CONTENT)}}}
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    entry = download(server.url, str(outpath))
+    assert [r["status"] for r in server.requests] == [416]
+    assert outpath.read_bytes() == CONTENT and not part.exists()
+    assert entry["sha256"] == sha256(CONTENT)
+
+
+def test_overlong_part_file_is_restarted_on_416(server, tmp_path):
+    outpath = tmp_path / "collisions_2023.csv"
+    (tmp_path / "collisions_2023.csv.part").write_bytes(CONTENT + b"extra")
+    manifest = {"collisions_2023.csv": {"url": server.url, "partial": {"etag": '"v1"', "size": len(CONTENT)}}}
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    entry = download(server.url, str(outpath))
+    assert [r["status"] for r in server.requests] == [416, 200]
+    assert outpath.read_bytes() == CONTENT
+    assert entry["sha256"] == sha256(CONTENT)
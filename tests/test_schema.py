@@ -0,0 +1,30 @@
+import pandas as pd
+from schema import iter_table_csv, read_table_csv
+
+
+def write_collisions(path, rows=10):
+    lines = ["accident_index,speed_limit,road_type,date"]
+    lines += [f"2023{i:06d},30,6,01/01/2023" for i in range(rows)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_clean_file_gets_registry_dtypes(tmp_path):
+    path = write_collisions(tmp_path / "collisions_2023.csv")
+    for df in [read_table_csv(path)] + list(iter_table_csv(path, chunksize=4)):
+        assert df["speed_limit"].dtype == "int8" and df["road_type"].dtype == "int8"
+
+
+def test_bad_value_in_a_later_chunk_falls_back_like_the_whole_file_read(tmp_path):
+    path = write_collisions(tmp_path / "collisions_2023.csv")
+    lines = path.read_text().splitlines()
+    lines[9] = lines[9].replace(",30,6,", ",,x,")
+    path.write_text("\n".join(lines) + "\n")
+
+    chunks = list(iter_table_csv(path, chunksize=4))
+    full = read_table_csv(path)
+    assert [str(c["speed_limit"].dtype) for c in chunks] == ["int8", "int8", "float64"]
+    assert full["speed_limit"].dtype == "float64" and full["road_type"].iloc[8] == "x"
+    streamed = pd.concat(chunks, ignore_index=True)
+    assert streamed["speed_limit"].isna().sum() == full["speed_limit"].isna().sum() == 1
+    assert streamed["road_type"].astype(str).tolist() == full["road_type"].astype(str).tolist()
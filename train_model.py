@@ -1,20 +1,479 @@
+import argparse
+import itertools
+import json
 import os
-import pandas as pd
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
+import numpy as np
+import pandas as pd
+from arraystore import X_DTYPE, arrays_fresh, attach, export_arrays, load_arrays, share
+from instrument import REPORT_DIR_NAME, Run, peak_rss_mb as process_peak_rss_mb
+from schema import find_column
+from sketches import ReservoirSample, StratifiedSample, stratified_capacities
+from storage import EXTENSIONS, dataset_files, iter_table, table_dtypes
 
 # Path to your data folder
 DATA_DIR = "/Users/akinyeraakintunde/Desktop/GlobalTalent_Project/road-accident-severity/data"
+MODEL_FILE = "severity_model.joblib"
+REPORT_FILE = "training_report.json"
+
+TARGET = "accident_severity"
+# Identifiers, and columns derived from the outcome itself: casualty severity
+# sums and the enhanced severity codes would leak the label into the features.
+EXCLUDE_PREFIXES = ("accident_index", "accident_reference", "casualty_severity",
+                    "enhanced_severity_collision", "enhanced_casualty_severity")
+
+TEST_SIZE = 0.2
+CV_FOLDS = 3
+RANDOM_STATE = 42
+
+# Hyperparameter grids searched in parallel; every (model, params, fold) is one task
+SEARCH_SPACE = {
+    "random_forest": {
+        "n_estimators": [200],
+        "max_depth": [12, None],
+        "min_samples_leaf": [1, 5],
+    },
+    "hist_gradient_boosting": {
+        "learning_rate": [0.05, 0.1],
+        "max_leaf_nodes": [31, 63],
+        "l2_regularization": [0.0, 1.0],
+    },
+}
+
+
+# Streaming mode: the ML-ready dataset is read chunk by chunk and never held
+# whole. A profiling pass fits the scaler and counts the classes; every epoch
+# then feeds each chunk to all incremental candidates at once. Fixed shares
+# of rows (chosen per chunk from a seeded generator, so the same rows every
+# epoch) are held out for model selection (VALIDATION_SIZE) and for the
+# final test (TEST_SIZE). Each held-out set is a bounded sample of those
+# rows, so memory stays flat however many years are merged.
+STREAM_CHUNK_SIZE = 100_000
+STREAM_EPOCHS = 5
+VALIDATION_SIZE = 0.1
+VALIDATION_ROWS = 50_000
+# Stratified samples keep at least this many rows of every class
+VALIDATION_MIN_PER_CLASS = 2_000
+# Row roles in a streamed chunk
+TRAIN, VALID, TEST = 0, 1, 2
+ROLE_NAMES = {TRAIN: "training", VALID: "selection", TEST: "test"}
+STREAMING_SPACE = {
+    "sgd_logistic": {
+        "alpha": [1e-5, 1e-4, 1e-3],
+    },
+    "gaussian_nb": {
+        "var_smoothing": [1e-9],
+    },
+}
+
+
+def find_ml_ready(data_dir):
+    # Automatically find the latest ML-ready dataset (CSV or its columnar copy)
+    ml_ready_files = glob(os.path.join(data_dir, "*_ml_ready.csv"))
+    for ext in EXTENSIONS.values():
+        ml_ready_files += glob(os.path.join(data_dir, f"*_ml_ready{ext}"))
+
+    if not ml_ready_files:
+        raise FileNotFoundError(f"No ML-ready CSV files found in {data_dir}")
+
+    # Pick the most recently modified file; load_table resolves it to the columnar copy when fresh
+    latest_file = max(ml_ready_files, key=os.path.getmtime)
+    return os.path.splitext(latest_file)[0] + ".csv"
+
+
+def feature_columns(dtypes, target):
+    return [
+        col for col, dtype in dtypes.items()
+        if col != target
+        and not col.lower().startswith(EXCLUDE_PREFIXES)
+        and pd.api.types.is_numeric_dtype(dtype)
+    ]
+
+
+def training_arrays(path):
+    """Memory-mapped X (float32) and y for a dataset, exported on first use or when stale."""
+    dtypes = table_dtypes(path)
+    target = find_column(dtypes.index, TARGET)
+    if target is None:
+        raise KeyError(f"Target column {TARGET} not found")
+    features = feature_columns(dtypes, target)
+    if arrays_fresh(path):
+        X, y, meta = load_arrays(path)
+        if meta["features"] == features and meta["target"] == target:
+            return X, y, features, target
+    print("Exporting feature matrix to memory-mapped arrays ...")
+    export_arrays(path, features, target)
+    X, y, _ = load_arrays(path)
+    return X, y, features, target
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS; children covers pool workers.
+    # Our own peak comes from instrument, which survives its per-stage resets
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return process_peak_rss_mb(), round(children / scale, 1)
+
+
+def make_model(name, params, n_jobs=1):
+    if name == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(class_weight="balanced", n_jobs=n_jobs,
+                                      random_state=RANDOM_STATE, **params)
+    if name == "hist_gradient_boosting":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        # Early stopping on an internal validation split caps the boosting rounds
+        return HistGradientBoostingClassifier(class_weight="balanced", max_iter=500, early_stopping=True,
+                                              validation_fraction=0.1, n_iter_no_change=20,
+                                              random_state=RANDOM_STATE, **params)
+    raise ValueError(f"Unknown model: {name}")
+
+
+def make_incremental_model(name, params):
+    if name == "sgd_logistic":
+        from sklearn.linear_model import SGDClassifier
+        # Logistic loss, so the saved model has predict_proba for scoring
+        return SGDClassifier(loss="log_loss", random_state=RANDOM_STATE, **params)
+    if name == "gaussian_nb":
+        from sklearn.naive_bayes import GaussianNB
+        return GaussianNB(**params)
+    raise ValueError(f"Unknown incremental model: {name}")
+
+
+# Training data for pool workers, set once per process by the initializer
+_WORKER_DATA = {}
+
+
+def _init_worker(X, y):
+    # Memory-mapped arrays arrive as file names and are mapped, not copied
+    _WORKER_DATA["X"] = attach(X)
+    _WORKER_DATA["y"] = attach(y)
+
+
+def _fit_fold(task):
+    from sklearn.metrics import balanced_accuracy_score, f1_score
+    name, params, fold, train_idx, valid_idx = task
+    X, y = _WORKER_DATA["X"], _WORKER_DATA["y"]
+    start = time.perf_counter()
+    model = make_model(name, params).fit(X[train_idx], y[train_idx])
+    pred = model.predict(X[valid_idx])
+    return {
+        "model": name,
+        "params": params,
+        "fold": fold,
+        "f1_macro": float(f1_score(y[valid_idx], pred, average="macro")),
+        "balanced_accuracy": float(balanced_accuracy_score(y[valid_idx], pred)),
+        "iterations": int(getattr(model, "n_iter_", 0)) or None,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def search(X, y, workers=None, rows=None):
+    """Cross-validated grid search, one process-pool task per (model, params, fold).
+
+    rows restricts the search to those row positions of X/y (the training
+    split), so a memory-mapped matrix can be shared with workers as is.
+    """
+    from sklearn.model_selection import StratifiedKFold
+    rows = np.arange(len(y)) if rows is None else np.asarray(rows)
+    splitter = StratifiedKFold(n_splits=CV_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+    folds = [(rows[train], rows[valid]) for train, valid in splitter.split(rows, y[rows])]
+    tasks = []
+    for name, grid in SEARCH_SPACE.items():
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            params = dict(zip(keys, values))
+            for fold, (train_idx, valid_idx) in enumerate(folds):
+                tasks.append((name, params, fold, train_idx, valid_idx))
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Searching {len(tasks)} fits ({CV_FOLDS} folds) on {workers} worker processes ...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(share(X), share(y))) as pool:
+        results = list(pool.map(_fit_fold, tasks))
+
+    by_candidate = {}
+    for r in results:
+        by_candidate.setdefault((r["model"], json.dumps(r["params"], sort_keys=True)), []).append(r)
+    candidates = [
+        {"model": model, "params": json.loads(params),
+         "mean_f1_macro": float(np.mean([r["f1_macro"] for r in folds_])), "folds": folds_}
+        for (model, params), folds_ in by_candidate.items()
+    ]
+    candidates.sort(key=lambda c: c["mean_f1_macro"], reverse=True)
+    return candidates
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the accident severity model")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", choices=("memory", "streaming"), default="memory",
+                        help="streaming trains incremental models chunk by chunk in bounded memory")
+    parser.add_argument("--chunksize", type=positive_int, default=STREAM_CHUNK_SIZE, help="rows per chunk (streaming)")
+    parser.add_argument("--epochs", type=positive_int, default=STREAM_EPOCHS, help="passes over the data (streaming)")
+    parser.add_argument("--validation", choices=("stratified", "reservoir"), default="stratified",
+                        help="how the held-out rows are sampled (streaming)")
+    parser.add_argument("--validation-rows", type=positive_int, default=VALIDATION_ROWS,
+                        help="rows kept in each of the selection and test samples (streaming)")
+    args = parser.parse_args(argv)
+    with Run("train_model", os.path.join(args.data_dir, REPORT_DIR_NAME)) as run:
+        run.meta["workers"] = args.workers
+        run.meta["mode"] = args.mode
+        if args.mode == "streaming":
+            return train_streaming(run, args.data_dir, args.chunksize, args.epochs,
+                                   args.validation, args.validation_rows)
+        return train(run, args.data_dir, args.workers)
+
+
+def train(run, data_dir=DATA_DIR, workers=None):
+    from sklearn.metrics import accuracy_score, balanced_accuracy_score, confusion_matrix, f1_score
+    from sklearn.model_selection import train_test_split
+    import joblib
+
+    timings = {}
+    run_start = time.perf_counter()
+
+    latest_file = find_ml_ready(data_dir)
+    print(f"Loading dataset: {latest_file}")
+    with run.stage("load", inputs=dataset_files(latest_file)) as record:
+        X, y, features, target = training_arrays(latest_file)
+        record.count(len(y))
+    timings["load"] = record.data["seconds"]
+    print(f"Dataset loaded successfully! Shape: {X.shape}")
+    classes, counts = np.unique(y, return_counts=True)
+    print("Class balance:", {int(c): int(n) for c, n in zip(classes, counts)})
+
+    # Stratified hold-out keeps the rare fatal class in both splits; only row
+    # positions are split so the search shares the mapped matrix
+    train_rows, test_rows = train_test_split(
+        np.arange(len(y)), test_size=TEST_SIZE, stratify=y, random_state=RANDOM_STATE)
+    y_train, y_test = y[train_rows], y[test_rows]
+
+    with run.stage("search") as record:
+        candidates = search(X, y, workers, rows=train_rows)
+        record.count(len(train_rows))
+        record.extra["fits"] = sum(len(c["folds"]) for c in candidates)
+    timings["search"] = record.data["seconds"]
+    best = candidates[0]
+    print(f"Best: {best['model']} {best['params']} (CV macro F1 {best['mean_f1_macro']:.3f})")
+
+    with run.stage("refit") as record:
+        model = make_model(best["model"], best["params"], n_jobs=workers or -1).fit(X[train_rows], y_train)
+        record.count(len(train_rows))
+    timings["refit"] = record.data["seconds"]
+    with run.stage("evaluate") as record:
+        pred = model.predict(X[test_rows])
+        record.count(len(test_rows))
+    test_scores = {
+        "accuracy": float(accuracy_score(y_test, pred)),
+        "f1_macro": float(f1_score(y_test, pred, average="macro")),
+        "balanced_accuracy": float(balanced_accuracy_score(y_test, pred)),
+        "confusion_matrix": confusion_matrix(y_test, pred).tolist(),
+    }
+    print("Test scores:", {k: v for k, v in test_scores.items() if k != "confusion_matrix"})
+
+    model_path = os.path.join(data_dir, MODEL_FILE)
+    with run.stage("save_model", outputs=[model_path]):
+        joblib.dump({"model": model, "features": features, "target": target,
+                     "classes": model.classes_.tolist(), "model_name": best["model"],
+                     "params": best["params"]}, model_path)
+    print(f"Model saved to: {model_path}")
+
+    timings["total"] = time.perf_counter() - run_start
+    own_mb, workers_mb = peak_rss_mb()
+    report = {
+        "dataset": latest_file,
+        "rows": int(X.shape[0]),
+        "features": len(features),
+        "wall_clock_seconds": {k: round(v, 3) for k, v in timings.items()},
+        "peak_rss_mb": {"main": own_mb, "largest_worker": workers_mb},
+        "best": {k: best[k] for k in ("model", "params", "mean_f1_macro")},
+        "test": test_scores,
+        "cv": candidates,
+    }
+    report_path = os.path.join(data_dir, REPORT_FILE)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Training report saved to: {report_path}")
+    print(f"Wall clock: {report['wall_clock_seconds']}, peak RSS MB: {report['peak_rss_mb']}")
+    return report
+
+
+def _roles(chunk_no, rows):
+    # Same rows every epoch: the generator is seeded by the chunk's position
+    draw = np.random.default_rng([RANDOM_STATE, chunk_no]).random(rows)
+    return np.where(draw < TEST_SIZE, TEST, np.where(draw < TEST_SIZE + VALIDATION_SIZE, VALID, TRAIN))
+
+
+def stream_chunks(path, features, target, chunksize=STREAM_CHUNK_SIZE):
+    """Yield (chunk_no, X float32, y, row roles: TRAIN/VALID/TEST) for every chunk of the dataset."""
+    for chunk_no, chunk in enumerate(iter_table(path, chunksize=chunksize, columns=list(features) + [target])):
+        y = chunk[target].to_numpy()
+        yield chunk_no, chunk[list(features)].to_numpy(dtype=X_DTYPE), y, _roles(chunk_no, len(y))
+
+
+def scores(y, pred, weights=None):
+    from sklearn.metrics import accuracy_score, balanced_accuracy_score, confusion_matrix, f1_score
+    return {
+        "accuracy": float(accuracy_score(y, pred, sample_weight=weights)),
+        "f1_macro": float(f1_score(y, pred, average="macro", sample_weight=weights)),
+        "balanced_accuracy": float(balanced_accuracy_score(y, pred, sample_weight=weights)),
+        "confusion_matrix": confusion_matrix(y, pred).tolist(),
+    }
+
+
+def train_streaming(run, data_dir=DATA_DIR, chunksize=STREAM_CHUNK_SIZE, epochs=STREAM_EPOCHS,
+                    validation="stratified", validation_rows=VALIDATION_ROWS):
+    """Out-of-core training: incremental models over the chunked ML-ready dataset.
+
+    Peak memory is one chunk, the two held-out samples and the models. The
+    best candidate is picked on the selection sample; the reported test
+    scores come from a separate test sample it never saw. Scores are
+    weighted so that they estimate the scores on every held-out row.
+    """
+    if epochs < 1 or validation_rows < 1:
+        raise ValueError(f"epochs and validation_rows must be at least 1, got {epochs} and {validation_rows}")
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    import joblib
+
+    timings = {}
+    run_start = time.perf_counter()
+
+    latest_file = find_ml_ready(data_dir)
+    dtypes = table_dtypes(latest_file)
+    target = find_column(dtypes.index, TARGET)
+    if target is None:
+        raise KeyError(f"Target column {TARGET} not found")
+    features = feature_columns(dtypes, target)
+    print(f"Streaming dataset: {latest_file} ({len(features)} features, {chunksize} rows per chunk)")
+
+    # Pass 1: scaler statistics of the training rows and class counts per role
+    scaler = StandardScaler()
+    counts = {TRAIN: {}, VALID: {}, TEST: {}}
+    with run.stage("profile", inputs=dataset_files(latest_file)) as record:
+        for _, X, y, roles in stream_chunks(latest_file, features, target, chunksize):
+            scaler.partial_fit(X[roles == TRAIN])
+            for role, role_counts in counts.items():
+                for label, n in zip(*np.unique(y[roles == role], return_counts=True)):
+                    role_counts[label.item()] = role_counts.get(label.item(), 0) + int(n)
+        record.count(sum(n for role_counts in counts.values() for n in role_counts.values()))
+    timings["profile"] = record.data["seconds"]
+    # Every role needs rows: training fits the models, selection picks one, test scores it
+    empty = [ROLE_NAMES[role] for role, role_counts in counts.items() if not role_counts]
+    if empty:
+        total = sum(n for role_counts in counts.values() for n in role_counts.values())
+        raise ValueError(f"No {' or '.join(empty)} rows among the {total} rows of {latest_file}; "
+                         f"the split holds out {VALIDATION_SIZE:.0%} for selection and {TEST_SIZE:.0%} "
+                         f"for test, so more data is needed")
+    classes = np.array(sorted(set().union(*counts.values())))
+    print("Class balance:", {int(c): sum(role_counts.get(c, 0) for role_counts in counts.values()) for c in classes})
+    # "balanced" class weights, applied as sample weights (partial_fit cannot compute them);
+    # a class with no training rows still gets one, as if it had a single row
+    rows = sum(counts[TRAIN].values())
+    class_weight = np.array([rows / (len(classes) * max(counts[TRAIN].get(c, 0), 1)) for c in classes])
+
+    def make_sample(role, seed):
+        if validation == "stratified":
+            return StratifiedSample(stratified_capacities(counts[role], validation_rows, VALIDATION_MIN_PER_CLASS),
+                                    seed=seed)
+        return ReservoirSample(validation_rows, seed=seed)
+
+    samples = {VALID: make_sample(VALID, RANDOM_STATE), TEST: make_sample(TEST, RANDOM_STATE + 1)}
+
+    candidates = []
+    for name, grid in STREAMING_SPACE.items():
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            params = dict(zip(keys, values))
+            candidates.append({"model": name, "params": params, "estimator": make_incremental_model(name, params),
+                               "epochs": []})
+
+    print(f"Training {len(candidates)} incremental models for {epochs} epoch(s) ...")
+    with run.stage("train") as record:
+        trained = 0
+        for epoch in range(epochs):
+            for chunk_no, X, y, roles in stream_chunks(latest_file, features, target, chunksize):
+                if epoch == 0:
+                    for role, sample in samples.items():
+                        sample.update(y[roles == role], X[roles == role])
+                train_rows = roles == TRAIN
+                X_train, y_train = scaler.transform(X[train_rows]), y[train_rows]
+                weights = class_weight[np.searchsorted(classes, y_train)]
+                for candidate in candidates:
+                    candidate["estimator"].partial_fit(X_train, y_train, classes=classes, sample_weight=weights)
+                trained += len(y_train)
+            if epoch == 0:
+                held = {}
+                for role, sample in samples.items():
+                    y_held, X_held = sample.sample()
+                    held[role] = (scaler.transform(X_held), y_held, sample.weights())
+                X_valid, y_valid, w_valid = held[VALID]
+                print(f"Selection sample: {len(y_valid)} of {samples[VALID].n} rows; "
+                      f"test sample: {len(held[TEST][1])} of {samples[TEST].n} rows ({validation})")
+            for candidate in candidates:
+                epoch_scores = scores(y_valid, candidate["estimator"].predict(X_valid), w_valid)
+                candidate["epochs"].append({k: v for k, v in epoch_scores.items() if k != "confusion_matrix"})
+            best = max(candidates, key=lambda c: c["epochs"][-1]["f1_macro"])
+            print(f"Epoch {epoch + 1}: best {best['model']} {best['params']} "
+                  f"(selection macro F1 {best['epochs'][-1]['f1_macro']:.3f})")
+        record.count(trained)
+        record.extra["models"] = len(candidates)
+        record.extra["validation_rows"] = int(len(y_valid))
+    timings["train"] = record.data["seconds"]
 
-# Automatically find the latest ML-ready dataset
-ml_ready_files = glob(os.path.join(DATA_DIR, "*_ml_ready.csv"))
+    best = max(candidates, key=lambda c: c["epochs"][-1]["f1_macro"])
+    X_test, y_test, w_test = held[TEST]
+    with run.stage("evaluate") as record:
+        test_scores = scores(y_test, best["estimator"].predict(X_test), w_test)
+        record.count(len(y_test))
+    print("Test scores:", {k: v for k, v in test_scores.items() if k != "confusion_matrix"})
 
-if not ml_ready_files:
-    raise FileNotFoundError(f"No ML-ready CSV files found in {DATA_DIR}")
+    # The scaler travels with the model, so scoring takes the raw encoded features
+    model = Pipeline([("scale", scaler), ("model", best["estimator"])])
+    model_path = os.path.join(data_dir, MODEL_FILE)
+    with run.stage("save_model", outputs=[model_path]):
+        joblib.dump({"model": model, "features": features, "target": target,
+                     "classes": classes.tolist(), "model_name": best["model"],
+                     "params": best["params"], "mode": "streaming"}, model_path)
+    print(f"Model saved to: {model_path}")
 
-# Pick the most recently modified file
-latest_file = max(ml_ready_files, key=os.path.getmtime)
+    timings["total"] = time.perf_counter() - run_start
+    own_mb, _ = peak_rss_mb()
+    report = {
+        "dataset": latest_file,
+        "mode": "streaming",
+        "rows": sum(n for role_counts in counts.values() for n in role_counts.values()),
+        "features": len(features),
+        "chunksize": chunksize,
+        "epochs": epochs,
+        "wall_clock_seconds": {k: round(v, 3) for k, v in timings.items()},
+        "peak_rss_mb": {"main": own_mb},
+        "best": {"model": best["model"], "params": best["params"],
+                 "selection_f1_macro": best["epochs"][-1]["f1_macro"]},
+        "selection": {"sampling": validation, "rows": int(len(y_valid)), "held_out_rows": samples[VALID].n},
+        "test": dict(test_scores, sampling=validation, rows=int(len(y_test)), held_out_rows=samples[TEST].n),
+        "candidates": [{k: c[k] for k in ("model", "params", "epochs")} for c in candidates],
+    }
+    report_path = os.path.join(data_dir, REPORT_FILE)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Training report saved to: {report_path}")
+    print(f"Wall clock: {report['wall_clock_seconds']}, peak RSS MB: {report['peak_rss_mb']}")
+    return report
 
-print(f"Loading dataset: {latest_file}")
-df = pd.read_csv(latest_file)
 
-print(f"Dataset loaded successfully! Shape: {df.shape}")
+if __name__ == "__main__":
+    main()
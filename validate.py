@@ -0,0 +1,377 @@
+# validate.py
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from merge import KEY
+from schema import SCHEMAS, iter_table_csv
+
+# =========================
+# Raw data validation
+# =========================
+# Declarative rules for the three DfT tables, applied to every chunk as it is
+# loaded (one vectorised pass per column, no extra read of the files):
+#   required  the column must exist and have no blanks (error)
+#   range     (lo, hi) inclusive for coded/numeric values; -1 is the DfT
+#             "missing or out of range" sentinel and is allowed unless
+#             sentinel=False
+#   nulls     blanks allowed (coordinates); otherwise blanks are violations
+#   level     "error" stops the run, "warn" is only reported (default warn)
+# Cross-table checks run once all chunks are in: duplicate collision keys,
+# casualty/vehicle rows whose accident has no collision (orphans), and
+# columns that are mostly -1. Header names are matched case-insensitively
+# (Accident_Index in older exports, accident_index now), and any spelling that
+# differs from the registry is reported, since exact-name lookups miss it.
+SENTINEL = -1
+# Columns with at least this share of -1 are reported as effectively empty
+SENTINEL_SHARE = 0.5
+# Orphan rows above this share of a table are an error (a mismatched year file)
+ORPHAN_SHARE = 0.01
+SAMPLE = 5
+REPORT_SUFFIX = "_validation.json"
+
+# Ranges follow the DfT data guide; 9/99 are "unknown" codes in many fields
+COLLISION_RULES = {
+    "accident_index": {"required": True},
+    "accident_year": {"range": (1979, 2100), "level": "error"},
+    "location_easting_osgr": {"range": (0, 700_000), "nulls": True},
+    "location_northing_osgr": {"range": (0, 1_300_000), "nulls": True},
+    "longitude": {"range": (-9.0, 2.0), "nulls": True},
+    "latitude": {"range": (49.5, 61.0), "nulls": True},
+    "police_force": (1, 99),
+    "accident_severity": {"required": True, "range": (1, 3), "sentinel": False, "level": "error"},
+    "number_of_vehicles": (1, 999),
+    "number_of_casualties": (1, 999),
+    "day_of_week": {"range": (1, 7), "level": "error"},
+    "first_road_class": (1, 6),
+    "first_road_number": (0, 9999),
+    "road_type": (1, 12),
+    "speed_limit": (20, 70),
+    "junction_detail": (0, 99),
+    "junction_control": (0, 9),
+    "second_road_class": (0, 6),
+    "second_road_number": (0, 9999),
+    "pedestrian_crossing_human_control": (0, 9),
+    "pedestrian_crossing_physical_facilities": (0, 9),
+    "light_conditions": (1, 7),
+    "weather_conditions": (1, 9),
+    "road_surface_conditions": (1, 9),
+    "special_conditions_at_site": (0, 9),
+    "carriageway_hazards": (0, 9),
+    "urban_or_rural_area": (1, 3),
+    "did_police_officer_attend_scene_of_accident": (1, 3),
+    "trunk_road_flag": (1, 2),
+    "enhanced_severity_collision": (1, 7),
+}
+
+CASUALTY_RULES = {
+    "accident_index": {"required": True},
+    "vehicle_reference": (1, 999),
+    "casualty_reference": (1, 999),
+    "casualty_class": (1, 3),
+    "sex_of_casualty": (1, 9),
+    "age_of_casualty": (0, 120),
+    "age_band_of_casualty": (1, 11),
+    "casualty_severity": {"range": (1, 3), "sentinel": False, "level": "error"},
+    "pedestrian_location": (0, 10),
+    "pedestrian_movement": (0, 9),
+    "car_passenger": (0, 9),
+    "bus_or_coach_passenger": (0, 9),
+    "pedestrian_road_maintenance_worker": (0, 2),
+    "casualty_type": (0, 99),
+    "casualty_home_area_type": (1, 3),
+    "casualty_imd_decile": (1, 10),
+    "enhanced_casualty_severity": (1, 7),
+    "casualty_distance_banding": (1, 5),
+}
+
+VEHICLE_RULES = {
+    "accident_index": {"required": True},
+    "vehicle_reference": (1, 999),
+    "vehicle_type": (1, 99),
+    "towing_and_articulation": (0, 9),
+    "vehicle_manoeuvre": (1, 99),
+    "vehicle_direction_from": (0, 9),
+    "vehicle_direction_to": (0, 9),
+    "vehicle_location_restricted_lane": (0, 99),
+    "junction_location": (0, 9),
+    "skidding_and_overturning": (0, 9),
+    "hit_object_in_carriageway": (0, 99),
+    "vehicle_leaving_carriageway": (0, 9),
+    "hit_object_off_carriageway": (0, 99),
+    "first_point_of_impact": (0, 9),
+    "vehicle_left_hand_drive": (1, 9),
+    "journey_purpose_of_driver": (1, 15),
+    "sex_of_driver": (1, 3),
+    "age_of_driver": (0, 120),
+    "age_band_of_driver": (1, 11),
+    "engine_capacity_cc": (1, 99_999),
+    "propulsion_code": (1, 12),
+    "age_of_vehicle": (0, 120),
+    "driver_imd_decile": (1, 10),
+    "driver_home_area_type": (1, 3),
+    "escooter_flag": (0, 1),
+    "driver_distance_banding": (1, 5),
+}
+
+RULES = {
+    "collisions": COLLISION_RULES,
+    "casualties": CASUALTY_RULES,
+    "vehicles": VEHICLE_RULES,
+}
+
+
+def _spec(rule):
+    # A bare (lo, hi) tuple is shorthand for a warn-level range rule
+    if isinstance(rule, tuple):
+        rule = {"range": rule}
+    return {"required": False, "range": None, "nulls": False, "sentinel": True, "level": "warn", **rule}
+
+
+def _plain(value):
+    # JSON-friendly sample values
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def validation_path(path):
+    return os.path.splitext(path)[0] + REPORT_SUFFIX
+
+
+class ValidationError(ValueError):
+    """An error-level violation; .report is the report up to that point."""
+
+    def __init__(self, message, report):
+        super().__init__(message, report)
+        self.report = report
+
+    def __str__(self):
+        return self.args[0]
+
+
+class Validator:
+    """Accumulates rule violations over the chunks of one year's tables.
+
+    check(table, chunk) for every chunk in any order, then finish() for the
+    cross-table checks. With fail_fast, the first error-level violation
+    raises ValidationError from check() instead of waiting for the end.
+    """
+
+    def __init__(self, rules=RULES, fail_fast=True, label=None):
+        self.rules = {table: {col: _spec(rule) for col, rule in cols.items()} for table, cols in rules.items()}
+        self.fail_fast = fail_fast
+        self.label = label
+        self.rows = {}
+        self.violations = {}
+        self.sentinels = {}
+        self.keys = []
+        self.child_keys = {}
+        self.headers = set()
+        self.seconds = 0.0
+
+    def flag(self, table, column, rule, level, count, sample=()):
+        entry = self.violations.setdefault((table, column, rule), {
+            "table": table, "column": column, "rule": rule, "level": level, "count": 0, "sample": []})
+        entry["count"] += int(count)
+        for value in sample:
+            value = _plain(value)
+            if len(entry["sample"]) < SAMPLE and value not in entry["sample"]:
+                entry["sample"].append(value)
+
+    def check(self, table, chunk):
+        start = time.perf_counter()
+        try:
+            self._check(table, chunk)
+        finally:
+            self.seconds += time.perf_counter() - start
+        if self.fail_fast and self.errors():
+            raise ValidationError(f"{table} failed validation ({self.label or 'data'}):\n"
+                                  + format_report(self.report()), self.report())
+
+    def _check(self, table, chunk):
+        rules = self.rules.get(table, {})
+        columns = {col.lower(): col for col in chunk.columns}
+        self.rows[table] = self.rows.get(table, 0) + len(chunk)
+        header = (table, tuple(chunk.columns))
+        if header not in self.headers:
+            self.headers.add(header)
+            registry = SCHEMAS.get(table, {})
+            misspelt = [col for col in chunk.columns if col != col.lower() and col.lower() in registry]
+            if misspelt:
+                self.flag(table, None, "header_case", "warn", len(misspelt), misspelt)
+            for col, spec in rules.items():
+                if spec["required"] and col not in columns:
+                    self.flag(table, col, "missing", "error", 1)
+
+        key = columns.get(KEY)
+        if key is not None:
+            keys = chunk[key]
+            if not pd.api.types.is_string_dtype(keys):
+                keys = keys.astype(str)
+            if table == "collisions":
+                self.keys.append(keys.reset_index(drop=True))
+            else:
+                # Distinct keys and their row counts; enough to count orphans later
+                self.child_keys.setdefault(table, []).append(keys.value_counts(sort=False))
+
+        for col, spec in rules.items():
+            name = columns.get(col)
+            if name is None:
+                continue
+            values = chunk[name]
+            # Integer columns cannot hold blanks; skip the isna() pass for them
+            nulls = None if values.dtype.kind in "iu" else values.isna()
+            n_null = 0 if nulls is None else int(nulls.sum())
+            if n_null and not spec["nulls"]:
+                self.flag(table, col, "null", "error" if spec["required"] else spec["level"], n_null)
+            if spec["range"] is None:
+                continue
+            if not pd.api.types.is_numeric_dtype(values):
+                numeric = pd.to_numeric(values, errors="coerce")
+                bad = numeric.isna() & ~nulls
+                if bad.any():
+                    self.flag(table, col, "type", spec["level"], bad.sum(), values[bad].unique()[:SAMPLE])
+                values = numeric
+            arr = values.to_numpy()
+            lo, hi = spec["range"]
+            n_sentinel = np.count_nonzero(arr == SENTINEL)
+            # NaN compares False, so blanks never count as out of range; every
+            # range starts above -1, so sentinels are in out and subtracted
+            out = (arr < lo) | (arr > hi)
+            n_out = np.count_nonzero(out)
+            if n_sentinel:
+                if spec["sentinel"]:
+                    self.sentinels[(table, col)] = self.sentinels.get((table, col), 0) + n_sentinel
+                    n_out -= n_sentinel
+                else:
+                    self.flag(table, col, "sentinel", spec["level"], n_sentinel, [SENTINEL])
+            if n_out:
+                out &= arr != SENTINEL
+                self.flag(table, col, "range", spec["level"], np.count_nonzero(out), pd.unique(arr[out])[:SAMPLE])
+
+    def finish(self):
+        """Run the cross-table checks and return the report; raises ValidationError on any error."""
+        start = time.perf_counter()
+        if self.keys:
+            # One factorize over collision and child keys, then plain integer
+            # lookups (isin() on Arrow-backed strings is very slow)
+            coll = pd.concat(self.keys, ignore_index=True)
+            children = {table: pd.concat(parts) for table, parts in self.child_keys.items()}
+            codes, uniques = pd.factorize(pd.concat([coll] + [c.index.to_series() for c in children.values()],
+                                                    ignore_index=True), use_na_sentinel=False)
+            coll_codes = codes[:len(coll)]
+            seen = np.bincount(coll_codes, minlength=len(uniques))
+            n_dup = len(coll) - int((seen > 0).sum())
+            if n_dup:
+                self.flag("collisions", KEY, "duplicate", "error", n_dup,
+                          pd.unique(coll[seen[coll_codes] > 1])[:SAMPLE])
+            offset = len(coll)
+            for table, counts in children.items():
+                orphan = seen[codes[offset:offset + len(counts)]] == 0
+                offset += len(counts)
+                n_orphan = int(counts.to_numpy()[orphan].sum())
+                if n_orphan:
+                    level = "error" if n_orphan > ORPHAN_SHARE * self.rows[table] else "warn"
+                    self.flag(table, KEY, "orphan", level, n_orphan, pd.unique(counts.index[orphan])[:SAMPLE])
+        for (table, col), n in self.sentinels.items():
+            if n >= SENTINEL_SHARE * self.rows[table]:
+                self.flag(table, col, "mostly_sentinel", "warn", n)
+        self.seconds += time.perf_counter() - start
+        report = self.report()
+        if self.errors():
+            raise ValidationError(f"Validation failed ({self.label or 'data'}):\n" + format_report(report), report)
+        return report
+
+    def errors(self):
+        return [v for v in self.violations.values() if v["level"] == "error"]
+
+    def report(self):
+        violations = sorted(self.violations.values(),
+                            key=lambda v: (v["level"] != "error", v["table"], v["column"] or "", v["rule"]))
+        for v in violations:
+            v["share"] = round(v["count"] / max(self.rows.get(v["table"], 0), 1), 6)
+        return {
+            "label": self.label,
+            "ok": not self.errors(),
+            "rows": dict(self.rows),
+            "seconds": round(self.seconds, 4),
+            "errors": len(self.errors()),
+            "warnings": len(violations) - len(self.errors()),
+            "violations": violations,
+            # Share of -1 per column, for columns that have any
+            "sentinels": {f"{table}.{col}": round(n / self.rows[table], 6)
+                          for (table, col), n in sorted(self.sentinels.items())},
+        }
+
+
+def format_report(report):
+    lines = [f"{report['errors']} error(s), {report['warnings']} warning(s) over "
+             f"{sum(report['rows'].values())} rows, {report['seconds']:.2f}s checking"]
+    for v in report["violations"]:
+        where = f"{v['table']}.{v['column']}" if v["column"] else v["table"]
+        sample = f" e.g. {v['sample']}" if v["sample"] else ""
+        lines.append(f"  {v['level'].upper():5} {where} {v['rule']}: {v['count']} ({v['share']:.2%}){sample}")
+    return "\n".join(lines)
+
+
+def save_reports(reports, path):
+    """Write {label: report} to path as JSON."""
+    with open(path, "w") as f:
+        json.dump({str(label): report for label, report in reports.items()}, f, indent=2, default=str)
+
+
+def validate_files(files, label=None, chunksize=250_000, fail_fast=True):
+    """Validate one year's {table: path} on its own; returns (report, load seconds)."""
+    validator = Validator(fail_fast=fail_fast, label=label)
+    load = 0.0
+    for table, path in files.items():
+        chunks = iter_table_csv(path, table, chunksize=chunksize)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            load += time.perf_counter() - start
+            if chunk is None:
+                break
+            validator.check(table, chunk)
+    return validator.finish(), load
+
+
+def main(argv=None):
+    from ingest import detect_year_files
+    from instrument import REPORT_DIR_NAME, Run
+
+    parser = argparse.ArgumentParser(description="Validate the raw DfT tables and time the checks against loading")
+    parser.add_argument("--data-dir", default="../data")
+    parser.add_argument("--out", help="report path (default: <data-dir>/raw_validation.json)")
+    parser.add_argument("--keep-going", action="store_true", help="report every year instead of stopping at the first error")
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join(args.data_dir, "raw" + REPORT_SUFFIX)
+    reports, failed = {}, False
+    with Run("validate", os.path.join(args.data_dir, REPORT_DIR_NAME)) as run:
+        for year, files in detect_year_files(args.data_dir).items():
+            with run.stage(f"validate_{year}", inputs=list(files.values())) as record:
+                try:
+                    report, load = validate_files(files, label=year, fail_fast=not args.keep_going)
+                except ValidationError as e:
+                    report, load, failed = e.report, None, True
+                    print(f"ERROR: {e}")
+                reports[year] = report
+                record.count(sum(report["rows"].values()))
+                record.extra["validation_seconds"] = report["seconds"]
+            if load:
+                # Overhead of the checks relative to parsing the same chunks
+                record.extra["load_seconds"] = round(load, 4)
+                print(f"Year {year}: {format_report(report)}")
+                print(f"  overhead {report['seconds'] / load:.1%} of {load:.2f}s load time")
+            if failed and not args.keep_going:
+                break
+        save_reports(reports, out)
+        print(f"Validation report saved to: {out}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()